@@ -142,7 +142,21 @@ def build_prompt_from_template(language, context, question, history_text="", age
     return prompt, model_config
 
 
-def query_chromadb(project_name, collection_name=None, data=None):
+# Opt-in compact wire format with chromadb-central: msgpack results in the response
+# (queries carry query_text, which central embeds, so the request stays small JSON)
+CHROMADB_COMPACT_WIRE = os.getenv("CHROMADB_COMPACT_WIRE", "false").lower() in ("1", "true", "yes")
+MSGPACK_MEDIA_TYPE = "application/x-msgpack"
+
+
+def _decode_central_response(resp):
+    """Decode a chromadb-central response (msgpack when negotiated, JSON otherwise)."""
+    if resp.headers.get("Content-Type", "").startswith(MSGPACK_MEDIA_TYPE):
+        import msgpack
+        return msgpack.unpackb(resp.content, raw=False)
+    return resp.json()
+
+
+def query_chromadb(project_name, collection_name=None, data=None, compact=None):
     try:
         chromadb_url = os.getenv("CHROMADB_CENTRAL_URL")
 
@@ -173,6 +187,12 @@ def query_chromadb(project_name, collection_name=None, data=None):
             "query": data
         }
 
+        # Compact wire format (explicit arg wins over CHROMADB_COMPACT_WIRE)
+        if compact is None:
+            compact = CHROMADB_COMPACT_WIRE
+        if compact:
+            headers["Accept"] = MSGPACK_MEDIA_TYPE
+
         url = f"{chromadb_url}/query"
 
         # =========================
@@ -187,7 +207,7 @@ def query_chromadb(project_name, collection_name=None, data=None):
 
         resp.raise_for_status()
 
-        return resp.json()
+        return _decode_central_response(resp)
 
     except requests.exceptions.HTTPError as e:
         return {
@@ -387,6 +407,17 @@ Respond ONLY in JSON, no explanation:
         print(f"[Reformulation] Error: {e}, using original question")
         return question, "specific"
 
+def _exclusions_starved(results, min_results=20):
+    """
+    True when fewer than min_results came back and central reports that the
+    exclusions dropped candidates: only then can a query without them return more.
+    (A sparse where filter alone gives the same short list twice.)
+    """
+    returned = len((results.get('ids') or [[]])[0])
+    excluded = (results.get('excluded') or [0])[0]
+    return returned < min_results and excluded > 0
+
+
 def ask_question_stream(question, language="fr", timezone="UTC", locale="fr-FR", top_k=100, conversation_history=None, session=None, question_id=None, agent=None, bibliotheque="all", distance_threshold=None):
     """Streaming version of ask_question with language support and conversation history
     
@@ -432,51 +463,47 @@ def ask_question_stream(question, language="fr", timezone="UTC", locale="fr-FR",
         search_question, question_type = reformulate_question_with_context(question, conversation_history, language)
         print(f"[ask_question_stream] Search question after reformulation: '{search_question}' (type: {question_type})", flush=True)
 
-        # Get embedding for the reformulated question
-        query_emb = client.embeddings.create(
-            model="openai/text-embedding-3-large", 
-            input=search_question
-        ).data[0].embedding
-
         # Build where filter for library selection
         where_filter = None
         if bibliotheque and bibliotheque != "all":
             where_filter = {"bibliotheque": bibliotheque}
 
-        # We only need top 150 for diversity filtering before shuffling and taking top 50
-        # Query ChromaDB with optional library filter
-        nbr_results = 500
+        # Central diversifies server-side: it searches a 500-candidate pool, drops the
+        # books already recommended in this conversation and returns the 50 we need
+        nbr_results = 50
+        # Central embeds the reformulated question with the project's model
         query_params = {
-            "query_embedding": query_emb,
+            "query_text": search_question,
             "n_results": nbr_results,
-            "include": ['documents', 'metadatas']
+            "candidates": 500,
+            # The context below is built from these metadata fields only: no document texts
+            "include": ['metadatas'],
+            "fields": ['id', 'titre', 'title', 'auteur', 'author', 'couverture', 'lien', 'resume',
+                       'categorie', 'editeur', 'parution', 'pages', 'langue', 'bibliotheque'],
         }
+        if previously_recommended:
+            titles = sorted(previously_recommended)
+            query_params["exclude_values"] = {"titre": titles, "title": titles}
+        if question_type == 'general':
+            # Questions générales : favoriser la variété (MMR) plutôt que les quasi-doublons
+            query_params["mmr_lambda"] = 0.5
         if where_filter:
             query_params["where"] = where_filter
             
         # Ensure query_params is JSON serializable
         query_params = json.loads(json.dumps(query_params, default=str))
         results = query_chromadb(project_name="bibliosense", collection_name="gdrive_documents", data=query_params)
+
+        # Si on a trop filtré, garder quand même des résultats
+        if previously_recommended and _exclusions_starved(results):
+            query_params.pop("exclude_values", None)
+            results = query_chromadb(project_name="bibliosense", collection_name="gdrive_documents", data=query_params)
         
-        if not results['documents'] or not results['documents'][0]:
+        if not results.get('metadatas') or not results['metadatas'][0]:
             yield "No relevant information found. Please make sure you have indexed some transcripts."
             return
         
-        documents = results['documents'][0]
-        metadatas_list = results.get('metadatas', [[]])[0]
-
-        # Filtrer pour limiter le nombre de livres par auteur (max 2)
-        filtered_results = []
-        for doc, meta in zip(documents, metadatas_list):
-            title = meta.get('titre') or meta.get('title') or ''
-            # Inclure les livres non recommandés dans l'historique
-            if title and title not in previously_recommended:
-                filtered_results.append((doc, meta))
-
-        
-        # Si on a trop filtré, garder quand même des résultats
-        if len(filtered_results) < 20:
-            filtered_results = list(zip(documents, metadatas_list))[:50]
+        filtered_results = list(results['metadatas'][0])
         
         # Shuffle les résultats si la question est générale pour plus de diversité
         if question_type == 'general':
@@ -484,10 +511,7 @@ def ask_question_stream(question, language="fr", timezone="UTC", locale="fr-FR",
             print(f"[Query] Shuffled results (general question)", flush=True)
 
         # Prendre les 50 premiers
-        filtered_results = filtered_results[:50]
-        documents, metadatas_list = zip(*filtered_results) if filtered_results else ([], [])
-        documents = list(documents)
-        metadatas_list = list(metadatas_list)
+        metadatas_list = filtered_results[:50]
 
         #Print title of first 10 books for debugging
         # for i, meta in enumerate(metadatas_list[:50]):
@@ -500,8 +524,8 @@ def ask_question_stream(question, language="fr", timezone="UTC", locale="fr-FR",
         #         print(f"     Cover URL: {cover}", flush=True)
         # Build context from results with harmonized metadata (JSON structure)
         contexts = []
-        for i, doc in enumerate(documents):
-            metadata = metadatas_list[i] if i < len(metadatas_list) else {}
+        for metadata in metadatas_list:
+            metadata = metadata or {}
             # Harmonisation des champs pour le LLM
             
             livre_struct = {
@@ -45,6 +45,42 @@ def get_agent_paths(agent=None):
         'chroma_db_dir': str(kb_path / "chroma_db")
     }
 
+# Summary of the indexed documents, kept next to chroma_db in the same layout as
+# chromadb-central's <collection>.inventory.json: listing documents reads this
+# small file instead of the metadata of every chunk
+INVENTORY_FORMAT = 1
+
+
+def _inventory_path(paths, collection_name="gdrive_documents"):
+    return os.path.join(paths['chroma_db_dir'], f"{collection_name}.inventory.json")
+
+
+def load_inventory(paths):
+    """The document summary, or None if missing/unreadable"""
+    try:
+        with open(_inventory_path(paths), "r", encoding="utf-8") as f:
+            inventory = json.load(f)
+    except (OSError, ValueError):
+        return None
+    return inventory if inventory.get("format") == INVENTORY_FORMAT else None
+
+
+def save_inventory(paths, documents):
+    """Write the summary of documents ({file_id: {source, chunks, indexed_at}}) atomically"""
+    inventory = {
+        "format": INVENTORY_FORMAT,
+        "collection": "gdrive_documents",
+        "updated_at": datetime.now().isoformat(),
+        "total_documents": len(documents),
+        "total_chunks": sum(doc["chunks"] for doc in documents.values()),
+        "documents": documents,
+    }
+    path = _inventory_path(paths)
+    with open(path + ".tmp", "w", encoding="utf-8") as f:
+        json.dump(inventory, f, ensure_ascii=False)
+    os.replace(path + ".tmp", path)
+
+
 def get_chroma_collection(agent=None):
     """Get or create ChromaDB collection for specific agent"""
     paths = get_agent_paths(agent)
@@ -220,7 +256,7 @@ def process_document(file_info, collection, paths):
     
     # Check if already indexed
     try:
-        existing = collection.get(where={"file_id": file_id})
+        existing = collection.get(where={"file_id": file_id}, limit=1, include=[])
         if existing['ids']:
             print(f"⏭️  Already indexed: {file_name}")
             return True
@@ -256,6 +292,7 @@ def process_document(file_info, collection, paths):
             chunks.append(chunk)
     
     # Add chunks to ChromaDB
+    indexed_at = datetime.now().isoformat()
     for i, chunk in enumerate(chunks):
         collection.add(
             documents=[chunk],
@@ -264,11 +301,17 @@ def process_document(file_info, collection, paths):
                 "file_id": file_id,
                 "chunk": i,
                 "mime_type": mime_type,
-                "indexed_at": datetime.now().isoformat()
+                "indexed_at": indexed_at
             }],
             ids=[f"{file_id}_chunk_{i}"]
         )
     
+    # Keep the document summary in step (a missing one is rebuilt by get_indexed_documents)
+    inventory = load_inventory(paths)
+    documents = inventory["documents"] if inventory else {}
+    documents[file_id] = {"source": file_name, "chunks": len(chunks), "indexed_at": indexed_at}
+    save_inventory(paths, documents)
+    
     print(f"✅ Indexed {len(chunks)} chunks from {file_name}")
     return True
 
@@ -340,19 +383,33 @@ def get_indexed_documents(agent=None):
     """
     try:
         collection, paths = get_chroma_collection(agent)
-        results = collection.get()
         
-        # Group by file_id
+        # The summary written at index time, unless it no longer matches the collection
+        inventory = load_inventory(paths)
+        if inventory is not None and inventory.get("total_chunks") == collection.count():
+            return list(inventory["documents"].values())
+        
+        # Missing or stale (e.g. indexed before the summary existed): rebuild it once,
+        # grouping by file_id, reading metadata only, one page at a time
         documents = {}
-        for i, metadata in enumerate(results['metadatas']):
-            file_id = metadata.get('file_id', 'unknown')
-            if file_id not in documents:
-                documents[file_id] = {
-                    'source': metadata.get('source', 'Unknown'),
-                    'chunks': 0,
-                    'indexed_at': metadata.get('indexed_at', 'Unknown')
-                }
-            documents[file_id]['chunks'] += 1
+        page_size = 1000
+        offset = 0
+        while True:
+            results = collection.get(include=["metadatas"], limit=page_size, offset=offset)
+            for metadata in results['metadatas']:
+                metadata = metadata or {}
+                file_id = metadata.get('file_id', 'unknown')
+                if file_id not in documents:
+                    documents[file_id] = {
+                        'source': metadata.get('source', 'Unknown'),
+                        'chunks': 0,
+                        'indexed_at': metadata.get('indexed_at', 'Unknown')
+                    }
+                documents[file_id]['chunks'] += 1
+            if len(results['ids']) < page_size:
+                break
+            offset += len(results['ids'])
+        save_inventory(paths, documents)
         
         return list(documents.values())
     except Exception as e:
@@ -0,0 +1,32 @@
+import pytest
+
+for _module in ("dotenv", "openai", "requests", "google.oauth2.id_token"):
+    pytest.importorskip(_module)
+
+from api.query_chromadb import _exclusions_starved
+
+
+def _results(returned, excluded=None):
+    results = {"ids": [[f"id{i}" for i in range(returned)]], "metadatas": [[{}] * returned]}
+    if excluded is not None:
+        results["excluded"] = [excluded]
+    return results
+
+
+def test_sparse_filter_alone_is_not_retried():
+    # Few results, but the exclusions dropped nothing: the same query without them returns the same list
+    assert not _exclusions_starved(_results(5, excluded=0))
+    assert not _exclusions_starved(_results(5))
+
+
+def test_retry_when_exclusions_dropped_candidates():
+    assert _exclusions_starved(_results(5, excluded=3))
+
+
+def test_enough_results_are_kept():
+    assert not _exclusions_starved(_results(20, excluded=12))
+
+
+def test_empty_results():
+    assert not _exclusions_starved({})
+    assert _exclusions_starved({"ids": [[]], "excluded": [40]})
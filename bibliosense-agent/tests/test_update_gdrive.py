@@ -0,0 +1,68 @@
+import pytest
+
+for _module in ("dotenv", "openai", "chromadb", "PyPDF2", "docx", "tqdm",
+                "google.oauth2.service_account", "googleapiclient.discovery", "googleapiclient.http"):
+    pytest.importorskip(_module)
+
+from api import update_gdrive
+
+
+class FakeCollection:
+    def __init__(self):
+        self.items = {}  # id -> metadata
+        self.reads = 0
+
+    def count(self):
+        return len(self.items)
+
+    def add(self, documents, metadatas, ids):
+        self.items.update(zip(ids, metadatas))
+
+    def get(self, where=None, include=(), limit=None, offset=0):
+        self.reads += 1
+        ids = [i for i, meta in self.items.items() if not where or all(meta.get(k) == v for k, v in where.items())]
+        ids = ids[offset:offset + limit] if limit is not None else ids[offset:]
+        return {"ids": ids, "metadatas": [self.items[i] for i in ids]}
+
+
+@pytest.fixture
+def kb(tmp_path, monkeypatch):
+    collection = FakeCollection()
+    paths = {
+        "kb_path": tmp_path,
+        "documents_dir": str(tmp_path / "documents"),
+        "extracted_dir": str(tmp_path),
+        "chroma_db_dir": str(tmp_path),
+    }
+    monkeypatch.setattr(update_gdrive, "get_chroma_collection", lambda agent=None: (collection, paths))
+    monkeypatch.setattr(update_gdrive, "download_file", lambda file_id, name, mime, d: name)
+    monkeypatch.setattr(update_gdrive, "extract_text_from_file", lambda path, mime: "texte " * 400)
+    return collection, paths
+
+
+def _index(collection, paths, file_id, name):
+    info = {"id": file_id, "name": name, "mimeType": "text/plain"}
+    assert update_gdrive.process_document(info, collection, paths)
+
+
+def test_listing_reads_the_summary_kept_at_index_time(kb):
+    collection, paths = kb
+    _index(collection, paths, "f1", "un.txt")
+    _index(collection, paths, "f2", "deux.txt")
+
+    reads = collection.reads
+    documents = update_gdrive.get_indexed_documents("kb")
+    assert collection.reads == reads
+    assert sorted(doc["source"] for doc in documents) == ["deux.txt", "un.txt"]
+    assert sum(doc["chunks"] for doc in documents) == collection.count()
+
+
+def test_stale_summary_is_rebuilt_from_the_collection(kb):
+    collection, paths = kb
+    _index(collection, paths, "f1", "un.txt")
+    # Chunks written without the summary (e.g. by an older version)
+    collection.add(documents=["x"], metadatas=[{"file_id": "f0", "source": "ancien.txt"}], ids=["f0_chunk_0"])
+
+    documents = update_gdrive.get_indexed_documents("kb")
+    assert sorted(doc["source"] for doc in documents) == ["ancien.txt", "un.txt"]
+    assert update_gdrive.load_inventory(paths)["total_chunks"] == collection.count()
@@ -0,0 +1,291 @@
+"""
+Parallel, incremental download of chroma_db snapshots from the bucket.
+
+- Blobs are fetched by a thread pool (CHROMA_DOWNLOAD_WORKERS, default 8).
+- A local manifest (.sync_manifest.json) records each file's generation/crc32c;
+  unchanged blobs are skipped on the next sync.
+- Blobs larger than CHROMA_DOWNLOAD_CHUNK_MB (default 32) are fetched as parallel
+  range reads into a .part file, then renamed into place.
+- Local files that no longer exist in the bucket (old HNSW segments, SQLite
+  -wal/-shm leftovers) are removed so the directory mirrors the snapshot exactly.
+  An empty listing changes nothing: it is never taken as an empty snapshot.
+
+Set CHROMA_BUCKET_LOCAL_DIR to a directory laid out like the bucket to use it as
+a stand-in (offline benchmarking / local dev).
+
+Benchmark:
+    python -m api.bucket_sync <gs://bucket | local_dir> <prefix> <dest_dir> [--workers N]
+"""
+import os
+import sys
+import json
+import time
+import base64
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+GCS_BUCKET_NAME = os.getenv("GCS_BUCKET_NAME", "agent-factory-database")
+CHROMA_BUCKET_LOCAL_DIR = os.getenv("CHROMA_BUCKET_LOCAL_DIR")
+CHROMA_DOWNLOAD_WORKERS = max(1, int(os.getenv("CHROMA_DOWNLOAD_WORKERS", "8")))
+CHROMA_DOWNLOAD_CHUNK_BYTES = max(1, int(os.getenv("CHROMA_DOWNLOAD_CHUNK_MB", "32"))) * 1024 * 1024
+
+MANIFEST_NAME = ".sync_manifest.json"
+
+
+class GCSSource:
+    """Blobs from a GCS bucket."""
+
+    def __init__(self, bucket_name=GCS_BUCKET_NAME):
+        self.bucket_name = bucket_name
+        self._local = threading.local()
+
+    def _bucket(self):
+        # One client per thread: storage.Client is not documented as thread-safe
+        if not hasattr(self._local, "bucket"):
+            from google.cloud import storage
+            self._local.client = storage.Client()
+            self._local.bucket = self._local.client.bucket(self.bucket_name)
+        return self._local.bucket
+
+    def describe(self):
+        return f"gs://{self.bucket_name}"
+
+    def list_prefixes(self):
+        bucket = self._bucket()
+        blobs = self._local.client.list_blobs(bucket, delimiter="/")
+        # Must consume the iterator to populate prefixes
+        _ = list(blobs)
+        return [p.rstrip("/") for p in blobs.prefixes]
+
+    def list_blobs(self, prefix):
+        bucket = self._bucket()
+        return [
+            {"name": b.name, "size": b.size or 0, "generation": b.generation, "crc32c": b.crc32c}
+            for b in self._local.client.list_blobs(bucket, prefix=prefix)
+            if not b.name.endswith("/")
+        ]
+
+    def download_file(self, info, local_path):
+        self._bucket().blob(info["name"], generation=info["generation"]).download_to_filename(local_path)
+
+    def read_range(self, info, start, end):
+        """Bytes [start, end] (inclusive, like the GCS API)."""
+        blob = self._bucket().blob(info["name"], generation=info["generation"])
+        return blob.download_as_bytes(start=start, end=end)
+
+    def open_read(self, info):
+        """Sequential binary stream of a blob (chunked reads, not loaded whole)."""
+        blob = self._bucket().blob(info["name"], generation=info["generation"])
+        return blob.open("rb", chunk_size=CHROMA_DOWNLOAD_CHUNK_BYTES)
+
+
+class LocalDirSource:
+    """A local directory laid out like the bucket (stand-in for offline benchmarks)."""
+
+    def __init__(self, root):
+        self.root = os.path.abspath(root)
+
+    def describe(self):
+        return self.root
+
+    def list_prefixes(self):
+        return sorted(d for d in os.listdir(self.root) if os.path.isdir(os.path.join(self.root, d)))
+
+    def list_blobs(self, prefix):
+        base = os.path.join(self.root, prefix.replace("/", os.sep))
+        blobs = []
+        for dirpath, _, filenames in os.walk(base):
+            for filename in filenames:
+                path = os.path.join(dirpath, filename)
+                stat = os.stat(path)
+                name = os.path.relpath(path, self.root).replace(os.sep, "/")
+                blobs.append({"name": name, "size": stat.st_size, "generation": stat.st_mtime_ns, "crc32c": None})
+        return blobs
+
+    def _path(self, info):
+        return os.path.join(self.root, info["name"].replace("/", os.sep))
+
+    def download_file(self, info, local_path):
+        with open(self._path(info), "rb") as src, open(local_path, "wb") as dst:
+            while True:
+                block = src.read(1024 * 1024)
+                if not block:
+                    break
+                dst.write(block)
+
+    def read_range(self, info, start, end):
+        with open(self._path(info), "rb") as f:
+            f.seek(start)
+            return f.read(end - start + 1)
+
+    def open_read(self, info):
+        return open(self._path(info), "rb")
+
+
+def get_bucket_source():
+    """Bucket source configured for this process (GCS, or CHROMA_BUCKET_LOCAL_DIR)."""
+    if CHROMA_BUCKET_LOCAL_DIR:
+        return LocalDirSource(CHROMA_BUCKET_LOCAL_DIR)
+    return GCSSource()
+
+
+def _load_manifest(local_dir):
+    try:
+        with open(os.path.join(local_dir, MANIFEST_NAME), "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def _is_unchanged(info, entry, local_path):
+    if not entry or not os.path.exists(local_path):
+        return False
+    if os.path.getsize(local_path) != info["size"]:
+        return False
+    if info.get("crc32c") and entry.get("crc32c") == info["crc32c"]:
+        return True
+    return entry.get("generation") == info["generation"]
+
+
+def _crc32c_matches(path, expected):
+    """Verify a downloaded file against the bucket's base64 crc32c (skipped if google_crc32c is missing)."""
+    if not expected:
+        return True
+    try:
+        import google_crc32c
+    except ImportError:
+        return True
+    checksum = google_crc32c.Checksum()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(4 * 1024 * 1024), b""):
+            checksum.update(block)
+    return base64.b64encode(checksum.digest()).decode("ascii") == expected
+
+
+def prefix_is_current(source, prefix, local_dir):
+    """Whether local_dir already mirrors every blob under prefix (per its sync manifest)."""
+    blobs = source.list_blobs(prefix)
+    manifest = _load_manifest(local_dir)
+    return bool(blobs) and all(
+        _is_unchanged(info, manifest.get(info["name"][len(prefix):]),
+                      os.path.join(local_dir, info["name"][len(prefix):].replace("/", os.sep)))
+        for info in blobs
+    )
+
+
+def sync_prefix(source, prefix, local_dir, workers=None, chunk_bytes=None, progress=None):
+    """
+    Mirror every blob under prefix into local_dir.
+    progress(n_bytes) is called as bytes arrive (from worker threads).
+    Returns stats: files, downloaded, skipped, removed, bytes, seconds.
+    """
+    workers = workers or CHROMA_DOWNLOAD_WORKERS
+    chunk_bytes = chunk_bytes or CHROMA_DOWNLOAD_CHUNK_BYTES
+    started = time.perf_counter()
+    os.makedirs(local_dir, exist_ok=True)
+
+    blobs = source.list_blobs(prefix)
+    if not blobs:
+        # An empty (or failed, or misconfigured) listing is no snapshot: leave
+        # local_dir, which may be the live copy, and its manifest untouched
+        return {"files": 0, "downloaded": 0, "skipped": 0, "removed": 0, "bytes": 0,
+                "seconds": round(time.perf_counter() - started, 3)}
+    manifest = _load_manifest(local_dir)
+    new_manifest = {}
+    todo = []
+    for info in blobs:
+        relative_path = info["name"][len(prefix):]
+        local_path = os.path.join(local_dir, relative_path.replace("/", os.sep))
+        new_manifest[relative_path] = {"generation": info["generation"], "crc32c": info["crc32c"], "size": info["size"]}
+        if not _is_unchanged(info, manifest.get(relative_path), local_path):
+            todo.append((info, local_path))
+
+    # Anything local that is not in the snapshot is stale
+    removed = 0
+    wanted = {os.path.normcase(os.path.join(local_dir, p.replace("/", os.sep))) for p in new_manifest}
+    for dirpath, _, filenames in os.walk(local_dir):
+        for filename in filenames:
+            path = os.path.join(dirpath, filename)
+            if filename != MANIFEST_NAME and os.path.normcase(path) not in wanted:
+                os.remove(path)
+                removed += 1
+
+    downloaded_bytes = [0]
+    bytes_lock = threading.Lock()
+
+    def _report(n):
+        with bytes_lock:
+            downloaded_bytes[0] += n
+        if progress:
+            progress(n)
+
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="chroma-sync") as pool:
+        futures = []
+        for info, local_path in todo:
+            os.makedirs(os.path.dirname(local_path), exist_ok=True)
+            part_path = local_path + ".part"
+            if info["size"] > chunk_bytes:
+                # Pre-size the file, then fill ranges concurrently
+                with open(part_path, "wb") as f:
+                    f.truncate(info["size"])
+                ranges = [(s, min(s + chunk_bytes, info["size"]) - 1) for s in range(0, info["size"], chunk_bytes)]
+                range_futures = [pool.submit(_fetch_range, source, info, part_path, s, e, _report) for s, e in ranges]
+                futures.append((info, local_path, part_path, range_futures))
+            else:
+                futures.append((info, local_path, part_path, [pool.submit(_fetch_whole, source, info, part_path, _report)]))
+
+        for info, local_path, part_path, parts in futures:
+            for future in parts:
+                future.result()
+            if not _crc32c_matches(part_path, info.get("crc32c")):
+                os.remove(part_path)
+                raise IOError(f"crc32c mismatch for {info['name']}")
+            os.replace(part_path, local_path)
+
+    with open(os.path.join(local_dir, MANIFEST_NAME), "w", encoding="utf-8") as f:
+        json.dump(new_manifest, f)
+
+    return {
+        "files": len(blobs),
+        "downloaded": len(todo),
+        "skipped": len(blobs) - len(todo),
+        "removed": removed,
+        "bytes": downloaded_bytes[0],
+        "seconds": round(time.perf_counter() - started, 3),
+    }
+
+
+def _fetch_whole(source, info, part_path, report):
+    source.download_file(info, part_path)
+    report(info["size"])
+
+
+def _fetch_range(source, info, part_path, start, end, report):
+    data = source.read_range(info, start, end)
+    with open(part_path, "r+b") as f:
+        f.seek(start)
+        f.write(data)
+    report(len(data))
+
+
+# ─── CLI benchmark ───────────────────────────────────────────────────────────
+
+if __name__ == "__main__":
+    args = sys.argv[1:]
+    workers = None
+    if "--workers" in args:
+        i = args.index("--workers")
+        workers = int(args[i + 1])
+        del args[i:i + 2]
+    if len(args) != 3:
+        print("Usage: python -m api.bucket_sync <gs://bucket | local_dir> <prefix> <dest_dir> [--workers N]")
+        sys.exit(1)
+
+    src, prefix, dest = args
+    source = GCSSource(src[len("gs://"):].rstrip("/")) if src.startswith("gs://") else LocalDirSource(src)
+    stats = sync_prefix(source, prefix, dest, workers=workers)
+    mb = stats["bytes"] / (1024 * 1024)
+    rate = mb / stats["seconds"] if stats["seconds"] else 0.0
+    print(f"{source.describe()}/{prefix} -> {dest}")
+    print(f"  files: {stats['files']}  downloaded: {stats['downloaded']}  skipped: {stats['skipped']}  removed: {stats['removed']}")
+    print(f"  {mb:.1f} MB in {stats['seconds']} s ({rate:.1f} MB/s, workers={workers or CHROMA_DOWNLOAD_WORKERS})")
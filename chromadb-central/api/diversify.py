@@ -0,0 +1,148 @@
+"""
+Server-side diversification of /query results.
+
+Instead of shipping hundreds of near-duplicate hits to the agent, central fetches
+a larger candidate pool and returns only n_results diverse items. Query options:
+  - exclude_ids: list of ids to drop
+  - exclude_values: {metadata_key: [values]} to drop (e.g. already-recommended titles;
+    strings are compared case-insensitively)
+  - collapse_by: metadata key identifying the source document; keep its best chunk only
+  - max_per_key: {metadata_key: N}, e.g. {"auteur": 2}
+  - mmr_lambda: 0..1, maximal marginal relevance over the stored embeddings
+    (1 = pure relevance, 0 = pure novelty)
+  - candidates: size of the candidate pool (default DIVERSIFY_CANDIDATE_FACTOR x n_results)
+With exclusions, the result's "excluded" lists how many candidates of each row they
+dropped (0 means relaxing them can't bring more results back).
+"""
+import os
+import numpy as np
+
+DIVERSIFY_CANDIDATE_FACTOR = int(os.getenv("DIVERSIFY_CANDIDATE_FACTOR", "5"))
+DIVERSIFY_MAX_CANDIDATES = int(os.getenv("DIVERSIFY_MAX_CANDIDATES", "1000"))
+
+_OPTION_KEYS = ("exclude_ids", "exclude_values", "collapse_by", "max_per_key", "mmr_lambda")
+
+
+def wants_diversification(query):
+    return any(query.get(key) not in (None, [], {}) for key in _OPTION_KEYS)
+
+
+def diversify_options(query, n_results):
+    """Normalized diversification options of a query payload (None if it asks for none)."""
+    if not wants_diversification(query):
+        return None
+    mmr_lambda = query.get("mmr_lambda")
+    if mmr_lambda is not None:
+        mmr_lambda = float(mmr_lambda)
+        if not 0.0 <= mmr_lambda <= 1.0:
+            raise ValueError("mmr_lambda must be between 0 and 1")
+    candidates = query.get("candidates", n_results * DIVERSIFY_CANDIDATE_FACTOR)
+    return {
+        "exclude_ids": sorted(str(i) for i in query.get("exclude_ids") or []),
+        "exclude_values": {
+            key: sorted({_fold(v) for v in values})
+            for key, values in (query.get("exclude_values") or {}).items()
+        },
+        "collapse_by": query.get("collapse_by"),
+        "max_per_key": {key: int(n) for key, n in (query.get("max_per_key") or {}).items()},
+        "mmr_lambda": mmr_lambda,
+        "candidates": min(max(int(candidates), n_results), DIVERSIFY_MAX_CANDIDATES),
+    }
+
+
+def needs_metadatas(options):
+    return bool(options["exclude_values"] or options["collapse_by"] or options["max_per_key"])
+
+
+def _fold(value):
+    return value.strip().casefold() if isinstance(value, str) else value
+
+
+def _cosine_matrix(vectors):
+    matrix = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return matrix / norms
+
+
+def _mmr_order(query_embedding, embeddings, mmr_lambda):
+    """Yield indices of embeddings in MMR order (lazily: callers stop once they have enough)."""
+    if not len(embeddings):
+        return
+    candidates = _cosine_matrix(embeddings)
+    query_vec = _cosine_matrix([query_embedding])[0]
+    relevance = candidates @ query_vec
+    # Highest similarity of each candidate to anything already selected
+    redundancy = np.zeros(len(candidates), dtype=np.float32)
+    remaining = np.ones(len(candidates), dtype=bool)
+    for step in range(len(candidates)):
+        score = mmr_lambda * relevance - (1 - mmr_lambda) * redundancy
+        score[~remaining] = -np.inf
+        best = int(np.argmax(score))
+        remaining[best] = False
+        similarity = candidates @ candidates[best]
+        redundancy = similarity if step == 0 else np.maximum(redundancy, similarity)
+        yield best
+
+
+def has_exclusions(options):
+    return bool(options["exclude_ids"] or options["exclude_values"])
+
+
+def _not_excluded(ids, metadatas, options):
+    """Positions of one row of candidates that no exclusion drops."""
+    exclude_ids = set(options["exclude_ids"])
+    exclude_values = {key: set(values) for key, values in options["exclude_values"].items()}
+    metadatas = metadatas or [None] * len(ids)
+    kept = []
+    for i, item_id in enumerate(ids):
+        meta = metadatas[i] or {}
+        if item_id in exclude_ids:
+            continue
+        if any(_fold(meta.get(key)) in values for key, values in exclude_values.items()):
+            continue
+        kept.append(i)
+    return kept
+
+
+def count_excluded(ids, metadatas, options):
+    """How many candidates of one row the exclusions drop."""
+    return len(ids) - len(_not_excluded(ids, metadatas, options))
+
+
+def select_diverse(ids, metadatas, embeddings, query_embedding, options, n_results):
+    """
+    Pick up to n_results positions from one row of candidates (best first).
+    Filters (exclusions, collapse, max per key) are applied in relevance or MMR order.
+    """
+    metadatas = metadatas or [None] * len(ids)
+    eligible = _not_excluded(ids, metadatas, options)
+
+    if options["mmr_lambda"] is not None and embeddings is not None:
+        pool = eligible
+        order = _mmr_order(query_embedding, [embeddings[i] for i in pool], options["mmr_lambda"])
+        eligible = (pool[j] for j in order)
+
+    seen_documents = set()
+    per_key_counts = {key: {} for key in options["max_per_key"]}
+    selected = []
+    for i in eligible:
+        meta = metadatas[i] or {}
+        collapse_by = options["collapse_by"]
+        if collapse_by:
+            document_id = meta.get(collapse_by, ids[i])
+            if document_id in seen_documents:
+                continue
+        if any(per_key_counts[key].get(_fold(meta.get(key)), 0) >= n
+               for key, n in options["max_per_key"].items() if meta.get(key) is not None):
+            continue
+        if collapse_by:
+            seen_documents.add(document_id)
+        for key in options["max_per_key"]:
+            value = _fold(meta.get(key))
+            if value is not None:
+                per_key_counts[key][value] = per_key_counts[key].get(value, 0) + 1
+        selected.append(i)
+        if len(selected) >= n_results:
+            break
+    return selected
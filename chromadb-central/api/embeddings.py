@@ -0,0 +1,178 @@
+"""
+Central embedding service.
+
+Lets /query accept raw text: central embeds it with the project's model instead of
+every agent calling the gateway first. A two-level cache sits in front of the
+gateway, keyed by (model, normalized text):
+  - an in-process LRU (EMBEDDING_CACHE_MAX_ENTRIES, default 4096)
+  - a SQLite file shared by all workers of the instance (EMBEDDING_CACHE_PATH,
+    default .cache/embeddings.sqlite; set to "" to disable)
+Vectors are stored as float32.
+"""
+import os
+import re
+import sqlite3
+import hashlib
+import threading
+import unicodedata
+from array import array
+from collections import OrderedDict
+from dotenv import load_dotenv
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+load_dotenv(os.path.join(PROJECT_ROOT, ".env"), override=True)
+
+OPENAI_API_KEY = os.getenv("AI_GATEWAY_API_KEY") or os.getenv("OPENAI_API_KEY")
+OPENAI_API_BASE = os.getenv("AI_GATEWAY_BASE_URL", "https://ai-gateway.vercel.sh/v1")
+
+EMBEDDING_CACHE_MAX_ENTRIES = int(os.getenv("EMBEDDING_CACHE_MAX_ENTRIES", "4096"))
+EMBEDDING_CACHE_PATH = os.getenv("EMBEDDING_CACHE_PATH", os.path.join(PROJECT_ROOT, ".cache", "embeddings.sqlite"))
+
+_MEMORY_CACHE = OrderedDict()
+_LOCK = threading.Lock()
+_STATS = {"memory_hits": 0, "disk_hits": 0, "misses": 0, "api_calls": 0}
+
+_client = None
+_db = None
+_db_failed = False
+
+
+def normalize_text(text):
+    """Canonical form used both as cache key and as the text sent to the model."""
+    text = unicodedata.normalize("NFC", str(text))
+    return re.sub(r"\s+", " ", text).strip()
+
+
+def _cache_key(model, text):
+    return model, hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def _get_client():
+    global _client
+    if _client is None:
+        from openai import OpenAI
+        _client = OpenAI(api_key=OPENAI_API_KEY, base_url=OPENAI_API_BASE)
+    return _client
+
+
+def _get_db():
+    """Open the shared SQLite cache (best effort: disabled on any error)."""
+    global _db, _db_failed
+    if _db is not None or _db_failed or not EMBEDDING_CACHE_PATH:
+        return _db
+    try:
+        os.makedirs(os.path.dirname(EMBEDDING_CACHE_PATH), exist_ok=True)
+        db = sqlite3.connect(EMBEDDING_CACHE_PATH, timeout=5, check_same_thread=False)
+        db.execute("PRAGMA journal_mode=WAL")
+        db.execute(
+            "CREATE TABLE IF NOT EXISTS embeddings ("
+            " model TEXT NOT NULL, text_hash TEXT NOT NULL, vector BLOB NOT NULL,"
+            " PRIMARY KEY (model, text_hash))"
+        )
+        db.commit()
+        _db = db
+    except Exception as e:
+        print(f"[Embeddings] Disk cache disabled ({EMBEDDING_CACHE_PATH}): {e}", flush=True)
+        _db_failed = True
+    return _db
+
+
+def _remember(key, vector):
+    """Insert into the in-process LRU. Caller holds _LOCK."""
+    if EMBEDDING_CACHE_MAX_ENTRIES <= 0:
+        return
+    _MEMORY_CACHE[key] = vector
+    _MEMORY_CACHE.move_to_end(key)
+    while len(_MEMORY_CACHE) > EMBEDDING_CACHE_MAX_ENTRIES:
+        _MEMORY_CACHE.popitem(last=False)
+
+
+def embed_texts(texts, model):
+    """
+    Embed a list of texts with the given model, serving repeats from cache.
+    Misses are sent to the gateway in a single request.
+    Returns a list of float lists, in input order.
+    """
+    normalized = [normalize_text(t) for t in texts]
+    keys = [_cache_key(model, t) for t in normalized]
+    vectors = [None] * len(texts)
+    missing = []
+
+    with _LOCK:
+        for i, key in enumerate(keys):
+            vector = _MEMORY_CACHE.get(key)
+            if vector is not None:
+                _MEMORY_CACHE.move_to_end(key)
+                _STATS["memory_hits"] += 1
+                vectors[i] = vector
+            else:
+                missing.append(i)
+
+        db = _get_db() if missing else None
+        if db is not None:
+            still_missing = []
+            for i in missing:
+                try:
+                    row = db.execute(
+                        "SELECT vector FROM embeddings WHERE model = ? AND text_hash = ?", keys[i]
+                    ).fetchone()
+                except sqlite3.Error as e:
+                    print(f"[Embeddings] Disk cache read failed: {e}", flush=True)
+                    row = None
+                if row is None:
+                    still_missing.append(i)
+                    continue
+                vector = array("f")
+                vector.frombytes(row[0])
+                vectors[i] = vector.tolist()
+                _remember(keys[i], vectors[i])
+                _STATS["disk_hits"] += 1
+            missing = still_missing
+        _STATS["misses"] += len(missing)
+
+    if not missing:
+        return vectors
+
+    # Embed each distinct missing text once
+    unique = list(dict.fromkeys(normalized[i] for i in missing))
+    response = _get_client().embeddings.create(model=model, input=unique)
+    # Round to float32 so memory and disk hits return identical vectors
+    fresh = {text: array("f", item.embedding).tolist() for text, item in zip(unique, response.data)}
+
+    with _LOCK:
+        _STATS["api_calls"] += 1
+        db = _get_db()
+        for text, vector in fresh.items():
+            key = _cache_key(model, text)
+            _remember(key, vector)
+            if db is not None:
+                try:
+                    db.execute(
+                        "INSERT OR REPLACE INTO embeddings (model, text_hash, vector) VALUES (?, ?, ?)",
+                        (*key, array("f", vector).tobytes()),
+                    )
+                except sqlite3.Error as e:
+                    print(f"[Embeddings] Disk cache write failed: {e}", flush=True)
+        if db is not None:
+            try:
+                db.commit()
+            except sqlite3.Error as e:
+                print(f"[Embeddings] Disk cache commit failed: {e}", flush=True)
+
+    for i in missing:
+        vectors[i] = fresh[normalized[i]]
+    return vectors
+
+
+def embed_text(text, model):
+    """Embed a single text (see embed_texts)."""
+    return embed_texts([text], model)[0]
+
+
+def get_embedding_cache_stats():
+    with _LOCK:
+        stats = dict(_STATS)
+        stats["memory_size"] = len(_MEMORY_CACHE)
+    stats["memory_max_entries"] = EMBEDDING_CACHE_MAX_ENTRIES
+    stats["disk_path"] = EMBEDDING_CACHE_PATH if _db is not None else None
+    return stats
@@ -0,0 +1,200 @@
+"""
+Exact brute-force search for small collections.
+
+Collections of at most EXACT_SEARCH_MAX_ITEMS items (default 5000, e.g. innovia's
+cctt) are snapshotted into a contiguous float32 matrix plus metadata columns when
+their project goes live. A query is then one matrix product instead of an HNSW +
+SQLite round trip, and the result is exact.
+
+When the snapshot is built, both paths are timed on stored vectors and the faster
+one becomes the collection's engine. EXACT_SEARCH_ENGINE=exact|hnsw forces it.
+Distances follow the collection's hnsw:space like Chroma does: squared L2,
+1 - cosine similarity, or 1 - inner product.
+"""
+import os
+import time
+import numpy as np
+
+EXACT_SEARCH_MAX_ITEMS = int(os.getenv("EXACT_SEARCH_MAX_ITEMS", "5000"))
+EXACT_SEARCH_ENGINE = os.getenv("EXACT_SEARCH_ENGINE", "auto").lower()  # auto | exact | hnsw
+EXACT_SEARCH_BENCH_QUERIES = int(os.getenv("EXACT_SEARCH_BENCH_QUERIES", "5"))
+
+_PAGE_SIZE = 1000
+
+
+class UnsupportedQuery(Exception):
+    """The exact engine can't answer this query (e.g. unknown where operator): use Chroma."""
+
+
+def _compare(op, value, operand):
+    if op == "$eq":
+        return value == operand
+    if op == "$ne":
+        return value != operand
+    if op == "$in":
+        return value in operand
+    if op == "$nin":
+        return value not in operand
+    # Ordering operators only apply to numbers (like Chroma)
+    if not isinstance(value, (int, float)) or isinstance(value, bool):
+        return False
+    if op == "$gt":
+        return value > operand
+    if op == "$gte":
+        return value >= operand
+    if op == "$lt":
+        return value < operand
+    if op == "$lte":
+        return value <= operand
+    raise UnsupportedQuery(f"where operator {op}")
+
+
+class ExactIndex:
+    """Read-only snapshot of a collection: embeddings matrix, documents and metadata columns."""
+
+    def __init__(self, ids, embeddings, documents, metadatas, space="l2"):
+        self.ids = list(ids)
+        self.matrix = np.ascontiguousarray(np.asarray(embeddings, dtype=np.float32))
+        self.documents = list(documents)
+        self.metadatas = list(metadatas)
+        self.space = space
+        if space == "cosine":
+            norms = np.linalg.norm(self.matrix, axis=1, keepdims=True)
+            norms[norms == 0] = 1.0
+            self._search_matrix = self.matrix / norms
+        else:
+            self._search_matrix = self.matrix
+        self._sq_norms = np.einsum("ij,ij->i", self.matrix, self.matrix) if space == "l2" else None
+        # Column per metadata key (None where an item lacks the key)
+        keys = {key for meta in self.metadatas for key in (meta or {})}
+        self.columns = {key: [(meta or {}).get(key) for meta in self.metadatas] for key in keys}
+        self.engine = "exact"
+        self.benchmark = None
+
+    def __len__(self):
+        return len(self.ids)
+
+    def _mask(self, where):
+        """Boolean mask of the items matching a Chroma where filter."""
+        mask = np.ones(len(self.ids), dtype=bool)
+        for key, condition in where.items():
+            if key == "$and":
+                for sub in condition:
+                    mask &= self._mask(sub)
+            elif key == "$or":
+                any_mask = np.zeros(len(self.ids), dtype=bool)
+                for sub in condition:
+                    any_mask |= self._mask(sub)
+                mask &= any_mask
+            elif key.startswith("$"):
+                raise UnsupportedQuery(f"where operator {key}")
+            else:
+                if not isinstance(condition, dict):
+                    condition = {"$eq": condition}
+                column = self.columns.get(key)
+                for op, operand in condition.items():
+                    if op in ("$ne", "$nin") and (column is None or None in column):
+                        # How items lacking the key match negations is Chroma's call
+                        raise UnsupportedQuery(f"{op} on partially missing key {key}")
+                    if column is None:
+                        mask &= False
+                        continue
+                    mask &= np.fromiter(
+                        (value is not None and _compare(op, value, operand) for value in column),
+                        dtype=bool, count=len(column),
+                    )
+        return mask
+
+    def _distances(self, queries):
+        if self.space == "cosine":
+            norms = np.linalg.norm(queries, axis=1, keepdims=True)
+            norms[norms == 0] = 1.0
+            return 1.0 - (queries / norms) @ self._search_matrix.T
+        if self.space == "ip":
+            return 1.0 - queries @ self._search_matrix.T
+        # Squared L2 = |q|^2 - 2 q.x + |x|^2
+        q_sq = np.einsum("ij,ij->i", queries, queries)[:, None]
+        return np.maximum(q_sq - 2.0 * (queries @ self.matrix.T) + self._sq_norms[None, :], 0.0)
+
+    def query(self, query_embeddings, n_results=10, include=("documents", "metadatas", "distances"), where=None, **kwargs):
+        """Same arguments and result shape as collection.query()."""
+        if kwargs.get("where_document"):
+            raise UnsupportedQuery("where_document")
+        queries = np.asarray(query_embeddings, dtype=np.float32)
+        if queries.ndim != 2 or queries.shape[1] != self.matrix.shape[1]:
+            raise UnsupportedQuery(f"query dimension {queries.shape[-1]} != {self.matrix.shape[1]}")
+
+        candidates = np.nonzero(self._mask(where))[0] if where else None
+        distances = self._distances(queries)
+        if candidates is not None:
+            distances = distances[:, candidates]
+
+        results = {"ids": [], "distances": [], "documents": [], "metadatas": [], "embeddings": []}
+        k = min(int(n_results), distances.shape[1])
+        for row in distances:
+            top = np.argpartition(row, k - 1)[:k] if 0 < k < len(row) else np.arange(len(row))[:k]
+            top = top[np.argsort(row[top], kind="stable")]
+            positions = candidates[top] if candidates is not None else top
+            results["ids"].append([self.ids[p] for p in positions])
+            results["distances"].append([float(row[t]) for t in top])
+            results["documents"].append([self.documents[p] for p in positions])
+            results["metadatas"].append([self.metadatas[p] for p in positions])
+            results["embeddings"].append(self.matrix[positions].tolist())
+
+        for key in ("distances", "documents", "metadatas", "embeddings"):
+            if key not in include:
+                results[key] = None
+        results["included"] = list(include)
+        return results
+
+
+def build_exact_index(collection):
+    """Snapshot a collection (paged reads). Returns None if it is empty or above EXACT_SEARCH_MAX_ITEMS."""
+    count = collection.count()
+    if count == 0 or count > EXACT_SEARCH_MAX_ITEMS:
+        return None
+    ids, embeddings, documents, metadatas = [], [], [], []
+    offset = 0
+    while offset < count:
+        page = collection.get(include=["embeddings", "documents", "metadatas"], limit=_PAGE_SIZE, offset=offset)
+        page_ids = page.get("ids") or []
+        if not page_ids:
+            break
+        ids.extend(page_ids)
+        embeddings.extend(page["embeddings"])
+        documents.extend(page.get("documents") or [None] * len(page_ids))
+        metadatas.extend(page.get("metadatas") or [None] * len(page_ids))
+        offset += len(page_ids)
+    space = (getattr(collection, "metadata", None) or {}).get("hnsw:space", "l2")
+    return ExactIndex(ids, embeddings, documents, metadatas, space=space)
+
+
+def _median_ms(fn, queries):
+    timings = []
+    for query in queries:
+        started = time.perf_counter()
+        fn(query)
+        timings.append((time.perf_counter() - started) * 1000)
+    timings.sort()
+    return round(timings[len(timings) // 2], 3)
+
+
+def benchmark_engines(collection, index, n_results=10):
+    """
+    Time Chroma (HNSW) vs the exact index on stored vectors and set index.engine
+    to the faster one (unless EXACT_SEARCH_ENGINE forces it). Returns the timings.
+    """
+    sample = [index.matrix[i].tolist() for i in range(min(EXACT_SEARCH_BENCH_QUERIES, len(index)))]
+    k = min(n_results, len(index))
+    # First call of each path pages things in; don't count it
+    collection.query(query_embeddings=[sample[0]], n_results=k, include=["distances"])
+    index.query([sample[0]], n_results=k, include=["distances"])
+    hnsw_ms = _median_ms(lambda q: collection.query(query_embeddings=[q], n_results=k, include=["distances"]), sample)
+    exact_ms = _median_ms(lambda q: index.query([q], n_results=k, include=["distances"]), sample)
+
+    if EXACT_SEARCH_ENGINE in ("exact", "hnsw"):
+        index.engine = EXACT_SEARCH_ENGINE
+    else:
+        index.engine = "exact" if exact_ms <= hnsw_ms else "hnsw"
+    index.benchmark = {"items": len(index), "hnsw_ms": hnsw_ms, "exact_ms": exact_ms, "engine": index.engine}
+    return index.benchmark
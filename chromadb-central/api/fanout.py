@@ -0,0 +1,142 @@
+"""
+Fan-out search: one /query call over several collections (and/or projects).
+
+Payload ("sources" replaces collection_name):
+    {
+      "project_name": "innovia",                          # default project of the sources
+      "query": {"query_text": "chimie verte bois", "n_results": 10},
+      "sources": [
+        {"collection_name": "cctt", "quota": 6},
+        {"collection_name": "funding", "quota": 4, "query": {"where": {"type": "subvention"}}},
+        {"project_name": "nutria", "collection_name": "gdrive_documents", "name": "nutria"}
+      ]
+    }
+
+Each source is searched concurrently (one query-executor slot each) with the base
+query, overridden by its own "query" keys, for its quota of results (default: the
+base n_results). The rows are then merged by ascending distance: at most "quota"
+items per source, n_results in total. Every merged item carries a provenance tag
+({"source", "project_name", "collection_name", "rank"}) in the parallel
+"provenance" lists, and "sources" reports what each source returned (or its error).
+
+Distances are only comparable between collections embedded with the same model
+and storage profile. Items without a distance (lexical-only hybrid hits) rank last.
+"""
+import os
+
+FANOUT_MAX_SOURCES = max(1, int(os.getenv("FANOUT_MAX_SOURCES", "8")))
+
+# Per-row fields carried over from the source results
+_ROW_KEYS = ("distances", "documents", "metadatas", "embeddings", "scores")
+
+
+def source_label(source, project_name):
+    """Provenance label of a source: its "name", else "<project>/<collection>"."""
+    return source.get("name") or f"{source.get('project_name') or project_name}/{source['collection_name']}"
+
+
+def plan_sources(payload):
+    """
+    One search per source: [{label, project_name, collection_name, query, quota}]
+    plus the merged n_results. Raises ValueError on an invalid "sources" list.
+    """
+    sources = payload.get("sources")
+    if not isinstance(sources, list) or not sources:
+        raise ValueError("sources must be a non-empty list")
+    if len(sources) > FANOUT_MAX_SOURCES:
+        raise ValueError(f"At most {FANOUT_MAX_SOURCES} sources per query (got {len(sources)})")
+
+    base_query = payload.get("query")
+    if isinstance(base_query, str):
+        base_query = {"query_text": base_query}
+    base_query = dict(base_query or {})
+    n_results = int(base_query.get("n_results", 10))
+
+    plans = []
+    labels = set()
+    for source in sources:
+        if not isinstance(source, dict) or not source.get("collection_name"):
+            raise ValueError("Each source needs a collection_name")
+        project_name = source.get("project_name") or payload.get("project_name")
+        if not project_name:
+            raise ValueError(f"No project_name for source {source['collection_name']!r}")
+        label = source_label(source, project_name)
+        if label in labels:
+            raise ValueError(f"Duplicate source {label!r} (give one a distinct 'name')")
+        labels.add(label)
+
+        quota = min(int(source.get("quota", n_results)), n_results)
+        query = dict(base_query, **(source.get("query") or {}))
+        # The merge ranks by distance
+        include = list(query.get("include", ["documents"]))
+        if "distances" not in include:
+            include.append("distances")
+        query.update(n_results=quota, include=include)
+        plans.append({
+            "label": label,
+            "project_name": project_name,
+            "collection_name": source["collection_name"],
+            "query": query,
+            "quota": quota,
+        })
+    return plans, n_results
+
+
+def merge_source_results(plans, results, n_results):
+    """
+    Merge the per-source results (same order as plans) row by row by ascending
+    distance, at most each source's quota, n_results per row.
+    """
+    summary = {}
+    usable = []
+    for plan, result in zip(plans, results):
+        if not isinstance(result, dict) or "error" in result or result.get("ids") is None:
+            error = result.get("error") if isinstance(result, dict) else str(result)
+            summary[plan["label"]] = {"error": error or "no result"}
+            continue
+        summary[plan["label"]] = {"returned": sum(len(row) for row in result["ids"]), "merged": 0}
+        usable.append((plan, result))
+
+    if not usable:
+        return {"error": "All sources failed", "sources": summary}
+
+    row_keys = [key for key in _ROW_KEYS if any(result.get(key) is not None for _, result in usable)]
+    merged = {"ids": [], "provenance": []}
+    for key in row_keys:
+        merged[key] = []
+
+    n_rows = max(len(result["ids"]) for _, result in usable)
+    for row in range(n_rows):
+        candidates = []
+        for order, (plan, result) in enumerate(usable):
+            if row >= len(result["ids"]):
+                continue
+            distances = result["distances"][row] if result.get("distances") is not None else None
+            for rank in range(min(len(result["ids"][row]), plan["quota"])):
+                distance = distances[rank] if distances is not None else None
+                candidates.append((distance is None, distance or 0.0, order, rank, plan, result))
+        candidates.sort(key=lambda c: c[:4])
+
+        merged["ids"].append([])
+        merged["provenance"].append([])
+        for key in row_keys:
+            merged[key].append([])
+        for _, _, _, rank, plan, result in candidates[:n_results]:
+            merged["ids"][row].append(result["ids"][row][rank])
+            merged["provenance"][row].append({
+                "source": plan["label"],
+                "project_name": plan["project_name"],
+                "collection_name": plan["collection_name"],
+                "rank": rank,
+            })
+            for key in row_keys:
+                values = result.get(key)
+                merged[key][row].append(values[row][rank] if values is not None else None)
+            summary[plan["label"]]["merged"] += 1
+
+    included = []
+    for _, result in usable:
+        included.extend(result.get("included") or [])
+    merged["included"] = list(dict.fromkeys(included))
+    merged["sources"] = summary
+    return merged
@@ -1,25 +1,119 @@
 import json
 import os
+import threading
+import unicodedata
+from functools import lru_cache
+from types import MappingProxyType
 
 PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 
-# Cache des graphes chargés
+# Maximum nodes returned by a multi_hop traversal
+MULTI_HOP_MAX_NODES = int(os.getenv("GRAPH_MULTI_HOP_MAX_NODES", "500"))
+
+# Cache des graphes chargés (un ProjectGraph immuable par projet)
 _GRAPH_CACHE = {}
+_GRAPH_LOCK = threading.Lock()
+
+
+def normalize(text):
+
+    return ''.join(
+        c for c in unicodedata.normalize('NFD', text)
+        if unicodedata.category(c) != 'Mn'
+    ).lower()
+
+
+@lru_cache(maxsize=4096)
+def _normalize_query(text):
+    return normalize(text)
 
-# Graph actif
-_CURRENT_GRAPH = None
 
+def _trigrams(text):
+    return {text[i:i + 3] for i in range(len(text) - 2)}
 
-def set_graph(project_name):
+
+class ProjectGraph:
     """
-    Charge le graph correspondant au projet
+    Immutable graph of one project, built once from graph.json and shared
+    read-only across threads. Holds:
+      - normalized label per node, and a trigram index over those labels
+        (substring lookups without re-normalizing every label on each call)
+      - adjacency lists keyed by source node and edge type
+    Accepts both {label, source, target} and {name, from, to} field names.
     """
-    global _CURRENT_GRAPH
-
-    if project_name in _GRAPH_CACHE:
-        _CURRENT_GRAPH = _GRAPH_CACHE[project_name]
-        return _CURRENT_GRAPH
 
+    __slots__ = ("project_name", "raw", "node_order", "node_types", "norm_labels",
+                 "trigram_index", "adjacency", "_position", "_frozen")
+
+    def __init__(self, project_name, graph):
+        node_order = []
+        node_types = {}
+        norm_labels = {}
+        trigram_index = {}
+        adjacency = {}
+
+        for node in graph.get("nodes", []):
+            node_id = node["id"]
+            node_order.append(node_id)
+            node_types[node_id] = node.get("type")
+            norm_label = normalize(node.get("label") or node.get("name") or "")
+            norm_labels[node_id] = norm_label
+            for gram in _trigrams(norm_label):
+                trigram_index.setdefault(gram, set()).add(node_id)
+
+        for edge in graph.get("edges", []):
+            source = edge.get("source", edge.get("from"))
+            target = edge.get("target", edge.get("to"))
+            by_type = adjacency.setdefault(source, {})
+            by_type.setdefault(edge.get("type"), []).append(target)
+            # None key = any edge type
+            by_type.setdefault(None, []).append(target)
+
+        self.project_name = project_name
+        self.raw = graph  # parsed graph.json, for the /graph route (read-only)
+        self.node_order = tuple(node_order)
+        self.node_types = MappingProxyType(node_types)
+        self.norm_labels = MappingProxyType(norm_labels)
+        self.trigram_index = MappingProxyType({g: frozenset(ids) for g, ids in trigram_index.items()})
+        self.adjacency = MappingProxyType({
+            source: MappingProxyType({t: tuple(targets) for t, targets in by_type.items()})
+            for source, by_type in adjacency.items()
+        })
+        self._position = MappingProxyType({node_id: i for i, node_id in enumerate(node_order)})
+        self._frozen = True
+
+    def __setattr__(self, name, value):
+        if getattr(self, "_frozen", False):
+            raise AttributeError("ProjectGraph is immutable")
+        object.__setattr__(self, name, value)
+
+    def match(self, names, node_types=None):
+        """Node ids whose normalized label contains any normalized name, in graph order."""
+        found = set()
+        for name in names:
+            norm_query = _normalize_query(name)
+            grams = _trigrams(norm_query)
+            if grams:
+                postings = sorted((self.trigram_index.get(g, frozenset()) for g in grams), key=len)
+                candidates = frozenset.intersection(*postings) if postings[0] else frozenset()
+            else:
+                # Queries shorter than a trigram: check every label
+                candidates = self.norm_labels.keys()
+            for node_id in candidates:
+                if norm_query in self.norm_labels[node_id]:
+                    found.add(node_id)
+        if node_types:
+            found = {n for n in found if self.node_types.get(n) in node_types}
+        return sorted(found, key=self._position.get)
+
+    def neighbors(self, node_id, edge_type=None):
+        return self.adjacency.get(node_id, {}).get(edge_type, ())
+
+
+def load_graph(project_name):
+    """
+    Lit le graph.json du projet (dict brut)
+    """
     graph_path = os.path.join(
         PROJECT_ROOT,
         "knowledge-base",
@@ -31,73 +125,72 @@ def set_graph(project_name):
         raise FileNotFoundError(f"Graph file not found for project '{project_name}'")
 
     with open(graph_path, encoding="utf-8") as f:
-        graph = json.load(f)
+        return json.load(f)
 
-    _GRAPH_CACHE[project_name] = graph
-    _CURRENT_GRAPH = graph
-
-    print(f"[Graph] Loaded graph for project '{project_name}'", flush=True)
 
+def get_project_graph(project_name):
+    """
+    Retourne le graph du projet, construit une seule fois puis partagé entre threads
+    """
+    graph = _GRAPH_CACHE.get(project_name)
+    if graph is not None:
+        return graph
+
+    with _GRAPH_LOCK:
+        graph = _GRAPH_CACHE.get(project_name)
+        if graph is None:
+            graph = ProjectGraph(project_name, load_graph(project_name))
+            _GRAPH_CACHE[project_name] = graph
+            print(f"[Graph] Loaded graph for project '{project_name}' ({len(graph.node_order)} nodes)", flush=True)
     return graph
 
 
-def get_graph():
-    if _CURRENT_GRAPH is None:
-        raise ValueError("Graph not set. Call set_graph(project_name) first.")
-    return _CURRENT_GRAPH
-
 def preload_graphs(projects):
     for p in projects:
         try:
-            set_graph(p)
+            get_project_graph(p)
         except Exception as e:
             print(f"[Graph preload] Failed for {p}: {e}")
 
-import unicodedata
-
-def normalize(text):
-
-    return ''.join(
-        c for c in unicodedata.normalize('NFD', text)
-        if unicodedata.category(c) != 'Mn'
-    ).lower()
-
-def find_nodes_matches(names,nodes_search=None):
+def find_nodes_matches(graph, names, nodes_search=None):
     """
-    graph: dict loaded from graph.json
+    graph: ProjectGraph (see get_project_graph)
     names: list of strings to match (e.g. ['sciences pures', 'nature et sante'])
+    nodes_search: optional list of node types to restrict the search to
     Returns: list of node ids with partial match in label
     """
-    graph = get_graph()
-
-    
-    matches = []
-    for node in graph.get('nodes', []):
-        if not nodes_search or node.get('type') in nodes_search:
-            label = node.get('label', '')
-            norm_label = normalize(label)
-            for query in names:
-                norm_query = normalize(query)
-                if norm_query in norm_label:
-                    matches.append(node['id'])
-    return matches
-
-def find_neighbors(node_ids, edge_type=None):
-    graph = get_graph()
-    results = []
-
-    for edge in graph["edges"]:
-        if edge["source"] in node_ids:
-            if edge_type is None or edge["type"] == edge_type:
-                results.append(edge["target"])
+    return graph.match(names, nodes_search)
 
-    return list(set(results))
+def find_neighbors(graph, node_ids, edge_type=None):
+    results = set()
+    for node_id in node_ids:
+        results.update(graph.neighbors(node_id, edge_type))
+    return list(results)
 
 
-def multi_hop(start_nodes, path):
-    current = []
-    for edge_type in path:
-        current += find_neighbors(start_nodes, edge_type)
-
-    return list(set(current))
-
+def multi_hop(graph, start_nodes, path, max_nodes=MULTI_HOP_MAX_NODES):
+    """
+    Bounded breadth-first traversal: hop i follows edges of type path[i]
+    (None = any type) from the nodes reached at hop i-1.
+    Returns the newly reached node ids in visit order, at most max_nodes.
+    """
+    visited = set(start_nodes)
+    frontier = list(dict.fromkeys(start_nodes))
+    reached = []
+
+    for edge_type in path or []:
+        next_frontier = []
+        for node_id in frontier:
+            for target in graph.neighbors(node_id, edge_type):
+                if target in visited:
+                    continue
+                visited.add(target)
+                next_frontier.append(target)
+                reached.append(target)
+                if len(reached) >= max_nodes:
+                    return reached
+        if not next_frontier:
+            break
+        frontier = next_frontier
+
+    return reached
@@ -0,0 +1,139 @@
+"""
+Lexical (BM25) retrieval and rank fusion for hybrid /query.
+
+Each collection gets an in-memory inverted index built from its stored
+documents plus the string values of their metadata (titles, authors, CCTT
+names...), so exact-name queries can be found without a huge n_results.
+Vector and lexical rankings are merged with weighted reciprocal rank fusion:
+
+    score(id) = sum_i  weight_i / (HYBRID_RRF_K + rank_i(id))
+
+Tuning (env, overridable per query):
+  - HYBRID_RRF_K (default 60)
+  - HYBRID_VECTOR_WEIGHT / HYBRID_LEXICAL_WEIGHT (default 1.0 / 1.0)
+  - HYBRID_CANDIDATES: results taken from each retriever before fusion (default 50)
+"""
+import os
+import re
+import math
+import heapq
+import unicodedata
+
+HYBRID_RRF_K = int(os.getenv("HYBRID_RRF_K", "60"))
+HYBRID_VECTOR_WEIGHT = float(os.getenv("HYBRID_VECTOR_WEIGHT", "1.0"))
+HYBRID_LEXICAL_WEIGHT = float(os.getenv("HYBRID_LEXICAL_WEIGHT", "1.0"))
+HYBRID_CANDIDATES = int(os.getenv("HYBRID_CANDIDATES", "50"))
+
+# BM25 parameters (usual defaults)
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+# Documents read per collection.get() call while building an index
+_PAGE_SIZE = 1000
+
+_TOKEN_RE = re.compile(r"\w+")
+
+# Mots vides FR/EN les plus fréquents (sinon ils dominent les postings)
+_STOPWORDS = frozenset("""
+    le la les un une des du de d l et ou en au aux a ce ces cet cette dans par pour sur avec sans
+    qui que quoi dont est sont pas plus ne se sa son ses leur leurs il elle ils elles on nous vous
+    je tu me te y
+    the an and or of to in on for with by is are be as at it its this that from not
+""".split())
+
+
+def tokenize(text):
+    """Lowercase, accent-free word tokens without stopwords."""
+    text = unicodedata.normalize("NFD", str(text or ""))
+    text = "".join(c for c in text if unicodedata.category(c) != "Mn").lower()
+    return [t for t in _TOKEN_RE.findall(text) if t not in _STOPWORDS and (len(t) > 1 or t.isdigit())]
+
+
+class BM25Index:
+    """Okapi BM25 over a fixed set of (id, text) pairs. Read-only once built."""
+
+    def __init__(self, ids, texts):
+        self.ids = list(ids)
+        postings = {}
+        lengths = []
+        for i, text in enumerate(texts):
+            tokens = tokenize(text)
+            lengths.append(len(tokens))
+            counts = {}
+            for token in tokens:
+                counts[token] = counts.get(token, 0) + 1
+            for token, tf in counts.items():
+                postings.setdefault(token, []).append((i, tf))
+
+        n_docs = len(self.ids)
+        self.postings = postings
+        self.lengths = lengths
+        self.avg_length = (sum(lengths) / n_docs) if n_docs and sum(lengths) else 1.0
+        self.idf = {
+            token: math.log(1 + (n_docs - len(p) + 0.5) / (len(p) + 0.5))
+            for token, p in postings.items()
+        }
+
+    def __len__(self):
+        return len(self.ids)
+
+    def search(self, text, n_results):
+        """Top n_results (id, score) pairs for text, best first."""
+        scores = {}
+        for token in set(tokenize(text)):
+            posting = self.postings.get(token)
+            if not posting:
+                continue
+            idf = self.idf[token]
+            for i, tf in posting:
+                norm = BM25_K1 * (1 - BM25_B + BM25_B * self.lengths[i] / self.avg_length)
+                scores[i] = scores.get(i, 0.0) + idf * tf * (BM25_K1 + 1) / (tf + norm)
+        top = heapq.nlargest(n_results, scores.items(), key=lambda item: (item[1], -item[0]))
+        return [(self.ids[i], round(score, 4)) for i, score in top]
+
+
+def _index_text(document, metadata):
+    """Text indexed for one item: the document plus its string metadata values."""
+    parts = [document or ""]
+    for value in (metadata or {}).values():
+        if isinstance(value, str):
+            parts.append(value)
+    return " ".join(parts)
+
+
+def build_bm25_index(collection):
+    """Read every stored document of a Chroma collection (paged) and index it."""
+    ids = []
+    texts = []
+    offset = 0
+    while True:
+        page = collection.get(include=["documents", "metadatas"], limit=_PAGE_SIZE, offset=offset)
+        page_ids = page.get("ids") or []
+        if not page_ids:
+            break
+        documents = page.get("documents") or [None] * len(page_ids)
+        metadatas = page.get("metadatas") or [None] * len(page_ids)
+        for item_id, document, metadata in zip(page_ids, documents, metadatas):
+            ids.append(item_id)
+            texts.append(_index_text(document, metadata))
+        offset += len(page_ids)
+        if len(page_ids) < _PAGE_SIZE:
+            break
+    return BM25Index(ids, texts)
+
+
+def reciprocal_rank_fusion(rankings, weights=None, k=None):
+    """
+    Fuse several rankings (lists of ids, best first) into one.
+    Returns [(id, score)] by decreasing fused score; ties keep first-seen order.
+    """
+    k = HYBRID_RRF_K if k is None else k
+    weights = weights or [1.0] * len(rankings)
+    scores = {}
+    for ranking, weight in zip(rankings, weights):
+        if not weight:
+            continue
+        for rank, item_id in enumerate(ranking, start=1):
+            scores[item_id] = scores.get(item_id, 0.0) + weight / (k + rank)
+    order = {item_id: i for i, item_id in enumerate(scores)}
+    return sorted(scores.items(), key=lambda item: (-item[1], order[item[0]]))
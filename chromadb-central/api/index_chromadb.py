@@ -16,17 +16,34 @@ Usage:
 
     # Standalone:
     python -m api.index_chromadb nutria
+    python -m api.index_chromadb nutria --full   # drop and rebuild the collection
+
+Re-indexing is incremental: each chunk stores a hash of its text + embedding
+model, and only new or changed chunks are embedded again.
+
+Text extraction runs on a process pool (EXTRACTION_WORKERS, default: CPU count)
+and is cached under knowledge-base/<project>/extracted_texts/cache/, keyed by
+file path, size, mtime and content hash: unchanged files are never parsed again.
 """
 
 import json
 import os
 import sys
+import time
+import hashlib
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
 from datetime import datetime
 from dotenv import load_dotenv
 import chromadb
 from chromadb.config import Settings
 from chromadb.utils import embedding_functions
+from openai import OpenAI
+from api.embedding_pipeline import embed_texts_concurrently, EMBEDDING_MAX_CONCURRENCY
+from api.json_stream import iter_json_records, write_json_documents
+from api.storage_profile import apply_profile, collection_profile
+from api.snapshot_bundle import build_bundle
+from api.inventory import load_inventory, write_inventory
 
 # Locate .env
 SCRIPT_DIR = Path(__file__).parent
@@ -44,6 +61,18 @@ _EMBEDDING_MODELS = {
 }
 _DEFAULT_EMBEDDING_MODEL = "text-embedding-3-large"
 
+# Per-project storage profile (default: full dimensions, float32). Shortened
+# vectors make the index, its download and searches smaller roughly in
+# proportion; check the recall cost first: python -m api.storage_profile <project>
+_STORAGE_PROFILES = {
+    # "bibliosense": {"dimensions": 1024, "precision": "float32"},
+}
+_DEFAULT_STORAGE_PROFILE = {"dimensions": None, "precision": "float32"}
+
+EXTRACTION_WORKERS = int(os.getenv("EXTRACTION_WORKERS", "0")) or (os.cpu_count() or 1)
+# Bump when a reader's output changes, to invalidate cached extractions
+_EXTRACTION_CACHE_VERSION = 1
+
 
 # ─── File readers ────────────────────────────────────────────────────────────
 
@@ -65,20 +94,17 @@ def read_txt(path):
         return f.read().strip()
 
 
-def read_json_as_documents(path):
-    """Read a JSON file and return a list of {id, text, metadata} dicts.
+def iter_json_documents(path):
+    """Stream a JSON/JSONL file as {id, text, metadata} dicts, one record at a time.
 
     Handles multiple JSON layouts:
-      - Array of objects: each object becomes a document
+      - Array of objects (or JSONL): each object becomes a document
       - Object with "documents" key: standard transcripts_chromadb.json
       - Object with "data" key: dataset format (innovia-style)
       - Single object: treated as one document
     """
-    with open(path, "r", encoding="utf-8") as f:
-        data = json.load(f)
-
     filename = Path(path).stem
-    docs = []
+    source_name = Path(path).name
 
     def obj_to_text(obj):
         """Convert a dict/object to readable text."""
@@ -110,45 +136,42 @@ def read_json_as_documents(path):
                 meta[k] = str(v)
         return meta
 
-    if isinstance(data, list):
-        # Array of objects (e.g. book_dbase_*.json, cctt_docs.json)
-        for idx, item in enumerate(data):
+    for idx, (container, item) in enumerate(iter_json_records(path)):
+        if container is None:
+            # Array of objects (e.g. book_dbase_*.json, cctt_docs.json)
             doc_id = item.get("id", f"{filename}_{idx:04d}")
             text = item.get("text") or obj_to_text(item)
             meta = item.get("metadata", {})
             # Merge all source fields into metadata
-            meta = {**obj_to_metadata(item, Path(path).name), **meta}
-            docs.append({"id": str(doc_id), "text": text, "metadata": meta})
-
-    elif isinstance(data, dict):
-        if "documents" in data:
+            meta = {**obj_to_metadata(item, source_name), **meta}
+            yield {"id": str(doc_id), "text": text, "metadata": meta}
+        elif container == "documents":
             # transcripts_chromadb.json format
-            for item in data["documents"]:
-                docs.append({
-                    "id": item["id"],
-                    "text": item["text"],
-                    "metadata": item.get("metadata", {"source": Path(path).name}),
-                })
-        elif "data" in data:
+            yield {
+                "id": item["id"],
+                "text": item["text"],
+                "metadata": item.get("metadata", {"source": source_name}),
+            }
+        elif container == "data":
             # dataset format (e.g. dataset_RD_quebec_pro.json)
-            for idx, item in enumerate(data["data"]):
-                doc_id = item.get("id", f"{filename}_{idx:04d}")
-                text = obj_to_text(item)
-                meta = obj_to_metadata(item, Path(path).name)
-                docs.append({
-                    "id": str(doc_id),
-                    "text": text,
-                    "metadata": meta,
-                })
+            doc_id = item.get("id", f"{filename}_{idx:04d}")
+            yield {
+                "id": str(doc_id),
+                "text": obj_to_text(item),
+                "metadata": obj_to_metadata(item, source_name),
+            }
         else:
             # Single object
-            meta = obj_to_metadata(data, Path(path).name)
-            docs.append({
+            yield {
                 "id": filename,
-                "text": obj_to_text(data),
-                "metadata": meta,
-            })
-    return docs
+                "text": obj_to_text(item),
+                "metadata": obj_to_metadata(item, source_name),
+            }
+
+
+def read_json_as_documents(path):
+    """Read a JSON file and return a list of {id, text, metadata} dicts."""
+    return list(iter_json_documents(path))
 
 
 # Map extensions to readers (returns plain text string)
@@ -175,83 +198,275 @@ def chunk_text(text, chunk_size=1000, overlap=100):
 
 # ─── Core pipeline ───────────────────────────────────────────────────────────
 
-def scan_documents(documents_dir):
-    """Scan documents/ and return a list of {id, text, metadata} dicts."""
+def _extract_file(path):
+    """Extract the text of a PDF/DOCX/TXT file (runs in a worker process)."""
+    started = time.perf_counter()
+    text = _TEXT_READERS[Path(path).suffix.lower()](path)
+    return {"text": text, "seconds": round(time.perf_counter() - started, 3)}
+
+
+def _file_sha256(path):
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+def _load_extraction_index(cache_dir):
+    try:
+        with open(cache_dir / "index.json", "r", encoding="utf-8") as f:
+            index = json.load(f)
+        if index.get("version") == _EXTRACTION_CACHE_VERSION:
+            return index["files"]
+    except (OSError, ValueError, KeyError):
+        pass
+    return {}
+
+
+def _save_extraction_cache(cache_dir, files):
+    """Write the index atomically and drop cached extractions no file refers to anymore."""
+    tmp = cache_dir / "index.json.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump({"version": _EXTRACTION_CACHE_VERSION, "files": files}, f, ensure_ascii=False, indent=2)
+    os.replace(tmp, cache_dir / "index.json")
+    live = {entry["sha256"] + ".json" for entry in files.values()}
+    for cached in cache_dir.glob("*.json"):
+        if cached.name != "index.json" and cached.name not in live:
+            cached.unlink(missing_ok=True)
+
+
+def _cached_extraction(cache_dir, index, fpath):
+    """
+    Cached result for fpath, or None. Size + mtime match → hit without reading the
+    file; otherwise the content hash decides (touched or renamed files still hit).
+    Returns (result, entry) where entry is the file's up-to-date index record.
+    """
+    stat = fpath.stat()
+    entry = index.get(fpath.name)
+    if entry and entry["size"] == stat.st_size and entry["mtime_ns"] == stat.st_mtime_ns:
+        sha = entry["sha256"]
+    else:
+        sha = _file_sha256(fpath)
+    entry = {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns, "sha256": sha}
+    try:
+        with open(cache_dir / f"{sha}.json", "r", encoding="utf-8") as f:
+            return json.load(f), entry
+    except (OSError, ValueError):
+        return None, entry
+
+
+def iter_documents(documents_dir, cache_dir=None, workers=None):
+    """Scan documents/ and yield {id, text, metadata} dicts in directory order.
+
+    JSON/JSONL datasets are streamed record by record. PDF/DOCX/TXT files missing
+    from the extraction cache (cache_dir, optional) are parsed on a process pool of
+    `workers` processes (default EXTRACTION_WORKERS).
+    """
     documents_dir = Path(documents_dir)
     if not documents_dir.exists():
         print(f"⚠️  Documents directory not found: {documents_dir}")
-        return []
+        return
 
-    all_docs = []
+    started = time.perf_counter()
     files = sorted(documents_dir.iterdir())
-
+    supported = {}
     for idx, fpath in enumerate(files):
         if fpath.is_dir():
             continue
-
         ext = fpath.suffix.lower()
-
-        if ext == ".json":
-            # JSON files may contain multiple documents
+        if ext in (".json", ".jsonl") or ext in _TEXT_READERS:
+            supported[idx] = fpath
+        else:
+            print(f"⏭️  Skipping unsupported file: {fpath.name}")
+    text_files = {idx: fpath for idx, fpath in supported.items() if fpath.suffix.lower() in _TEXT_READERS}
+
+    # Cache lookups
+    index = {}
+    entries = {}
+    results = {}
+    if cache_dir is not None:
+        cache_dir = Path(cache_dir)
+        cache_dir.mkdir(parents=True, exist_ok=True)
+        index = _load_extraction_index(cache_dir)
+        for idx, fpath in text_files.items():
             try:
-                json_docs = read_json_as_documents(str(fpath))
-                all_docs.extend(json_docs)
-                print(f"📄 {fpath.name}: {len(json_docs)} records")
-            except Exception as e:
+                cached, entries[idx] = _cached_extraction(cache_dir, index, fpath)
+            except OSError as e:
                 print(f"⚠️  Failed to read {fpath.name}: {e}")
+                continue
+            if cached is not None:
+                results[idx] = cached
+    cached_idx = set(results)
+
+    # Parse the rest in parallel (PDF extraction is CPU-bound); results are
+    # collected in directory order as the documents are consumed
+    pending = {idx: fpath for idx, fpath in text_files.items() if idx not in results}
+    workers = min(workers or EXTRACTION_WORKERS, len(pending))
+    pool = None
+    futures = {}
+    if workers > 1:
+        print(f"⚙️  Extracting {len(pending)} files on {workers} processes ({len(cached_idx)} cached)")
+        pool = ProcessPoolExecutor(max_workers=workers)
+        futures = {idx: pool.submit(_extract_file, str(fpath)) for idx, fpath in pending.items()}
+
+    n_docs = 0
+    timings = []
+    parsed = set()
+    try:
+        for idx, fpath in supported.items():
+            if idx not in text_files:
+                # JSON files may contain many documents: stream them
+                n_records = 0
+                try:
+                    for doc in iter_json_documents(str(fpath)):
+                        n_records += 1
+                        yield doc
+                except Exception as e:
+                    print(f"⚠️  Failed to read {fpath.name} after {n_records} records: {e}")
+                    continue
+                n_docs += n_records
+                print(f"📄 {fpath.name}: {n_records} records")
+                continue
 
-        elif ext in _TEXT_READERS:
             try:
-                text = _TEXT_READERS[ext](str(fpath))
-                if not text:
-                    print(f"⚠️  No text extracted from {fpath.name}")
-                    continue
-                reference = fpath.stem
-                doc_id = f"doc_{idx:04d}_{reference}"
-                all_docs.append({
-                    "id": doc_id,
-                    "text": text,
-                    "metadata": {
-                        "source": fpath.name,
-                        "reference": reference,
-                        "type": ext.lstrip("."),
-                        "date": datetime.now().strftime("%Y-%m-%d"),
-                    },
-                })
-                print(f"📄 {fpath.name}: {len(text)} chars")
+                if idx in results:
+                    result = results.pop(idx)
+                elif idx in futures:
+                    result = futures.pop(idx).result()
+                else:
+                    result = _extract_file(str(fpath))
             except Exception as e:
                 print(f"⚠️  Failed to read {fpath.name}: {e}")
-        else:
-            print(f"⏭️  Skipping unsupported file: {fpath.name}")
-
-    print(f"\n📊 Total documents extracted: {len(all_docs)}")
-    return all_docs
+                continue
+            parsed.add(idx)
+
+            if idx in cached_idx:
+                timing = "cached"
+            else:
+                timing = f"{result['seconds']:.2f}s"
+                timings.append((result["seconds"], fpath.name))
+                if cache_dir is not None and idx in entries:
+                    with open(cache_dir / f"{entries[idx]['sha256']}.json", "w", encoding="utf-8") as f:
+                        json.dump(result, f, ensure_ascii=False)
+
+            text = result["text"]
+            if not text:
+                print(f"⚠️  No text extracted from {fpath.name} ({timing})")
+                continue
+            reference = fpath.stem
+            print(f"📄 {fpath.name}: {len(text)} chars ({timing})")
+            n_docs += 1
+            yield {
+                "id": f"doc_{idx:04d}_{reference}",
+                "text": text,
+                "metadata": {
+                    "source": fpath.name,
+                    "reference": reference,
+                    "type": fpath.suffix.lower().lstrip("."),
+                    "date": datetime.now().strftime("%Y-%m-%d"),
+                },
+            }
+    finally:
+        if pool is not None:
+            pool.shutdown(wait=True, cancel_futures=True)
+
+    if cache_dir is not None:
+        # Files that failed to parse are left out so they are retried next time
+        _save_extraction_cache(cache_dir, {
+            text_files[idx].name: entry for idx, entry in entries.items() if idx in parsed
+        })
+
+    if timings:
+        timings.sort(reverse=True)
+        slowest = ", ".join(f"{name} {seconds:.2f}s" for seconds, name in timings[:5])
+        print(f"⏱️  Parsed {len(timings)} files ({sum(t for t, _ in timings):.1f}s total), slowest: {slowest}")
+    print(f"\n📊 Total documents extracted: {n_docs} "
+          f"({len(cached_idx)} files from cache, {time.perf_counter() - started:.1f}s)")
+
+
+def scan_documents(documents_dir, cache_dir=None, workers=None):
+    """Scan documents/ and return a list of {id, text, metadata} dicts (see iter_documents)."""
+    return list(iter_documents(documents_dir, cache_dir=cache_dir, workers=workers))
 
 
 def save_transcripts_json(documents, kb_path, project_name):
-    """Save documents to transcripts_chromadb.json."""
-    output = {
+    """Stream documents (any iterable) to transcripts_chromadb.json.
+
+    Returns (json_path, number of documents written).
+    """
+    json_path = Path(kb_path) / "transcripts_chromadb.json"
+    count = write_json_documents(json_path, documents, header={
         "knowledge_base": project_name,
         "format": "chromadb",
-        "total_documents": len(documents),
         "extracted_at": datetime.now().isoformat(),
-        "documents": documents,
-    }
-    json_path = Path(kb_path) / "transcripts_chromadb.json"
-    with open(json_path, "w", encoding="utf-8") as f:
-        json.dump(output, f, ensure_ascii=False, indent=2)
-    print(f"📝 Saved {json_path} ({len(documents)} documents)")
-    return json_path
+    })
+    print(f"📝 Saved {json_path} ({count} documents)")
+    return json_path, count
+
+
+def chunk_content_hash(text, embedding_model):
+    """Hash identifying a chunk's embedding: same text + same model = same vector."""
+    return hashlib.sha256(f"{embedding_model}\0{text}".encode("utf-8")).hexdigest()
+
+
+# Metadata stamped with the time of each run (iter_documents' "date"): a change in
+# these alone doesn't make a chunk's metadata worth rewriting
+_VOLATILE_METADATA = ("date", "indexed_at", "extracted_at")
+
+
+def _metadata_digest(meta):
+    stable = {k: v for k, v in meta.items() if k not in _VOLATILE_METADATA}
+    return hashlib.sha256(json.dumps(stable, sort_keys=True, ensure_ascii=False, default=str).encode("utf-8")).hexdigest()
+
+
+def _metadata_keys(meta, _interned={}):
+    """The metadata's key set (one shared frozenset per distinct set of keys)."""
+    keys = frozenset(meta)
+    return _interned.setdefault(keys, keys)
 
 
-def index_into_chromadb(documents, kb_path, project_name, collection_name="gdrive_documents", embedding_model=None):
-    """Chunk documents and index them into ChromaDB."""
+def _stored_chunks(collection, page_size=1000):
+    """
+    id -> (content_hash, metadata digest, metadata keys) of everything already in
+    the collection (paged).
+    """
+    stored = {}
+    offset = 0
+    while True:
+        page = collection.get(include=["metadatas"], limit=page_size, offset=offset)
+        ids = page.get("ids") or []
+        for chunk_id, meta in zip(ids, page.get("metadatas") or [None] * len(ids)):
+            meta = meta or {}
+            stored[chunk_id] = (meta.get("content_hash"), _metadata_digest(meta), _metadata_keys(meta))
+        if len(ids) < page_size:
+            return stored
+        offset += len(ids)
+
+
+def index_into_chromadb(documents, kb_path, project_name, collection_name="gdrive_documents",
+                        embedding_model=None, full_rebuild=False):
+    """
+    Chunk documents (any iterable, consumed once) and sync them into ChromaDB.
+    Chunks whose content hash (text + model) is already stored are not embedded
+    again: unchanged ones are skipped, metadata-only changes are updated in place
+    (records whose metadata lost keys are rewritten whole, with their stored vector),
+    and vectors of moved chunks are reused (per-run dates like "date" don't count as
+    a metadata change). Ids no longer produced are deleted.
+    full_rebuild=True drops the collection first (also done when the model changed).
+    The document inventory (chroma_db/<collection>.inventory.json) is rewritten at
+    the end; a document keeps its indexed_at while its chunk texts are unchanged.
+    Chunks are processed in windows of BATCH_SIZE * EMBEDDING_MAX_CONCURRENCY, so
+    memory is bounded by the window, not the corpus.
+    """
     kb_path = Path(kb_path)
     chroma_path = str(kb_path / "chroma_db")
     os.makedirs(chroma_path, exist_ok=True)
 
     if not embedding_model:
         embedding_model = _EMBEDDING_MODELS.get(project_name, _DEFAULT_EMBEDDING_MODEL)
+    profile = {**_DEFAULT_STORAGE_PROFILE, **_STORAGE_PROFILES.get(project_name, {})}
+    storage = (profile["dimensions"] or None, profile["precision"])
 
     ef = embedding_functions.OpenAIEmbeddingFunction(
         api_key=OPENAI_API_KEY, model_name=embedding_model,
@@ -263,75 +478,223 @@ def index_into_chromadb(documents, kb_path, project_name, collection_name="gdriv
         settings=Settings(anonymized_telemetry=False, allow_reset=False),
     )
 
-    # Reset collection
-    try:
-        client.delete_collection(name=collection_name)
-        print(f"♻️  Deleted existing collection: {collection_name}")
-    except Exception:
-        pass
+    if not full_rebuild:
+        try:
+            existing = client.get_collection(name=collection_name)
+            stored_model = (existing.metadata or {}).get("embedding_model")
+            if stored_model != embedding_model:
+                # Vectors of another model (or of an unknown one) can't be mixed in
+                print(f"♻️  Embedding model changed ({stored_model} → {embedding_model}): full rebuild")
+                full_rebuild = True
+            elif collection_profile(existing) != storage:
+                print(f"♻️  Storage profile changed ({collection_profile(existing)} → {storage}): full rebuild")
+                full_rebuild = True
+        except Exception:
+            pass
 
-    collection = client.create_collection(
+    # Reset collection
+    if full_rebuild:
+        try:
+            client.delete_collection(name=collection_name)
+            print(f"♻️  Deleted existing collection: {collection_name}")
+        except Exception:
+            pass
+
+    collection_metadata = {
+        "description": f"Knowledge base: {project_name}",
+        "embedding_model": embedding_model,
+        "embedding_precision": storage[1],
+    }
+    if storage[0]:
+        # Read back at query time to shorten query embeddings the same way
+        collection_metadata["embedding_dimensions"] = storage[0]
+    collection = client.get_or_create_collection(
         name=collection_name,
         embedding_function=ef,
-        metadata={"description": f"Knowledge base: {project_name}"},
+        metadata=collection_metadata,
     )
 
-    # Chunk and prepare
-    all_ids = []
-    all_documents = []
-    all_metadatas = []
-
-    for doc in documents:
-        doc_id = doc["id"]
-        text = doc["text"]
-        metadata = doc.get("metadata", {})
-
-        if not text or not text.strip():
-            continue
-
-        chunks = chunk_text(text, chunk_size=1000, overlap=100)
-
-        for i, chunk in enumerate(chunks):
-            all_ids.append(f"{doc_id}_chunk{i}")
-            all_documents.append(chunk)
-            # Clean metadata: only keep string/int/float values
-            clean_meta = {}
-            for k, v in metadata.items():
-                if isinstance(v, (str, int, float, bool)):
-                    clean_meta[k] = v
-            clean_meta["chunk_index"] = i
-            clean_meta["total_chunks"] = len(chunks)
-            all_metadatas.append(clean_meta)
-
-    # Batch insert (let ChromaDB EF handle embeddings)
     BATCH_SIZE = 500
-    total_batches = (len(all_ids) + BATCH_SIZE - 1) // BATCH_SIZE
-
-    print(f"\n📊 Indexing {len(all_ids)} chunks into ChromaDB...")
-
-    for batch_idx in range(total_batches):
-        start = batch_idx * BATCH_SIZE
-        end = min(start + BATCH_SIZE, len(all_ids))
-        print(f"   Batch {batch_idx + 1}/{total_batches}: {end - start} chunks...")
-
-        collection.add(
-            ids=all_ids[start:end],
-            documents=all_documents[start:end],
-            metadatas=all_metadatas[start:end],
-        )
+    window_size = BATCH_SIZE * EMBEDDING_MAX_CONCURRENCY
+
+    # What is already stored: id -> (content hash, metadata digest, metadata keys),
+    # and one id per content hash
+    stored = _stored_chunks(collection)
+    stored_by_hash = {}
+    for chunk_id, (content_hash, _, _) in stored.items():
+        stored_by_hash.setdefault(content_hash, chunk_id)
+
+    # Inventory: documents whose chunks are unchanged keep their previous indexed_at
+    previous_inventory = {} if full_rebuild else (load_inventory(chroma_path, collection_name) or {}).get("documents", {})
+    inventory = {}
+    indexed_at = datetime.now().isoformat()
+
+    seen_ids = set()
+    counts = {"documents": 0, "chunks": 0, "embedded": 0, "reused": 0, "metadata": 0, "unchanged": 0}
+    openai_client = None
+    batch_idx = 0
+
+    def _iter_chunks():
+        for doc in documents:
+            doc_id = doc["id"]
+            text = doc["text"]
+            metadata = doc.get("metadata", {})
+            counts["documents"] += 1
+
+            if not text or not text.strip():
+                continue
 
-    print(f"\n✅ Indexed {len(all_ids)} chunks from {len(documents)} documents")
+            chunks = chunk_text(text, chunk_size=1000, overlap=100)
+            digest = hashlib.sha256()
+
+            for i, chunk in enumerate(chunks):
+                # Clean metadata: only keep string/int/float values
+                clean_meta = {}
+                for k, v in metadata.items():
+                    if isinstance(v, (str, int, float, bool)):
+                        clean_meta[k] = v
+                clean_meta["chunk_index"] = i
+                clean_meta["total_chunks"] = len(chunks)
+                clean_meta["content_hash"] = chunk_content_hash(chunk, embedding_model)
+                digest.update(clean_meta["content_hash"].encode("ascii"))
+                yield f"{doc_id}_chunk{i}", chunk, clean_meta
+
+            previous = previous_inventory.get(doc_id) or {}
+            unchanged = previous.get("digest") == digest.hexdigest()
+            inventory[doc_id] = {
+                "source": metadata.get("source"),
+                "chunks": len(chunks),
+                "indexed_at": previous.get("indexed_at") if unchanged else indexed_at,
+                "digest": digest.hexdigest(),
+            }
+
+    def _flush(window):
+        """Diff one window of (id, text, metadata) against the collection and write it."""
+        nonlocal openai_client, batch_idx
+        to_embed = []       # new/changed content
+        to_copy = []        # (item, stored id with the same content)
+        to_update = []      # unchanged content, new metadata
+        rewritten = 0       # unchanged content, metadata that lost keys: copied onto itself
+        for item in window:
+            chunk_id, _, meta = item
+            previous = stored.get(chunk_id)
+            if previous is not None and previous[0] == meta["content_hash"]:
+                if previous[1] == _metadata_digest(meta):
+                    counts["unchanged"] += 1
+                elif previous[2] - set(meta):
+                    to_copy.append((item, chunk_id))
+                    rewritten += 1
+                else:
+                    to_update.append(item)
+            elif meta["content_hash"] in stored_by_hash:
+                to_copy.append((item, stored_by_hash[meta["content_hash"]]))
+            else:
+                to_embed.append(item)
+
+        # Moved/duplicated content: reuse the stored vectors instead of embedding again.
+        # Read them all before writing, since a source id may itself be overwritten.
+        source_ids = list(dict.fromkeys(source for _, source in to_copy))
+        vectors = {}
+        for start in range(0, len(source_ids), BATCH_SIZE):
+            fetched = collection.get(ids=source_ids[start:start + BATCH_SIZE], include=["embeddings"])
+            vectors.update(zip(fetched["ids"], fetched["embeddings"]))
+
+        # update() and upsert() merge into the stored metadata: a key the new
+        # metadata no longer has would stay. Delete those records first so they
+        # are written whole.
+        lost_keys = [
+            chunk_id for chunk_id, _, meta in [item for item, _ in to_copy] + to_embed
+            if chunk_id in stored and stored[chunk_id][2] - set(meta)
+        ]
+        for start in range(0, len(lost_keys), BATCH_SIZE):
+            collection.delete(ids=lost_keys[start:start + BATCH_SIZE])
+
+        for start in range(0, len(to_copy), BATCH_SIZE):
+            batch = to_copy[start:start + BATCH_SIZE]
+            collection.upsert(
+                ids=[item[0] for item, _ in batch],
+                embeddings=[list(vectors[source]) for _, source in batch],
+                documents=[item[1] for item, _ in batch],
+                metadatas=[item[2] for item, _ in batch],
+            )
+
+        for start in range(0, len(to_update), BATCH_SIZE):
+            batch = to_update[start:start + BATCH_SIZE]
+            collection.update(
+                ids=[item[0] for item in batch],
+                metadatas=[item[2] for item in batch],
+            )
+
+        # New/changed chunks: embed the window concurrently, then upsert it with
+        # the precomputed vectors (progress lines as batches land)
+        if to_embed:
+            if openai_client is None:
+                openai_client = OpenAI(api_key=OPENAI_API_KEY, base_url=OPENAI_API_BASE)
+            embeddings = embed_texts_concurrently(openai_client, [item[1] for item in to_embed], embedding_model)
+            if storage != (None, "float32"):
+                embeddings = apply_profile(embeddings, *storage)
+            for start in range(0, len(to_embed), BATCH_SIZE):
+                batch = to_embed[start:start + BATCH_SIZE]
+                batch_idx += 1
+                print(f"   Batch {batch_idx}: {len(batch)} chunks...")
+
+                collection.upsert(
+                    ids=[item[0] for item in batch],
+                    embeddings=embeddings[start:start + BATCH_SIZE],
+                    documents=[item[1] for item in batch],
+                    metadatas=[item[2] for item in batch],
+                )
+
+        # Keep the in-memory view in step with what was just written
+        for chunk_id, _, meta in [item for item, _ in to_copy] + to_embed + to_update:
+            previous = stored.get(chunk_id)
+            if previous is not None and stored_by_hash.get(previous[0]) == chunk_id:
+                del stored_by_hash[previous[0]]
+            stored[chunk_id] = (meta["content_hash"], _metadata_digest(meta), _metadata_keys(meta))
+            stored_by_hash.setdefault(meta["content_hash"], chunk_id)
+
+        counts["embedded"] += len(to_embed)
+        counts["reused"] += len(to_copy) - rewritten
+        counts["metadata"] += len(to_update) + rewritten
+
+    print(f"\n📊 Indexing chunks into ChromaDB ({len(stored)} already stored)...")
+
+    window = []
+    for item in _iter_chunks():
+        seen_ids.add(item[0])
+        counts["chunks"] += 1
+        window.append(item)
+        if len(window) >= window_size:
+            _flush(window)
+            window = []
+    if window:
+        _flush(window)
+
+    stale_ids = sorted(set(stored) - seen_ids)
+    for start in range(0, len(stale_ids), BATCH_SIZE):
+        collection.delete(ids=stale_ids[start:start + BATCH_SIZE])
+    if stale_ids:
+        print(f"🗑️  Deleted {len(stale_ids)} stale chunks")
+
+    write_inventory(chroma_path, collection_name, project_name, embedding_model, inventory)
+
+    print(
+        f"\n🔎 {counts['chunks']} chunks: {counts['embedded']} embedded, {counts['reused']} reused, "
+        f"{counts['metadata']} metadata-only, {counts['unchanged']} unchanged, {len(stale_ids)} stale"
+    )
+    print(f"\n✅ Indexed {counts['chunks']} chunks from {counts['documents']} documents")
     print(f"📦 Collection: {collection.name} ({collection.count()} items)")
     return True
 
 
-def index_project(project_name, collection_name="gdrive_documents", embedding_model=None):
-    """Full pipeline: scan documents → save JSON → index ChromaDB.
+def index_project(project_name, collection_name="gdrive_documents", embedding_model=None, full_rebuild=False):
+    """Full pipeline: scan documents → save JSON → index ChromaDB → snapshot bundle.
 
     Args:
         project_name: Name of the knowledge base folder.
         collection_name: ChromaDB collection name.
         embedding_model: Override embedding model (default per-project config).
+        full_rebuild: Drop the collection and re-embed everything.
 
     Returns:
         dict with result info.
@@ -345,35 +708,39 @@ def index_project(project_name, collection_name="gdrive_documents", embedding_mo
     print(f"   Documents: {documents_dir}")
     print(f"{'=' * 60}\n")
 
-    # Step 1: Scan and extract text from all files
-    documents = scan_documents(documents_dir)
-    if not documents:
+    # Step 1 + 2: Extract text from all files, streamed into transcripts_chromadb.json
+    documents = iter_documents(documents_dir, cache_dir=kb_path / "extracted_texts" / "cache")
+    json_path, n_documents = save_transcripts_json(documents, kb_path, project_name)
+    if not n_documents:
         print("❌ No documents found to index")
         return {"indexed": False, "documents": 0, "chunks": 0}
 
-    # Step 2: Save transcripts_chromadb.json
-    save_transcripts_json(documents, kb_path, project_name)
-
-    # Step 3: Index into ChromaDB
+    # Step 3: Index into ChromaDB, streaming the documents back from the JSON
     indexed = index_into_chromadb(
-        documents, kb_path, project_name,
+        iter_json_documents(json_path), kb_path, project_name,
         collection_name=collection_name,
         embedding_model=embedding_model,
+        full_rebuild=full_rebuild,
     )
 
-    return {"indexed": indexed, "documents": len(documents)}
+    # Step 4: Single-file snapshot bundle for fast cold starts (see upload-chroma-db.bat)
+    if indexed:
+        build_bundle(str(kb_path / "chroma_db"), str(kb_path / "snapshot"), project_name)
+
+    return {"indexed": indexed, "documents": n_documents}
 
 
 # ─── CLI ─────────────────────────────────────────────────────────────────────
 
 if __name__ == "__main__":
-    if len(sys.argv) < 2:
-        print("Usage: python -m api.index_chromadb <project_name> [collection_name]")
+    args = [a for a in sys.argv[1:] if a != "--full"]
+    if len(args) < 1:
+        print("Usage: python -m api.index_chromadb <project_name> [collection_name] [--full]")
         sys.exit(1)
 
-    proj = sys.argv[1]
-    col = sys.argv[2] if len(sys.argv) > 2 else "gdrive_documents"
-    result = index_project(proj, collection_name=col)
+    proj = args[0]
+    col = args[1] if len(args) > 1 else "gdrive_documents"
+    result = index_project(proj, collection_name=col, full_rebuild="--full" in sys.argv)
     if result["indexed"]:
         print(f"\n✅ Done! {result['documents']} documents indexed.")
     else:
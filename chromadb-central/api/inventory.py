@@ -0,0 +1,200 @@
+"""
+Document inventory of a collection, and cursor-paginated collection scans.
+
+Listing what a collection holds used to mean collection.get() with no limit:
+every chunk with its text and metadata in memory, just to count chunks per
+document. index_into_chromadb() now maintains a summary next to the database:
+
+    chroma_db/<collection>.inventory.json
+        {"collection", "project", "embedding_model", "updated_at",
+         "total_documents", "total_chunks",
+         "documents": {doc_id: {"source", "chunks", "indexed_at", "digest"}}}
+
+It travels with chroma_db (bucket sync and snapshot bundles), so an inventory
+check is one small file read, cached per live handle. A collection without a
+summary, or whose chunk count no longer matches it, falls back to a paged
+metadata-only scan.
+
+scan_page() reads a collection one page at a time, with only the requested
+fields. Its cursor is opaque (offset, collection count and last id of the
+previous page); a cursor whose collection changed in between is rejected
+with CursorExpired instead of silently skipping or repeating items.
+"""
+import os
+import re
+import json
+import base64
+import binascii
+from datetime import datetime
+
+INVENTORY_SUFFIX = ".inventory.json"
+INVENTORY_FORMAT = 1
+
+SCAN_DEFAULT_PAGE_SIZE = int(os.getenv("SCAN_DEFAULT_PAGE_SIZE", "200"))
+SCAN_MAX_PAGE_SIZE = int(os.getenv("SCAN_MAX_PAGE_SIZE", "1000"))
+SCAN_INCLUDES = ("documents", "metadatas", "embeddings")
+
+# <doc_id>_chunk<i> (central indexer) or <file_id>_chunk_<i> (agents' update_gdrive)
+_CHUNK_ID_RE = re.compile(r"^(.*)_chunk_?\d+$")
+
+
+class CursorExpired(ValueError):
+    """The collection changed since the cursor was issued: restart the scan."""
+
+
+def inventory_path(chroma_path, collection_name):
+    return os.path.join(str(chroma_path), f"{collection_name}{INVENTORY_SUFFIX}")
+
+
+def load_inventory(chroma_path, collection_name):
+    """The summary written at index time, or None if missing/unreadable."""
+    try:
+        with open(inventory_path(chroma_path, collection_name), "r", encoding="utf-8") as f:
+            inventory = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if inventory.get("format") != INVENTORY_FORMAT:
+        return None
+    return inventory
+
+
+def write_inventory(chroma_path, collection_name, project_name, embedding_model, documents):
+    """Write the summary of documents ({doc_id: {source, chunks, indexed_at, digest}}) atomically."""
+    inventory = {
+        "format": INVENTORY_FORMAT,
+        "collection": collection_name,
+        "project": project_name,
+        "embedding_model": embedding_model,
+        "updated_at": datetime.now().isoformat(),
+        "total_documents": len(documents),
+        "total_chunks": sum(doc["chunks"] for doc in documents.values()),
+        "documents": documents,
+    }
+    path = inventory_path(chroma_path, collection_name)
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(inventory, f, ensure_ascii=False)
+    os.replace(tmp_path, path)
+    return inventory
+
+
+def _document_id(chunk_id, meta):
+    if meta.get("file_id"):
+        return meta["file_id"]
+    match = _CHUNK_ID_RE.match(chunk_id)
+    return match.group(1) if match else chunk_id
+
+
+def inventory_from_scan(collection, page_size=1000):
+    """Rebuild the summary from the chunks' metadata, one page at a time (no documents, no vectors)."""
+    documents = {}
+    offset = 0
+    while True:
+        page = collection.get(include=["metadatas"], limit=page_size, offset=offset)
+        ids = page.get("ids") or []
+        for chunk_id, meta in zip(ids, page.get("metadatas") or [None] * len(ids)):
+            meta = meta or {}
+            doc = documents.setdefault(_document_id(chunk_id, meta), {
+                "source": meta.get("source"), "chunks": 0, "indexed_at": None,
+            })
+            doc["chunks"] += 1
+            indexed_at = meta.get("indexed_at")
+            if indexed_at and (doc["indexed_at"] is None or indexed_at > doc["indexed_at"]):
+                doc["indexed_at"] = indexed_at
+        if len(ids) < page_size:
+            break
+        offset += len(ids)
+    return {
+        "format": INVENTORY_FORMAT,
+        "collection": collection.name,
+        "updated_at": None,
+        "total_documents": len(documents),
+        "total_chunks": sum(doc["chunks"] for doc in documents.values()),
+        "documents": documents,
+    }
+
+
+def summarize_inventory(inventory, source, include_documents=True):
+    """API view: totals, and documents as a list of {id, source, chunks, indexed_at}."""
+    view = {key: value for key, value in inventory.items() if key not in ("format", "documents")}
+    view["summary"] = source
+    if include_documents:
+        view["documents"] = [
+            {"id": doc_id, "source": doc.get("source"), "chunks": doc["chunks"], "indexed_at": doc.get("indexed_at")}
+            for doc_id, doc in inventory["documents"].items()
+        ]
+    return view
+
+
+def encode_cursor(state):
+    return base64.urlsafe_b64encode(json.dumps(state, separators=(",", ":")).encode("utf-8")).decode("ascii")
+
+
+def decode_cursor(cursor):
+    try:
+        state = json.loads(base64.urlsafe_b64decode(cursor.encode("ascii")))
+        int(state["offset"]), int(state["count"]), state["last_id"]
+    except (binascii.Error, ValueError, TypeError, KeyError, UnicodeError):
+        raise ValueError("Invalid cursor")
+    return state
+
+
+def scan_page(collection, cursor=None, limit=None, include=None, where=None, fields=None, max_document_chars=None):
+    """
+    One page of collection.get(): {"ids", <included fields>, "next_cursor"}.
+    next_cursor is None on the last page. fields / max_document_chars project
+    the metadatas / documents like /query does. Raises ValueError on bad
+    arguments, CursorExpired if the collection changed since the cursor.
+    """
+    limit = max(1, min(int(limit or SCAN_DEFAULT_PAGE_SIZE), SCAN_MAX_PAGE_SIZE))
+    include = list(include) if include is not None else ["metadatas"]
+    unknown = [key for key in include if key not in SCAN_INCLUDES]
+    if unknown:
+        raise ValueError(f"Unsupported include {unknown} (expected a subset of {list(SCAN_INCLUDES)})")
+    if fields and "metadatas" not in include:
+        include.append("metadatas")
+
+    count = collection.count()
+    get_args = {"include": include}
+    if where:
+        get_args["where"] = where
+
+    if cursor:
+        state = decode_cursor(cursor)
+        if state["count"] != count:
+            raise CursorExpired(f"Collection changed since the cursor was issued ({state['count']} → {count} items)")
+        # Re-read the previous page's last item to check the order didn't shift
+        page = collection.get(limit=limit + 1, offset=state["offset"] - 1, **get_args)
+        ids = page.get("ids") or []
+        if not ids or ids[0] != state["last_id"]:
+            raise CursorExpired("Collection changed since the cursor was issued")
+        page = {key: (value[1:] if isinstance(value, list) and key != "included" else value) for key, value in page.items()}
+        offset = state["offset"]
+    else:
+        page = collection.get(limit=limit, offset=0, **get_args)
+        offset = 0
+
+    ids = list(page.get("ids") or [])
+    result = {"ids": ids}
+    if "metadatas" in include:
+        metadatas = page.get("metadatas") or [None] * len(ids)
+        if fields:
+            keep = set(fields)
+            metadatas = [{k: v for k, v in (meta or {}).items() if k in keep} for meta in metadatas]
+        result["metadatas"] = list(metadatas)
+    if "documents" in include:
+        documents = list(page.get("documents") or [None] * len(ids))
+        if max_document_chars is not None:
+            max_chars = max(0, int(max_document_chars))
+            documents = [doc[:max_chars] if doc else doc for doc in documents]
+        result["documents"] = documents
+    if "embeddings" in include:
+        embeddings = page.get("embeddings")
+        result["embeddings"] = [[float(x) for x in e] for e in embeddings] if embeddings is not None else [None] * len(ids)
+
+    next_offset = offset + len(ids)
+    result["next_cursor"] = (
+        encode_cursor({"offset": next_offset, "count": count, "last_id": ids[-1]})
+        if len(ids) == limit else None
+    )
+    return result
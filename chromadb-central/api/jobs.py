@@ -0,0 +1,249 @@
+"""
+Background jobs for long-running maintenance work (bucket reloads, re-indexing).
+
+Requests submit a job and get its id back immediately instead of holding a server
+worker until Cloud Run's request timeout. Jobs run on a few dedicated threads:
+  - one active job per project at a time (submitting another raises JobConflict);
+    synchronous endpoints take the same per-project lock via exclusive_project(),
+    which raises JobConflict instead of waiting behind a job
+  - progress is reported as downloaded bytes and indexed chunks
+  - cancel sets a flag that the job checks each time it reports progress
+  - jobs yield to interactive queries: their threads run at a lower OS priority
+    (where supported) and pause while the query executor has queued searches
+
+Configuration (env):
+  - JOB_WORKERS: threads running jobs (default 1)
+  - JOB_NICE: niceness added to job threads on Linux (default 10)
+  - JOB_YIELD_MAX_MS: longest pause per progress report while queries are queued (default 2000)
+  - JOB_HISTORY: finished jobs kept for status lookups (default 100)
+"""
+import os
+import time
+import uuid
+import queue
+import threading
+from contextlib import contextmanager
+from datetime import datetime
+from api.query_executor import get_executor_stats
+
+JOB_WORKERS = max(1, int(os.getenv("JOB_WORKERS", "1")))
+JOB_NICE = int(os.getenv("JOB_NICE", "10"))
+JOB_YIELD_MAX_MS = float(os.getenv("JOB_YIELD_MAX_MS", "2000"))
+JOB_HISTORY = int(os.getenv("JOB_HISTORY", "100"))
+
+_ACTIVE_STATUSES = ("queued", "running")
+
+_JOBS = {}  # job_id -> job dict (insertion order = submission order)
+_JOBS_LOCK = threading.Lock()
+_QUEUE = queue.Queue()
+_WORKERS = []
+_PROJECT_LOCKS = {}
+
+
+class JobConflict(Exception):
+    """Another job is already queued or running for this project."""
+
+    def __init__(self, job):
+        super().__init__(f"Job {job['id']} ({job['kind']}) is already {job['status']} for project '{job['project_name']}'")
+        self.job = job
+
+
+class JobCancelled(Exception):
+    """Raised inside a job once cancel_job() has been called for it."""
+
+
+def project_lock(project_name):
+    """Lock serializing reload/reindex work on one project (jobs and synchronous endpoints)."""
+    with _JOBS_LOCK:
+        return _PROJECT_LOCKS.setdefault(project_name, threading.Lock())
+
+
+def _active_job(project_name):
+    """View of the project's queued or running job, if any."""
+    with _JOBS_LOCK:
+        for job in _JOBS.values():
+            if job["project_name"] == project_name and job["status"] in _ACTIVE_STATUSES:
+                return job_view(job)
+    return None
+
+
+@contextmanager
+def exclusive_project(project_name):
+    """
+    project_lock() for synchronous endpoints. Raises JobConflict as soon as a job
+    is queued or running for the project, instead of holding the request until the
+    job is done; only waits behind other synchronous calls.
+    """
+    lock = project_lock(project_name)
+    while True:
+        job = _active_job(project_name)
+        if job is not None:
+            raise JobConflict(job)
+        if lock.acquire(timeout=0.5):
+            break
+    try:
+        yield
+    finally:
+        lock.release()
+
+
+def _now():
+    return datetime.now().isoformat()
+
+
+def submit_job(kind, project_name, fn):
+    """
+    Queue fn(job) to run in the background. Returns the job's public view.
+    Raises JobConflict if the project already has an active job.
+    """
+    with _JOBS_LOCK:
+        for job in _JOBS.values():
+            if job["project_name"] == project_name and job["status"] in _ACTIVE_STATUSES:
+                raise JobConflict(job_view(job))
+        job = {
+            "id": uuid.uuid4().hex,
+            "kind": kind,
+            "project_name": project_name,
+            "status": "queued",
+            "progress": {"bytes": 0, "chunks": 0, "total_chunks": None},
+            "message": None,
+            "result": None,
+            "error": None,
+            "created_at": _now(),
+            "started_at": None,
+            "finished_at": None,
+            "_fn": fn,
+            "_cancel": threading.Event(),
+        }
+        _JOBS[job["id"]] = job
+        _trim_history()
+        _start_workers()
+    _QUEUE.put(job["id"])
+    print(f"[Jobs] Queued {kind} job {job['id']} for '{project_name}'", flush=True)
+    return job_view(job)
+
+
+def _trim_history():
+    """Forget the oldest finished jobs beyond JOB_HISTORY. Caller holds _JOBS_LOCK."""
+    finished = [job_id for job_id, job in _JOBS.items() if job["status"] not in _ACTIVE_STATUSES]
+    for job_id in finished[:max(0, len(finished) - JOB_HISTORY)]:
+        del _JOBS[job_id]
+
+
+def _start_workers():
+    """Start the job threads on first use. Caller holds _JOBS_LOCK."""
+    while len(_WORKERS) < JOB_WORKERS:
+        worker = threading.Thread(target=_worker_loop, name=f"job-worker-{len(_WORKERS)}", daemon=True)
+        _WORKERS.append(worker)
+        worker.start()
+
+
+def _lower_thread_priority():
+    # Linux applies niceness per thread (and child processes inherit it)
+    try:
+        os.setpriority(os.PRIO_PROCESS, threading.get_native_id(), JOB_NICE)
+    except (AttributeError, OSError, PermissionError):
+        pass
+
+
+def _worker_loop():
+    _lower_thread_priority()
+    while True:
+        job = _JOBS.get(_QUEUE.get())
+        if job is None or job["status"] != "queued":
+            continue  # cancelled (or forgotten) while waiting
+        _run_job(job)
+
+
+def _run_job(job):
+    with project_lock(job["project_name"]):
+        with _JOBS_LOCK:
+            if job["status"] != "queued":
+                return
+            job["status"] = "running"
+            job["started_at"] = _now()
+        started = time.perf_counter()
+        print(f"[Jobs] Running {job['kind']} job {job['id']} for '{job['project_name']}'", flush=True)
+        try:
+            result = job["_fn"](job)
+            status, error = "succeeded", None
+        except JobCancelled:
+            result, status, error = None, "cancelled", None
+        except Exception as e:
+            result, status, error = None, "failed", str(e)
+            print(f"[Jobs] {job['kind']} job {job['id']} failed: {e}", flush=True)
+        with _JOBS_LOCK:
+            job["status"] = status
+            job["result"] = result
+            job["error"] = error
+            job["finished_at"] = _now()
+        print(f"[Jobs] {job['kind']} job {job['id']} {status} in {time.perf_counter() - started:.1f} s", flush=True)
+
+
+def _yield_to_queries():
+    """Pause while interactive searches are waiting for a query thread."""
+    deadline = time.perf_counter() + JOB_YIELD_MAX_MS / 1000
+    while get_executor_stats()["queued"] > 0 and time.perf_counter() < deadline:
+        time.sleep(0.05)
+
+
+def report_progress(job, bytes=0, chunks=0, total_chunks=None, message=None):
+    """Add to a job's progress counters (thread-safe). Raises JobCancelled if the job was cancelled."""
+    with _JOBS_LOCK:
+        progress = job["progress"]
+        progress["bytes"] += bytes
+        progress["chunks"] += chunks
+        if total_chunks is not None:
+            progress["total_chunks"] = total_chunks
+        if message is not None:
+            job["message"] = message
+    check_cancelled(job)
+    _yield_to_queries()
+
+
+def is_cancelled(job):
+    return job["_cancel"].is_set()
+
+
+def check_cancelled(job):
+    if is_cancelled(job):
+        raise JobCancelled()
+
+
+def cancel_job(job_id):
+    """
+    Request cancellation. A queued job is cancelled at once; a running one stops
+    at its next progress report. Returns the job's view (None if unknown).
+    """
+    with _JOBS_LOCK:
+        job = _JOBS.get(job_id)
+        if job is None:
+            return None
+        if job["status"] in _ACTIVE_STATUSES:
+            job["_cancel"].set()
+            if job["status"] == "queued":
+                job["status"] = "cancelled"
+                job["finished_at"] = _now()
+        return job_view(job)
+
+
+def job_view(job):
+    """JSON-serializable copy of a job (without its callable and cancel flag)."""
+    view = {k: v for k, v in job.items() if not k.startswith("_")}
+    view["progress"] = dict(job["progress"])
+    view["cancel_requested"] = job["_cancel"].is_set()
+    return view
+
+
+def get_job(job_id):
+    with _JOBS_LOCK:
+        job = _JOBS.get(job_id)
+        return job_view(job) if job is not None else None
+
+
+def list_jobs(project_name=None):
+    with _JOBS_LOCK:
+        return [
+            job_view(job) for job in reversed(list(_JOBS.values()))
+            if project_name is None or job["project_name"] == project_name
+        ]
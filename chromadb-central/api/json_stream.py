@@ -0,0 +1,187 @@
+"""
+Streaming JSON / JSONL helpers for the indexing pipeline.
+
+Dataset dumps (e.g. bibliosense books) and transcripts_chromadb.json can be far
+larger than what the pipeline needs in memory at once. The reader walks the file
+with json.JSONDecoder.raw_decode() over a sliding buffer and yields one record at
+a time; the writer emits one document per line as they are produced. Peak memory
+is then one record (plus the read buffer) instead of the whole corpus.
+
+Layouts read, in the same spirit as json.load() + the usual wrappers:
+  - [ {...}, {...} ]                       → records of the top-level array
+  - {"documents": [...], ...}              → records of the first wrapper key found
+  - {...} (no wrapper key)                 → the object itself, as one record
+  - *.jsonl                                → one record per non-blank line
+
+The same file is copied to translator-agent/core, which is deployed separately;
+keep the copies in sync.
+"""
+import json
+import os
+from pathlib import Path
+
+_READ_SIZE = 1 << 16
+_WHITESPACE = " \t\r\n"
+# Characters a JSON number can continue with
+_NUMBER_CHARS = set("0123456789+-.eE")
+
+
+class _JsonStream:
+    """Pull parser over a text file: values are decoded one at a time with raw_decode()."""
+
+    def __init__(self, f):
+        self.f = f
+        self.buf = ""
+        self.pos = 0
+        self.eof = False
+        self.decoder = json.JSONDecoder()
+
+    def _fill(self):
+        chunk = self.f.read(_READ_SIZE)
+        if not chunk:
+            self.eof = True
+            return False
+        self.buf = self.buf[self.pos:] + chunk
+        self.pos = 0
+        return True
+
+    def peek(self):
+        """Next non-whitespace character ("" at end of file)."""
+        while True:
+            while self.pos < len(self.buf) and self.buf[self.pos] in _WHITESPACE:
+                self.pos += 1
+            if self.pos < len(self.buf):
+                return self.buf[self.pos]
+            if not self._fill():
+                return ""
+
+    def expect(self, char):
+        found = self.peek()
+        if found != char:
+            raise ValueError(f"Expected {char!r}, found {found!r}")
+        self.pos += 1
+
+    def value(self):
+        """Decode the next complete JSON value, reading more of the file as needed."""
+        self.peek()
+        while True:
+            try:
+                value, end = self.decoder.raw_decode(self.buf, self.pos)
+            except json.JSONDecodeError:
+                if self._fill():
+                    continue
+                raise
+            # A number cut by the end of the buffer ("12." | "5", "3e" | "10") decodes
+            # as its prefix: read on while only number characters follow it
+            if (not self.eof and isinstance(value, (int, float)) and not isinstance(value, bool)
+                    and all(c in _NUMBER_CHARS for c in self.buf[end:]) and self._fill()):
+                continue
+            self.pos = end
+            return value
+
+    def items(self):
+        """Yield the values of the array starting at the current position."""
+        self.expect("[")
+        if self.peek() == "]":
+            self.pos += 1
+            return
+        while True:
+            yield self.value()
+            separator = self.peek()
+            self.pos += 1
+            if separator == "]":
+                return
+            if separator != ",":
+                raise ValueError(f"Expected ',' or ']' in array, found {separator!r}")
+
+
+def iter_json_records(path, keys=("documents", "data")):
+    """
+    Yield (container, record) pairs from a JSON or JSONL file without loading it whole.
+    container is None for top-level array / JSONL records, the wrapper key for
+    records of {key: [...]}, and "" for a lone object. Only the first wrapper key
+    found (in file order) is streamed; a non-container top-level value yields nothing.
+    """
+    path = Path(path)
+    with open(path, "r", encoding="utf-8") as f:
+        if path.suffix.lower() == ".jsonl":
+            for line in f:
+                if line.strip():
+                    yield None, json.loads(line)
+            return
+
+        stream = _JsonStream(f)
+        first = stream.peek()
+        if first == "[":
+            for record in stream.items():
+                yield None, record
+            return
+        if first != "{":
+            return
+
+        stream.expect("{")
+        rest = {}
+        streamed = None
+        if stream.peek() == "}":
+            stream.pos += 1
+        else:
+            while True:
+                key = stream.value()
+                stream.expect(":")
+                if streamed is None and key in keys and stream.peek() == "[":
+                    streamed = key
+                    for record in stream.items():
+                        yield key, record
+                else:
+                    value = stream.value()
+                    if not (streamed is not None and key in keys):
+                        rest[key] = value
+                separator = stream.peek()
+                stream.pos += 1
+                if separator == "}":
+                    break
+                if separator != ",":
+                    raise ValueError(f"Expected ',' or '}}' in object, found {separator!r}")
+        if streamed is None:
+            yield "", rest
+
+
+def count_json_records(path, keys=("documents", "data")):
+    """Number of records iter_json_records() would yield (constant memory)."""
+    return sum(1 for _ in iter_json_records(path, keys))
+
+
+def write_json_documents(path, documents, header=None):
+    """
+    Stream documents (any iterable) to path and return how many were written.
+    *.jsonl gets one document per line; otherwise {header..., "documents": [...],
+    "total_documents": n} with one document per line. Written to a temporary file
+    and renamed, so readers never see a partial file.
+    """
+    path = Path(path)
+    tmp = path.with_name(path.name + ".tmp")
+    count = 0
+    try:
+        with open(tmp, "w", encoding="utf-8") as f:
+            if path.suffix.lower() == ".jsonl":
+                for doc in documents:
+                    f.write(json.dumps(doc, ensure_ascii=False))
+                    f.write("\n")
+                    count += 1
+            else:
+                f.write("{\n")
+                for key, value in (header or {}).items():
+                    f.write(f"  {json.dumps(key)}: {json.dumps(value, ensure_ascii=False)},\n")
+                f.write('  "documents": [')
+                for doc in documents:
+                    f.write(",\n    " if count else "\n    ")
+                    f.write(json.dumps(doc, ensure_ascii=False))
+                    count += 1
+                f.write("\n  ],\n" if count else "],\n")
+                # Known only once the documents are written
+                f.write(f'  "total_documents": {count}\n}}\n')
+        os.replace(tmp, path)
+    except BaseException:
+        tmp.unlink(missing_ok=True)
+        raise
+    return count
@@ -1,4 +1,4 @@
-from api.graph_layer import find_nodes_matches,  set_graph,multi_hop
+from api.graph_layer import find_nodes_matches, get_project_graph, multi_hop
 
 def merge_results(vector_entities, graph_entities):
     scores = {}
@@ -21,7 +21,8 @@ def smart_query(project_name, collection_name, nodes, edges, query):
     # =========================
     # 🔥 LOAD GRAPH
     # =========================
-    set_graph(project_name)
+    # Immutable per-project graph, passed explicitly (safe for concurrent smart queries)
+    graph = get_project_graph(project_name)
 
     # =========================
     # 🧠 DOMAIN DETECTION
@@ -41,7 +42,7 @@ def smart_query(project_name, collection_name, nodes, edges, query):
     
     # in all nodes of graphe compage domaine with 
 
-    node_list = find_nodes_matches(vector_entities, nodes)
+    node_list = find_nodes_matches(graph, vector_entities, nodes)
 
 
     # =========================
@@ -52,6 +53,7 @@ def smart_query(project_name, collection_name, nodes, edges, query):
 
     if node_list:
         graph_entities = multi_hop(
+            graph,
             node_list,
             edges
         )
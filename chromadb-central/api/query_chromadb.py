@@ -2,12 +2,34 @@
 Minimal ChromaDB access layer for central API.
 """
 import os
+import json
+import time
+import shutil
+import hashlib
+import threading
 import subprocess
+from array import array
+from collections import OrderedDict
+from contextlib import ExitStack
+from datetime import datetime
 from dotenv import load_dotenv
 from chromadb.config import Settings
 from chromadb.utils import embedding_functions
 import chromadb
-from google.cloud import storage
+from api.wire import decode_embedding
+from api.bucket_sync import get_bucket_source, sync_prefix, prefix_is_current
+from api.snapshot_bundle import fetch_bundle, bundle_is_current
+from api.embeddings import embed_text, embed_texts
+from api.hybrid_search import (
+    build_bm25_index, reciprocal_rank_fusion,
+    HYBRID_CANDIDATES, HYBRID_VECTOR_WEIGHT, HYBRID_LEXICAL_WEIGHT, HYBRID_RRF_K,
+)
+from api.diversify import (
+    diversify_options, wants_diversification, needs_metadatas, select_diverse, has_exclusions, count_excluded,
+)
+from api.exact_search import build_exact_index, benchmark_engines, UnsupportedQuery
+from api.storage_profile import fit_query_embeddings
+from api.inventory import load_inventory, inventory_from_scan, summarize_inventory, scan_page
 
 PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 load_dotenv(os.path.join(PROJECT_ROOT, ".env"), override=True)
@@ -15,8 +37,6 @@ load_dotenv(os.path.join(PROJECT_ROOT, ".env"), override=True)
 OPENAI_API_KEY = os.getenv("AI_GATEWAY_API_KEY") or os.getenv("OPENAI_API_KEY")
 OPENAI_API_BASE = os.getenv("AI_GATEWAY_BASE_URL", "https://ai-gateway.vercel.sh/v1")
 
-GCS_BUCKET_NAME = os.getenv("GCS_BUCKET_NAME", "agent-factory-database")
-
 # Embedding model per project (innovia uses small, others use large)
 _EMBEDDING_MODELS = {
     "innovia": "text-embedding-3-small",
@@ -24,9 +44,176 @@ _EMBEDDING_MODELS = {
 _DEFAULT_EMBEDDING_MODEL = "text-embedding-3-large"
 
 
+def get_embedding_model(project_name):
+    return _EMBEDDING_MODELS.get(project_name, _DEFAULT_EMBEDDING_MODEL)
+
+
 # Global cache for preloaded collections
 _PRELOADED_COLLECTIONS = {}
 
+# Live handle per project: {"client", "path", "version", "collections", "inflight", "retired"}.
+# Reloads build a complete new handle and swap it in; the old client is closed
+# once the queries still using it have drained.
+_PROJECT_HANDLES = {}
+_HANDLES_LOCK = threading.Lock()
+
+# Bucket reloads are staged in knowledge-base/<project>/chroma_versions/<version>/
+_STAGING_DIRNAME = "chroma_versions"
+
+# Download <project>/snapshot/ bundles (one streamed archive) when present, else sync blob by blob
+CHROMA_SNAPSHOT_BUNDLES = os.getenv("CHROMA_SNAPSHOT_BUNDLES", "true").lower() in ("1", "true", "yes")
+
+# Build the BM25 indexes of hybrid search when a project goes live (default: on first hybrid
+# query, since hybrid mode is opt-in per query)
+HYBRID_INDEX_ON_LOAD = os.getenv("HYBRID_INDEX_ON_LOAD", "false").lower() in ("1", "true", "yes")
+
+# Lazy loading: projects known from discovery are opened on their first query.
+# Least-recently-used projects are evicted past a project-count or memory budget.
+CHROMA_LAZY_LOAD = os.getenv("CHROMA_LAZY_LOAD", "false").lower() in ("1", "true", "yes")
+CHROMA_MAX_RESIDENT_PROJECTS = int(os.getenv("CHROMA_MAX_RESIDENT_PROJECTS", "0"))  # 0 = unlimited
+CHROMA_MAX_RESIDENT_MB = float(os.getenv("CHROMA_MAX_RESIDENT_MB", "0"))  # 0 = unlimited
+_KNOWN_PROJECTS = {}  # project_name -> {"local_only": bool}
+_LOAD_LOCKS = {}
+
+# Readiness (/ready): stored vectors queried per collection before a handle goes live,
+# and the state of each project preloaded at startup, with its warm-up timings
+CHROMA_WARMUP_QUERIES = max(1, int(os.getenv("CHROMA_WARMUP_QUERIES", "4")))
+_READINESS = {"preload_done": False, "started_at": None, "finished_at": None, "projects": {}}
+
+# Query result cache (LRU + TTL), flushed per project on reload
+QUERY_CACHE_MAX_ENTRIES = int(os.getenv("QUERY_CACHE_MAX_ENTRIES", "2048"))
+QUERY_CACHE_TTL_SECONDS = float(os.getenv("QUERY_CACHE_TTL_SECONDS", "900"))
+
+_QUERY_CACHE = OrderedDict()
+_QUERY_CACHE_LOCK = threading.Lock()
+# Bumped on every invalidation so in-flight queries cannot re-insert stale results
+_QUERY_CACHE_GENERATIONS = {}
+_QUERY_CACHE_STATS = {"hits": 0, "misses": 0, "evictions": 0, "expirations": 0, "invalidations": 0, "coalesced": 0}
+
+# Single-flight: concurrent identical queries (same cache key) share one in-flight search
+QUERY_COALESCING = os.getenv("QUERY_COALESCING", "true").lower() in ("1", "true", "yes")
+_INFLIGHT_QUERIES = {}  # (cache key, cache generation) -> {"done": Event, "result", "error"}
+
+def _embedding_hash(query_embeddings):
+    """Stable digest of one or more query embeddings."""
+    h = hashlib.blake2b(digest_size=16)
+    for embedding in query_embeddings:
+        h.update(array("d", embedding).tobytes())
+        h.update(b"|")
+    return h.hexdigest()
+
+
+def _query_cache_key(project_name, collection_name, query_args, extra=None):
+    return (
+        project_name,
+        collection_name,
+        _embedding_hash(query_args["query_embeddings"]),
+        query_args["n_results"],
+        tuple(query_args["include"]),
+        json.dumps(query_args.get("where"), sort_keys=True),
+        # Search options that change the result beyond collection.query() (e.g. hybrid mode)
+        json.dumps(extra, sort_keys=True) if extra else None,
+    )
+
+
+def _query_cache_get(key):
+    """Return (hit, value, generation). Cached values are shared: treat them as read-only."""
+    if QUERY_CACHE_MAX_ENTRIES <= 0:
+        return False, None, None
+    with _QUERY_CACHE_LOCK:
+        generation = _QUERY_CACHE_GENERATIONS.get(key[0], 0)
+        entry = _QUERY_CACHE.get(key)
+        if entry is not None:
+            expires_at, value = entry
+            if expires_at >= time.monotonic():
+                _QUERY_CACHE.move_to_end(key)
+                _QUERY_CACHE_STATS["hits"] += 1
+                return True, value, generation
+            del _QUERY_CACHE[key]
+            _QUERY_CACHE_STATS["expirations"] += 1
+        _QUERY_CACHE_STATS["misses"] += 1
+        return False, None, generation
+
+
+def _query_cache_put(key, value, generation):
+    if QUERY_CACHE_MAX_ENTRIES <= 0:
+        return
+    with _QUERY_CACHE_LOCK:
+        # Project was reloaded while this query ran: don't cache a stale result
+        if _QUERY_CACHE_GENERATIONS.get(key[0], 0) != generation:
+            return
+        _QUERY_CACHE[key] = (time.monotonic() + QUERY_CACHE_TTL_SECONDS, value)
+        _QUERY_CACHE.move_to_end(key)
+        while len(_QUERY_CACHE) > QUERY_CACHE_MAX_ENTRIES:
+            _QUERY_CACHE.popitem(last=False)
+            _QUERY_CACHE_STATS["evictions"] += 1
+
+
+def _single_flight(key, generation, search):
+    """
+    Run search() once for concurrent callers with the same key: the first one
+    searches, the others wait for its result (or its exception). Keyed with the
+    cache generation so a query started before a reload is never shared after it.
+    """
+    if not QUERY_COALESCING:
+        return search()
+    flight_key = (key, generation)
+    with _QUERY_CACHE_LOCK:
+        flight = _INFLIGHT_QUERIES.get(flight_key)
+        leader = flight is None
+        if leader:
+            flight = {"done": threading.Event(), "result": None, "error": None}
+            _INFLIGHT_QUERIES[flight_key] = flight
+        else:
+            _QUERY_CACHE_STATS["coalesced"] += 1
+    if not leader:
+        flight["done"].wait()
+        if flight["error"] is not None:
+            raise flight["error"]
+        return flight["result"]
+    try:
+        flight["result"] = search()
+    except BaseException as e:
+        flight["error"] = e
+        raise
+    finally:
+        with _QUERY_CACHE_LOCK:
+            del _INFLIGHT_QUERIES[flight_key]
+        flight["done"].set()
+    return flight["result"]
+
+
+def invalidate_query_cache(project_name=None):
+    """Drop cached results for one project (or all projects if None)."""
+    with _QUERY_CACHE_LOCK:
+        if project_name is None:
+            stale = list(_QUERY_CACHE)
+            for project in set(k[0] for k in stale) | set(_QUERY_CACHE_GENERATIONS):
+                _QUERY_CACHE_GENERATIONS[project] = _QUERY_CACHE_GENERATIONS.get(project, 0) + 1
+        else:
+            stale = [k for k in _QUERY_CACHE if k[0] == project_name]
+            _QUERY_CACHE_GENERATIONS[project_name] = _QUERY_CACHE_GENERATIONS.get(project_name, 0) + 1
+        for k in stale:
+            del _QUERY_CACHE[k]
+        _QUERY_CACHE_STATS["invalidations"] += len(stale)
+    if stale:
+        print(f"[Cache] Invalidated {len(stale)} cached result(s) for {project_name or 'all projects'}", flush=True)
+
+
+def get_query_cache_stats():
+    """Hit/miss/eviction counters for sizing the query cache."""
+    with _QUERY_CACHE_LOCK:
+        stats = dict(_QUERY_CACHE_STATS)
+        stats["size"] = len(_QUERY_CACHE)
+        stats["inflight"] = len(_INFLIGHT_QUERIES)
+    lookups = stats["hits"] + stats["misses"]
+    stats["hit_rate"] = round(stats["hits"] / lookups, 4) if lookups else 0.0
+    stats["max_entries"] = QUERY_CACHE_MAX_ENTRIES
+    stats["ttl_seconds"] = QUERY_CACHE_TTL_SECONDS
+    stats["coalescing"] = QUERY_COALESCING
+    return stats
+
+
 # Helper to list collections for a project
 def list_collections(project_name):
     if project_name in _PRELOADED_COLLECTIONS:
@@ -45,15 +232,28 @@ def get_collection(project_name, collection_name=None):
     return None
 
 # Preload all collections (to be called at startup)
-def preload_all_collections(project_names=None, local_only=False):
+def preload_all_collections(project_names=None, local_only=False, lazy=None):
     """
     Load all ChromaDB collections.
     - local_only=True: load from local knowledge-base/ folders only (no GCS download).
     - local_only=False: download chroma_db from GCS bucket first, then load.
+    - lazy=True (default: CHROMA_LAZY_LOAD): only discover projects; each one is
+      downloaded and opened on its first query.
     If project_names is None, auto-discover from bucket (or local folders if local_only).
     """
+    if lazy is None:
+        lazy = CHROMA_LAZY_LOAD
     kb_root = os.path.join(PROJECT_ROOT, "knowledge-base")
+    _READINESS["started_at"] = datetime.now().isoformat()
+    try:
+        _preload_projects(kb_root, project_names, local_only, lazy)
+    finally:
+        _READINESS["preload_done"] = True
+        _READINESS["finished_at"] = datetime.now().isoformat()
+
 
+def _preload_projects(kb_root, project_names, local_only, lazy):
+    """Body of preload_all_collections(); readiness is marked done whatever happens here."""
     # --- Step 1: Discover projects ---
     if project_names is None:
         if local_only:
@@ -67,6 +267,17 @@ def preload_all_collections(project_names=None, local_only=False):
             project_names = _discover_projects_from_bucket()
             print(f"[Preload] Discovered projects from bucket: {project_names}", flush=True)
 
+    # Nothing is live yet: drop staging directories left over from a previous run
+    for project_name in project_names:
+        shutil.rmtree(os.path.join(kb_root, project_name, _STAGING_DIRNAME), ignore_errors=True)
+        _KNOWN_PROJECTS[project_name] = {"local_only": local_only}
+
+    if lazy:
+        print(f"[Preload] Lazy mode: {len(project_names)} project(s) will load on first query", flush=True)
+        return
+    for project_name in project_names:
+        _set_readiness(project_name, status="loading")
+
     # --- Step 2: Download from bucket (skip if local_only) ---
     if not local_only:
         for project_name in project_names:
@@ -81,137 +292,978 @@ def preload_all_collections(project_names=None, local_only=False):
             kb_path = os.path.join(kb_root, project_name, "chroma_db")
             if not os.path.exists(kb_path):
                 print(f"[Preload] No chroma_db folder for {project_name}, skipping.", flush=True)
+                _set_readiness(project_name, status="skipped", reason="no chroma_db folder")
                 continue
 
-            client = chromadb.PersistentClient(path=kb_path, settings=Settings(anonymized_telemetry=False, allow_reset=False))
-            all_collections = client.list_collections()
-
-            model_name = _EMBEDDING_MODELS.get(project_name, _DEFAULT_EMBEDDING_MODEL)
-            ef = embedding_functions.OpenAIEmbeddingFunction(
-                api_key=OPENAI_API_KEY, model_name=model_name,
-                api_base=OPENAI_API_BASE,
-            )
-
-            if all_collections:
-                for col in all_collections:
-                    print(f"[Preload] Found collection for {project_name}: {col.name}", flush=True)
-                    collection = client.get_collection(name=col.name)
-                    collection._embedding_function = ef
-                    if project_name not in _PRELOADED_COLLECTIONS:
-                        _PRELOADED_COLLECTIONS[project_name] = {}
-                    _PRELOADED_COLLECTIONS[project_name][col.name] = collection
+            rss_before = _current_rss_mb()
+            handle = _open_project_handle(project_name, kb_path)
+            for name in handle["collections"]:
+                print(f"[Preload] Found collection for {project_name}: {name}", flush=True)
+            if handle["collections"]:
+                _swap_project_handle(project_name, handle, rss_before)
+            else:
+                _set_readiness(project_name, status="skipped", reason="no collections")
 
         except Exception as e:
             print(f"[Preload] Failed to preload collection for {project_name}: {e}", flush=True)
+            _set_readiness(project_name, status="failed", error=str(e))
 
 
 def _discover_projects_from_bucket():
     """List top-level folders in the GCS bucket to discover project names."""
     try:
-        client = storage.Client()
-        bucket = client.bucket(GCS_BUCKET_NAME)
-        # List top-level prefixes (folders)
-        blobs = client.list_blobs(bucket, delimiter="/")
-        # Must consume the iterator to populate prefixes
-        _ = list(blobs)
-        projects = [p.rstrip("/") for p in blobs.prefixes]
-        return projects
+        return get_bucket_source().list_prefixes()
     except Exception as e:
         print(f"[Discover] Failed to list projects from bucket: {e}", flush=True)
         return []
 
 
-def _download_chroma_db_from_bucket(project_name, kb_root):
-    """Download chroma_db folder from GCS bucket to local knowledge-base."""
+def _download_chroma_db_from_bucket(project_name, kb_root, local_dir=None, progress=None, seed_dir=None):
+    """
+    Sync chroma_db folder from GCS bucket to local knowledge-base (or local_dir).
+    The project's snapshot bundle is streamed and unpacked when there is one.
+    Otherwise blobs are downloaded in parallel and those unchanged since the last
+    sync are skipped (seed_dir: a copy to start from when local_dir is empty).
+    """
     gcs_prefix = f"{project_name}/chroma_db/"
-    local_dir = os.path.join(kb_root, project_name, "chroma_db")
-    os.makedirs(local_dir, exist_ok=True)
+    local_dir = local_dir or os.path.join(kb_root, project_name, "chroma_db")
+    source = get_bucket_source()
+
+    if seed_dir and os.path.isdir(seed_dir) and not os.path.exists(local_dir):
+        # Seed with an existing copy: an unchanged bundle is then skipped, and a
+        # blob sync only fetches changed blobs
+        shutil.copytree(seed_dir, local_dir)
+
+    if CHROMA_SNAPSHOT_BUNDLES:
+        try:
+            stats = fetch_bundle(source, project_name, local_dir, progress=progress)
+        except Exception as e:
+            print(f"[Download] Snapshot bundle of {project_name} unusable, syncing blobs instead: {e}", flush=True)
+            stats = None
+        if stats is not None:
+            print(
+                f"[Download] {project_name} bundle ({stats['created_at']}): "
+                + ("unchanged" if stats["skipped"] else
+                   f"{stats['files']} files, {stats['bytes'] / (1024 * 1024):.1f} MB in {stats['seconds']} s"),
+                flush=True,
+            )
+            return stats
+
+    stats = sync_prefix(source, gcs_prefix, local_dir, progress=progress)
+    if not stats["files"]:
+        print(f"[Download] No files found in {source.describe()}/{gcs_prefix}", flush=True)
+        return stats
+
+    print(
+        f"[Download] {project_name}/chroma_db: {stats['downloaded']} downloaded, {stats['skipped']} unchanged, "
+        f"{stats['removed']} removed ({stats['bytes'] / (1024 * 1024):.1f} MB in {stats['seconds']} s)",
+        flush=True,
+    )
+    return stats
+
+
+def _open_project_handle(project_name, kb_path):
+    """Open a PersistentClient on kb_path and load all its collections into a new handle."""
+    client = chromadb.PersistentClient(path=kb_path, settings=Settings(anonymized_telemetry=False, allow_reset=False))
+
+    model_name = get_embedding_model(project_name)
+    ef = embedding_functions.OpenAIEmbeddingFunction(
+        api_key=OPENAI_API_KEY, model_name=model_name,
+        api_base=OPENAI_API_BASE,
+    )
 
-    client = storage.Client()
-    bucket = client.bucket(GCS_BUCKET_NAME)
-    blobs = list(client.list_blobs(bucket, prefix=gcs_prefix))
+    collections = {}
+    for col in client.list_collections():
+        collection = client.get_collection(name=col.name)
+        collection._embedding_function = ef
+        collections[col.name] = collection
 
-    if not blobs:
-        print(f"[Download] No files found in gs://{GCS_BUCKET_NAME}/{gcs_prefix}", flush=True)
+    return {
+        "client": client,
+        "path": os.path.abspath(kb_path),
+        "version": os.path.basename(kb_path),
+        "collections": collections,
+        "inflight": 0,
+        "retired": False,
+        "last_used": time.monotonic(),
+        "rss_mb": None,
+        # collection name -> BM25Index (hybrid search), filled by _get_lexical_index
+        "lexical": {},
+        "lexical_lock": threading.Lock(),
+        # collection name -> ExactIndex snapshot (small collections only)
+        "exact": {},
+        # collection name -> warm-up query ms (None: empty collection), or error message
+        "warmup": {},
+        "warmup_errors": {},
+        # collection name -> (inventory, "index" | "scan"), see get_collection_inventory
+        "inventory": {},
+    }
+
+
+def _warm_up_collection(collection, queries=None):
+    """
+    Run a synthetic query with vectors already stored in the collection
+    (CHROMA_WARMUP_QUERIES of them). Pages in the HNSW index and SQLite file.
+    Returns elapsed ms (None if empty).
+    """
+    sample = collection.get(limit=queries or CHROMA_WARMUP_QUERIES, include=["embeddings"])
+    embeddings = sample.get("embeddings")
+    if embeddings is None or len(embeddings) == 0:
+        return None
+    started = time.perf_counter()
+    collection.query(query_embeddings=[list(e) for e in embeddings], n_results=1, include=[])
+    return round((time.perf_counter() - started) * 1000, 2)
+
+
+def _validate_project_handle(project_name, handle, collection_name=None, expected_counts=None):
+    """
+    Check a freshly opened handle before it goes live: every (or the named)
+    collection must be non-empty, match expected_counts when given, and answer
+    a warm-up query. Raises ValueError on failure; returns per-collection report.
+    """
+    if not handle["collections"]:
+        raise ValueError(f"No collections found in {handle['path']}")
+    names = [collection_name] if collection_name else list(handle["collections"])
+    report = {}
+    for name in names:
+        collection = handle["collections"].get(name)
+        if collection is None:
+            raise ValueError(f"Collection '{name}' not found in {handle['path']}")
+        count = collection.count()
+        expected = (expected_counts or {}).get(name)
+        if count == 0:
+            raise ValueError(f"Collection '{name}' is empty")
+        if expected is not None and count != expected:
+            raise ValueError(f"Collection '{name}' has {count} items, expected {expected}")
+        handle["warmup"][name] = _warm_up_collection(collection)
+        report[name] = {"count": count, "warmup_ms": handle["warmup"][name]}
+    return report
+
+
+def _release_chroma_client(client, path):
+    """
+    Stop a PersistentClient's system and drop it from chromadb's per-path system
+    cache, so its files can be deleted and the path reopened from scratch.
+    chromadb has no public close(): this relies on SharedSystemClient internals
+    (client._system, client._identifier, SharedSystemClient._identifier_to_system)
+    as of chromadb 1.5.x. If they change, it warns and releases nothing.
+    """
+    try:
+        from chromadb.api.shared_system_client import SharedSystemClient
+        system = client._system
+        identifier = getattr(client, "_identifier", path)
+        system.stop()
+        SharedSystemClient._identifier_to_system.pop(identifier, None)
+        return True
+    except Exception as e:
+        print(
+            f"[Reload] ⚠️  Could not release the chromadb client of {path} ({e.__class__.__name__}: {e}); "
+            f"dropping the reference only (private API written against chromadb 1.5.x)",
+            flush=True,
+        )
+        return False
+
+
+def _close_project_handle(handle):
+    """Release a retired client and delete its staging directory (best effort)."""
+    with _HANDLES_LOCK:
+        shared = any(live["path"] == handle["path"] for live in _PROJECT_HANDLES.values())
+    if shared:
+        # Chroma shares one system per path: a live handle reopened on this path uses it too
+        print(f"[Reload] Retired client {handle['path']} shares its system with a live handle, not stopping it", flush=True)
+        return
+    if handle["client"] is not None:
+        _release_chroma_client(handle["client"], handle["path"])
+    # Drop our references either way: whatever the client still holds is freed with it
+    handle["client"] = None
+    handle["collections"] = {}
+    if os.path.basename(os.path.dirname(handle["path"])) == _STAGING_DIRNAME:
+        shutil.rmtree(handle["path"], ignore_errors=True)
+    print(f"[Reload] Closed retired client {handle['path']}", flush=True)
+
+
+def _prepare_handle(project_name, handle):
+    """Warm-up and in-memory indexes done before a handle goes live, so its first queries don't pay for them."""
+    for name, collection in handle["collections"].items():
+        if name not in handle["warmup"]:
+            try:
+                handle["warmup"][name] = _warm_up_collection(collection)
+            except Exception as e:
+                handle["warmup_errors"][name] = str(e)
+                print(f"[Warmup] Synthetic query failed for {project_name}/{name}: {e}", flush=True)
+        try:
+            index = build_exact_index(collection)
+            if index is not None:
+                bench = benchmark_engines(collection, index)
+                handle["exact"][name] = index
+                print(
+                    f"[Exact] {project_name}/{name}: {bench['items']} items, hnsw {bench['hnsw_ms']} ms "
+                    f"vs exact {bench['exact_ms']} ms -> {bench['engine']}",
+                    flush=True,
+                )
+        except Exception as e:
+            print(f"[Exact] Failed to snapshot {project_name}/{name}: {e}", flush=True)
+        if HYBRID_INDEX_ON_LOAD:
+            try:
+                _get_lexical_index(handle, name, collection)
+            except Exception as e:
+                print(f"[Hybrid] Failed to build lexical index for {project_name}/{name}: {e}", flush=True)
+
+
+def _swap_project_handle(project_name, handle, rss_before=None):
+    """
+    Atomically make handle the live one for project_name and retire the previous one.
+    rss_before (process RSS before the handle was opened) sets its rss_mb once the
+    warm-up and in-memory indexes are built, so the residency budget counts them.
+    """
+    _prepare_handle(project_name, handle)
+    if rss_before is not None:
+        handle["rss_mb"] = _rss_delta(rss_before)
+    with _HANDLES_LOCK:
+        old = _PROJECT_HANDLES.get(project_name)
+        _PROJECT_HANDLES[project_name] = handle
+        _PRELOADED_COLLECTIONS[project_name] = handle["collections"]
+        close_now = False
+        # Same path means the same shared Chroma system: nothing to close
+        if old is not None and old["path"] != handle["path"]:
+            old["retired"] = True
+            close_now = old["inflight"] == 0
+    _record_warmup(project_name, handle)
+    invalidate_query_cache(project_name)
+    if close_now:
+        _close_project_handle(old)
+    _enforce_residency_budget(keep=project_name)
+
+
+def _set_readiness(project_name, **state):
+    with _HANDLES_LOCK:
+        _READINESS["projects"][project_name] = state
+
+
+def _record_warmup(project_name, handle):
+    """Publish the warm-up timings of a handle that just went live."""
+    timings = dict(handle["warmup"])
+    state = {
+        "status": "failed" if handle["warmup_errors"] else "warm",
+        "version": handle["version"],
+        "warmup_ms": round(sum(ms for ms in timings.values() if ms), 2),
+        "collections": timings,
+        "warmed_at": datetime.now().isoformat(),
+    }
+    if handle["warmup_errors"]:
+        state["errors"] = dict(handle["warmup_errors"])
+    print(f"[Warmup] {project_name}: {len(timings)} collection(s) answered in {state['warmup_ms']} ms", flush=True)
+    _set_readiness(project_name, **state)
+
+
+def get_readiness():
+    """
+    Ready once startup preloading is done and no preloaded project is still loading:
+    every collection of a live project has answered a synthetic query by then.
+    Projects that failed are reported but don't hold readiness back (waiting won't fix them).
+    """
+    with _HANDLES_LOCK:
+        projects = {name: dict(state) for name, state in _READINESS["projects"].items()}
+    ready = _READINESS["preload_done"] and all(s["status"] != "loading" for s in projects.values())
+    return {
+        "ready": ready,
+        "lazy": CHROMA_LAZY_LOAD,
+        "preload_started_at": _READINESS["started_at"],
+        "preload_finished_at": _READINESS["finished_at"],
+        "projects": projects,
+    }
+
+
+def _current_rss_mb():
+    """Resident set size of this process in MB (None where /proc is unavailable)."""
+    try:
+        with open("/proc/self/statm") as f:
+            resident_pages = int(f.read().split()[1])
+        return resident_pages * os.sysconf("SC_PAGE_SIZE") / (1024 * 1024)
+    except (OSError, ValueError, AttributeError):
+        return None
+
+
+def _rss_delta(rss_before):
+    rss_after = _current_rss_mb()
+    if rss_before is None or rss_after is None:
+        return None
+    return round(max(0.0, rss_after - rss_before), 1)
+
+
+def _enforce_residency_budget(keep=None):
+    """Evict least-recently-used projects while over CHROMA_MAX_RESIDENT_PROJECTS / CHROMA_MAX_RESIDENT_MB."""
+    if CHROMA_MAX_RESIDENT_PROJECTS <= 0 and CHROMA_MAX_RESIDENT_MB <= 0:
         return
+    evicted = []
+    with _HANDLES_LOCK:
+        while True:
+            over_count = 0 < CHROMA_MAX_RESIDENT_PROJECTS < len(_PROJECT_HANDLES)
+            resident_mb = sum(h.get("rss_mb") or 0 for h in _PROJECT_HANDLES.values())
+            over_memory = 0 < CHROMA_MAX_RESIDENT_MB < resident_mb
+            candidates = [(p, h) for p, h in _PROJECT_HANDLES.items() if p != keep]
+            if not (over_count or over_memory) or not candidates:
+                break
+            project_name, handle = min(candidates, key=lambda item: item[1]["last_used"])
+            del _PROJECT_HANDLES[project_name]
+            _PRELOADED_COLLECTIONS.pop(project_name, None)
+            handle["retired"] = True
+            evicted.append((project_name, handle, handle["inflight"] == 0))
+
+    for project_name, handle, close_now in evicted:
+        print(f"[Evict] Unloaded project '{project_name}' (rss ~{handle.get('rss_mb')} MB)", flush=True)
+        invalidate_query_cache(project_name)
+        if close_now:
+            _close_project_handle(handle)
+
+
+def _ensure_project_loaded(project_name):
+    """Open a known-but-unloaded project (lazy mode or after eviction). Returns True if it is live."""
+    info = _KNOWN_PROJECTS.get(project_name)
+    if info is None:
+        return False
+    with _HANDLES_LOCK:
+        load_lock = _LOAD_LOCKS.setdefault(project_name, threading.Lock())
+    with load_lock:
+        if project_name in _PROJECT_HANDLES:
+            return True
+        try:
+            kb_root = os.path.join(PROJECT_ROOT, "knowledge-base")
+            kb_path = os.path.join(kb_root, project_name, "chroma_db")
+            started = time.perf_counter()
+            rss_before = _current_rss_mb()
+            if not info["local_only"]:
+                # Stage the download: an evicted handle may still be serving leased queries from chroma_db
+                staging_dir = _new_staging_dir(project_name)
+                try:
+                    _download_chroma_db_from_bucket(project_name, kb_root, local_dir=staging_dir, seed_dir=kb_path)
+                except Exception:
+                    shutil.rmtree(staging_dir, ignore_errors=True)
+                    raise
+                kb_path = staging_dir
+            if not os.path.exists(kb_path):
+                print(f"[Lazy] No chroma_db folder for {project_name}", flush=True)
+                return False
+            handle = _open_project_handle(project_name, kb_path)
+            _swap_project_handle(project_name, handle, rss_before)
+            print(
+                f"[Lazy] Loaded project '{project_name}' in {time.perf_counter() - started:.2f} s "
+                f"(rss ~{handle['rss_mb']} MB)",
+                flush=True,
+            )
+            return True
+        except Exception as e:
+            print(f"[Lazy] Failed to load project '{project_name}': {e}", flush=True)
+            return False
+
 
-    count = 0
-    for blob in blobs:
-        # Skip "directory" markers
-        if blob.name.endswith("/"):
+def _dir_size_mb(path):
+    total = 0
+    for dirpath, _, filenames in os.walk(path):
+        for filename in filenames:
+            try:
+                total += os.path.getsize(os.path.join(dirpath, filename))
+            except OSError:
+                pass
+    return round(total / (1024 * 1024), 1)
+
+
+def get_project_residency():
+    """Which projects are resident, their approximate memory/disk footprint and idle time."""
+    now = time.monotonic()
+    with _HANDLES_LOCK:
+        handles = dict(_PROJECT_HANDLES)
+        known = set(_KNOWN_PROJECTS) | set(handles)
+    projects = {}
+    for project_name in sorted(known):
+        handle = handles.get(project_name)
+        if handle is None:
+            projects[project_name] = {"resident": False}
             continue
-        # Preserve folder structure relative to chroma_db/
-        relative_path = blob.name[len(gcs_prefix):]
-        local_path = os.path.join(local_dir, relative_path.replace("/", os.sep))
-        os.makedirs(os.path.dirname(local_path), exist_ok=True)
-        blob.download_to_filename(local_path)
-        count += 1
+        projects[project_name] = {
+            "resident": True,
+            "rss_mb": handle.get("rss_mb"),
+            "disk_mb": _dir_size_mb(handle["path"]),
+            "idle_s": round(now - handle["last_used"], 1),
+            "inflight": handle["inflight"],
+            "version": handle["version"],
+            "collections": list(handle["collections"]),
+            # Benchmark that picked the search engine of each small collection
+            "engines": {name: index.benchmark for name, index in handle["exact"].items()},
+        }
+    return {
+        "lazy": CHROMA_LAZY_LOAD,
+        "max_resident_projects": CHROMA_MAX_RESIDENT_PROJECTS,
+        "max_resident_mb": CHROMA_MAX_RESIDENT_MB,
+        "process_rss_mb": _current_rss_mb(),
+        "projects": projects,
+    }
+
+
+class _ProjectLease:
+    """Pins the live handle of a project for the duration of a query."""
+
+    def __init__(self, project_name):
+        self.project_name = project_name
+        self.handle = None
+
+    def __enter__(self):
+        self.handle = self._acquire()
+        if self.handle is None and _ensure_project_loaded(self.project_name):
+            self.handle = self._acquire()
+        return self.handle
+
+    def _acquire(self):
+        with _HANDLES_LOCK:
+            handle = _PROJECT_HANDLES.get(self.project_name)
+            if handle is not None:
+                handle["inflight"] += 1
+                handle["last_used"] = time.monotonic()
+        return handle
+
+    def __exit__(self, *exc):
+        if self.handle is None:
+            return False
+        with _HANDLES_LOCK:
+            self.handle["inflight"] -= 1
+            close_now = self.handle["retired"] and self.handle["inflight"] == 0
+        if close_now:
+            _close_project_handle(self.handle)
+        return False
+
+
+def _lease_collection(lease, collection_name):
+    """Pick a collection from a leased handle (first one if no name is given)."""
+    if lease is None:
+        return None
+    if collection_name is None:
+        return next(iter(lease["collections"].values()), None)
+    return lease["collections"].get(collection_name)
+
+
+def scan_collection(project_name, collection_name=None, cursor=None, limit=None, include=None,
+                    where=None, fields=None, max_document_chars=None):
+    """One cursor-paginated page of a collection (see api.inventory.scan_page), or None if unavailable."""
+    with _ProjectLease(project_name) as lease:
+        collection = _lease_collection(lease, collection_name)
+        if collection is None:
+            return None
+        page = scan_page(collection, cursor, limit, include, where, fields, max_document_chars)
+        page["collection"] = collection.name
+        return page
+
+
+def get_collection_inventory(project_name, collection_name=None, include_documents=True):
+    """
+    Documents of a collection with their chunk counts and last indexed time.
+    Read from the summary written at index time (once per live handle); rebuilt
+    by a metadata-only scan when there is none or it no longer matches the count.
+    """
+    with _ProjectLease(project_name) as lease:
+        collection = _lease_collection(lease, collection_name)
+        if collection is None:
+            return None
+        cached = lease["inventory"].get(collection.name)
+        if cached is None:
+            inventory = load_inventory(lease["path"], collection.name)
+            source = "index"
+            if inventory is None or inventory["total_chunks"] != collection.count():
+                started = time.perf_counter()
+                inventory = inventory_from_scan(collection)
+                source = "scan"
+                print(
+                    f"[Inventory] No up-to-date summary for {project_name}/{collection.name}: scanned "
+                    f"{inventory['total_chunks']} chunks in {time.perf_counter() - started:.2f} s",
+                    flush=True,
+                )
+            # The handle's data never changes: cache for its lifetime
+            cached = lease["inventory"][collection.name] = (inventory, source)
+        return summarize_inventory(cached[0], cached[1], include_documents)
+
+
+def _get_lexical_index(handle, collection_name, collection):
+    """BM25 index of a collection of this handle, built once (the handle's data never changes)."""
+    index = handle["lexical"].get(collection_name)
+    if index is not None:
+        return index
+    with handle["lexical_lock"]:
+        index = handle["lexical"].get(collection_name)
+        if index is None:
+            started = time.perf_counter()
+            rss_before = _current_rss_mb()
+            index = build_bm25_index(collection)
+            handle["lexical"][collection_name] = index
+            # Built after the handle went live: add it to the project's footprint
+            added_mb = _rss_delta(rss_before)
+            if added_mb is not None:
+                handle["rss_mb"] = round((handle.get("rss_mb") or 0) + added_mb, 1)
+            print(
+                f"[Hybrid] Built lexical index for {collection_name} ({len(index)} items, "
+                f"{len(index.postings)} terms) in {time.perf_counter() - started:.2f} s",
+                flush=True,
+            )
+    return index
+
+
+def _new_staging_dir(project_name):
+    version = datetime.now().strftime("%Y%m%d-%H%M%S-%f")
+    return os.path.join(PROJECT_ROOT, "knowledge-base", project_name, _STAGING_DIRNAME, version)
+
+
+def _bucket_snapshot_unchanged(project_name, local_dir):
+    """
+    Whether local_dir already holds the project's snapshot in the bucket (same
+    bundle checksum, else every blob unchanged per the sync manifest). Only the
+    bundle manifest / blob listing is read; False when in doubt.
+    """
+    source = get_bucket_source()
+    try:
+        if CHROMA_SNAPSHOT_BUNDLES:
+            current = bundle_is_current(source, project_name, local_dir)
+            if current is not None:
+                return current
+        return prefix_is_current(source, f"{project_name}/chroma_db/", local_dir)
+    except Exception as e:
+        print(f"[Reload] Could not compare {project_name} with the bucket, reloading: {e}", flush=True)
+        return False
 
-    print(f"[Download] Downloaded {count} files for {project_name}/chroma_db", flush=True)
 
+def reload_project_from_bucket(project_name, expected_counts=None, progress=None):
+    """
+    Zero-downtime reload: download the project's chroma_db into a fresh staging
+    directory, validate it, then swap it in. The live collections keep serving
+    until the swap; on any failure they stay untouched.
+    Returns False, without staging anything, when the live copy already matches
+    the bucket; True once the new copy is live.
+    """
+    live = _PROJECT_HANDLES.get(project_name)
+    if live is not None and _bucket_snapshot_unchanged(project_name, live["path"]):
+        print(f"[Reload] {project_name}: bucket snapshot unchanged, keeping the live copy", flush=True)
+        return False
 
-def reload_project_collections(project_name,collection_name=None):
-    """Reload collections for a single project after an update/re-index."""
+    staging_dir = _new_staging_dir(project_name)
+    kb_root = os.path.join(PROJECT_ROOT, "knowledge-base")
     try:
-        kb_path = os.path.join(PROJECT_ROOT, "knowledge-base", project_name, "chroma_db")
-        client = chromadb.PersistentClient(path=kb_path, settings=Settings(anonymized_telemetry=False, allow_reset=False))
-        all_collections = client.list_collections()
-
-        model_name = _EMBEDDING_MODELS.get(project_name, _DEFAULT_EMBEDDING_MODEL)
-        ef = embedding_functions.OpenAIEmbeddingFunction(
-            api_key=OPENAI_API_KEY, model_name=model_name,
-            api_base=OPENAI_API_BASE,
+        # Start from the live copy (an unchanged bundle is skipped, a blob sync fetches only changes)
+        stats = _download_chroma_db_from_bucket(
+            project_name, kb_root, local_dir=staging_dir, progress=progress,
+            seed_dir=live["path"] if live is not None else None,
         )
+    except Exception:
+        shutil.rmtree(staging_dir, ignore_errors=True)
+        raise
+    # A bundle's manifest records the collection counts it was built with
+    expected_counts = expected_counts or (stats or {}).get("collections") or None
+    if not reload_project_collections(project_name, kb_path=staging_dir, expected_counts=expected_counts):
+        shutil.rmtree(staging_dir, ignore_errors=True)
+        raise RuntimeError(f"Validation failed for staged chroma_db of {project_name}")
+    return True
 
-        _PRELOADED_COLLECTIONS.setdefault(project_name, {})
-        if collection_name:
-            # Reload only the specified collection
-            collection = client.get_collection(name=collection_name)
-            collection._embedding_function = ef
-            _PRELOADED_COLLECTIONS[project_name][collection_name] = collection
-            print(f"[Reload] Refreshed collection for {project_name}: {collection_name} ({collection.count()} items)")
-        else:
-            # Reload all collections
-            _PRELOADED_COLLECTIONS[project_name] = {}
-            for col in all_collections:
-                collection = client.get_collection(name=col.name)
-                collection._embedding_function = ef
-                _PRELOADED_COLLECTIONS[project_name][col.name] = collection
-                print(f"[Reload] Refreshed collection for {project_name}: {col.name} ({collection.count()} items)")
+
+def reload_project_collections(project_name, collection_name=None, kb_path=None, expected_counts=None):
+    """
+    Reload collections for a single project after an update/re-index.
+    Opens kb_path (default knowledge-base/<project>/chroma_db) in a new client,
+    validates it with a count check and a warm-up query, then swaps it in atomically.
+    Returns True on success; on failure the current collections stay live.
+    """
+    handle = None
+    try:
+        if kb_path is None:
+            kb_path = os.path.join(PROJECT_ROOT, "knowledge-base", project_name, "chroma_db")
+        rss_before = _current_rss_mb()
+        handle = _open_project_handle(project_name, kb_path)
+        report = _validate_project_handle(project_name, handle, collection_name, expected_counts)
+        _swap_project_handle(project_name, handle, rss_before)
+        for name, info in report.items():
+            print(f"[Reload] Refreshed collection for {project_name}: {name} ({info['count']} items, warm-up {info['warmup_ms']} ms)")
+        return True
     except Exception as e:
         print(f"[Reload] Failed to reload collections for {project_name}: {e}")
+        live = _PROJECT_HANDLES.get(project_name)
+        # Don't leave the rejected client open (unless it shares the live one's path)
+        if handle is not None and (live is None or live["path"] != handle["path"]):
+            _close_project_handle(handle)
+        return False
+
+
+def _build_query_args(query, project_name=None, collection=None):
+    """Translate a /query payload dict into collection.query() keyword arguments.
+
+    Accepts either a single "query_embedding" or a list of "query_embeddings",
+    as JSON float lists or base64 float32 ("query_embedding_b64" / "query_embeddings_b64"),
+    or raw "query_text" / "query_texts" embedded centrally with the project's model.
+    Full-size embeddings are shortened to the collection's storage profile.
+    """
+    if "query_texts" in query:
+        query_embeddings = embed_texts(query["query_texts"], get_embedding_model(project_name))
+    elif "query_text" in query:
+        query_embeddings = [embed_text(query["query_text"], get_embedding_model(project_name))]
+    elif "query_embeddings_b64" in query:
+        query_embeddings = [decode_embedding(e) for e in query["query_embeddings_b64"]]
+    elif "query_embedding_b64" in query:
+        query_embeddings = [decode_embedding(query["query_embedding_b64"])]
+    elif "query_embeddings" in query:
+        query_embeddings = list(query["query_embeddings"])
+    else:
+        query_embeddings = [query["query_embedding"]]
+    if collection is not None:
+        query_embeddings = fit_query_embeddings(query_embeddings, collection)
+    include = list(query.get("include", ["documents"]))
+    # Field projection needs the metadatas
+    if query.get("fields") and "metadatas" not in include:
+        include.append("metadatas")
+    query_args = {
+        "query_embeddings": query_embeddings,
+        "n_results": query.get("n_results", 10),
+        "include": include,
+    }
+    where = query.get("where")
+    if where:
+        query_args["where"] = where
+    return query_args
+
+
+def _project_results(results, query):
+    """
+    Apply the payload's projection options to a query result:
+      - fields: list of metadata keys to keep
+      - max_document_chars: truncate each document to this many characters
+    Returns a new dict; the (possibly cached) input is left untouched.
+    """
+    fields = query.get("fields")
+    max_chars = query.get("max_document_chars")
+    if not fields and max_chars is None:
+        return results
+
+    projected = dict(results)
+    if fields and results.get("metadatas") is not None:
+        keep = set(fields)
+        projected["metadatas"] = [
+            [{k: v for k, v in (meta or {}).items() if k in keep} for meta in row]
+            for row in results["metadatas"]
+        ]
+    if max_chars is not None and results.get("documents") is not None:
+        max_chars = max(0, int(max_chars))
+        projected["documents"] = [
+            [doc[:max_chars] if doc else doc for doc in row]
+            for row in results["documents"]
+        ]
+    return projected
+
+
+def _split_query_results(results, count):
+    """Split a multi-embedding collection.query() result into one result per embedding."""
+    split = []
+    for i in range(count):
+        item = {}
+        for key, value in results.items():
+            # Per-query fields are lists of lists; others (e.g. "included") are shared
+            if isinstance(value, list) and len(value) == count and key != "included":
+                item[key] = [value[i]]
+            else:
+                item[key] = value
+        split.append(item)
+    return split
 
 
 # Example query function (to be adapted for your schema)
 def query_vector_db(project_name, collection_name, query):
+    # Pin the live handle so a concurrent reload can't close it under this query
+    with _ProjectLease(project_name) as lease:
+        return _query_vector_db(project_name, collection_name, query, _lease_collection(lease, collection_name), lease)
+
 
-    collection = get_collection(project_name, collection_name)
+def _query_vector_db(project_name, collection_name, query, collection, handle=None):
     if collection is None:
         return {"error": "ChromaDB collection is not available. Please run 'python index_chromadb.py' first to index your documents."}
     
+    # A plain string is a text query embedded centrally
+    if isinstance(query, str):
+        query = {"query_text": query}
+
     # If query is a dict, treat as advanced vector search
     if isinstance(query, dict):
-        # Expecting keys: query_embedding, n_results, include, (optional) where
+        # Expecting keys: query_embedding (or query_embeddings / query_text), n_results, include, (optional) where
         try:
-            query_embedding = query["query_embedding"]
-            n_results = query.get("n_results", 10)
-            include = query.get("include", ["documents"])
-            where = query.get("where")
-            query_args = {
-                "query_embeddings": [query_embedding],
-                "n_results": n_results,
-                "include": include
-            }
-            if where:
-                query_args["where"] = where
-            results = collection.query(**query_args)
-            return results
+            query_args = _build_query_args(query, project_name, collection)
+            hybrid = _hybrid_options(query, query_args) if query.get("mode") == "hybrid" else None
+            diversify = diversify_options(query, query_args["n_results"])
+            extra = {k: v for k, v in (("hybrid", hybrid), ("diversify", diversify)) if v} or None
+            cache_key = _query_cache_key(project_name, collection_name, query_args, extra)
+            hit, results, generation = _query_cache_get(cache_key)
+            if not hit:
+                def search():
+                    found = _search_collection(collection, handle, query_args, hybrid, diversify)
+                    _query_cache_put(cache_key, found, generation)
+                    return found
+                # Identical queries already running share that search (results are read-only)
+                results = _single_flight(cache_key, generation, search)
+            return _project_results(results, query)
         except Exception as e:
             import traceback
             traceback.print_exc()
             return {"error": f"Invalid vector search payload or ChromaDB error: {str(e)}"}
-    # Else, treat as simple question string
-    return {"project": project_name, "question": query, "result": "(vector search result here)"}
+    return {"error": f"Unsupported query type: {type(query).__name__}"}
+
+
+def _vector_query(collection, handle, query_args):
+    """collection.query(), answered from the exact in-memory snapshot when that is the faster engine."""
+    index = handle["exact"].get(collection.name) if handle is not None else None
+    if index is not None and index.engine == "exact":
+        try:
+            return index.query(**query_args)
+        except UnsupportedQuery:
+            pass
+    return collection.query(**query_args)
+
+
+def _search_collection(collection, handle, query_args, hybrid=None, diversify=None):
+    """collection.query(), optionally fused with BM25 (hybrid) and/or diversified."""
+    search_args = query_args
+    if diversify:
+        # Search a larger pool, with what the diversification needs to look at
+        include = list(query_args["include"])
+        if diversify["mmr_lambda"] is not None:
+            include.append("embeddings")
+        if needs_metadatas(diversify):
+            include.append("metadatas")
+        search_args = dict(query_args, n_results=diversify["candidates"], include=list(dict.fromkeys(include)))
+
+    if hybrid:
+        results = _hybrid_query(collection, handle, search_args, hybrid)
+    else:
+        results = _vector_query(collection, handle, search_args)
+
+    if diversify:
+        results = _diversify_results(results, query_args, diversify)
+    return results
+
+
+def _diversify_results(results, query_args, options):
+    """Keep n_results diverse items per row; fields the caller didn't include are dropped again."""
+    include = query_args["include"]
+    n_results = query_args["n_results"]
+    row_keys = [k for k in ("distances", "documents", "metadatas", "embeddings", "scores") if results.get(k) is not None]
+
+    diversified = dict(results, ids=[], included=include)
+    for key in row_keys:
+        diversified[key] = [] if key == "scores" or key in include else None
+    if has_exclusions(options):
+        diversified["excluded"] = []
+
+    for row, ids in enumerate(results["ids"]):
+        metadatas = results["metadatas"][row] if results.get("metadatas") is not None else None
+        embeddings = results["embeddings"][row] if results.get("embeddings") is not None else None
+        picked = select_diverse(list(ids), metadatas, embeddings, query_args["query_embeddings"][row], options, n_results)
+        if has_exclusions(options):
+            diversified["excluded"].append(count_excluded(list(ids), metadatas, options))
+        diversified["ids"].append([ids[i] for i in picked])
+        for key in row_keys:
+            if diversified[key] is not None:
+                diversified[key].append([results[key][row][i] for i in picked])
+    return diversified
+
+
+def _hybrid_options(query, query_args):
+    """
+    Options of a "mode": "hybrid" query. The lexical side needs text: query_text /
+    query_texts, or "lexical_query" (str or list) when embeddings are sent.
+    """
+    texts = query.get("lexical_query") or query.get("query_texts") or query.get("query_text")
+    if not texts:
+        raise ValueError("hybrid mode needs query_text, query_texts or lexical_query")
+    if isinstance(texts, str):
+        texts = [texts]
+    n_rows = len(query_args["query_embeddings"])
+    if len(texts) == 1 and n_rows > 1:
+        texts = texts * n_rows
+    if len(texts) != n_rows:
+        raise ValueError(f"hybrid mode got {len(texts)} lexical text(s) for {n_rows} embedding(s)")
+    weights = query.get("weights") or {}
+    return {
+        "texts": list(texts),
+        "candidates": max(int(query.get("candidates", HYBRID_CANDIDATES)), query_args["n_results"]),
+        "vector_weight": float(weights.get("vector", HYBRID_VECTOR_WEIGHT)),
+        "lexical_weight": float(weights.get("lexical", HYBRID_LEXICAL_WEIGHT)),
+        "rrf_k": int(query.get("rrf_k", HYBRID_RRF_K)),
+    }
+
+
+def _hybrid_query(collection, handle, query_args, hybrid):
+    """
+    Vector search + BM25 search over the same collection, fused by reciprocal rank.
+    Returns a collection.query()-shaped result of n_results per row, plus
+    "scores" (fused RRF score). Items found only lexically have distance None.
+    """
+    include = list(query_args["include"])
+    where = query_args.get("where")
+    n_results = query_args["n_results"]
+    candidates = max(hybrid["candidates"], n_results)
+    index = _get_lexical_index(handle, collection.name, collection)
+    vector = _vector_query(collection, handle, dict(
+        query_args,
+        n_results=candidates,
+        include=list(dict.fromkeys(include + ["distances"])),
+    ))
+    stored_keys = [k for k in ("documents", "metadatas", "embeddings") if k in include]
+    # Per-query fields of the vector result, indexed by id
+    row_keys = [k for k in ("distances", "documents", "metadatas", "embeddings") if k in include]
+
+    results = {"ids": [], "scores": []}
+    for key in row_keys:
+        results[key] = []
+
+    for row, text in enumerate(hybrid["texts"]):
+        vector_ids = list(vector["ids"][row])
+        by_id = {
+            item_id: {key: vector[key][row][i] for key in row_keys if vector.get(key) is not None}
+            for i, item_id in enumerate(vector_ids)
+        }
+        lexical_ids = [item_id for item_id, _ in index.search(text, candidates)]
+        if where and lexical_ids:
+            # Let Chroma apply the where filter to the lexical candidates
+            allowed = set(collection.get(ids=lexical_ids, where=where, include=[])["ids"])
+            lexical_ids = [item_id for item_id in lexical_ids if item_id in allowed]
+
+        fused = reciprocal_rank_fusion(
+            [vector_ids, lexical_ids],
+            [hybrid["vector_weight"], hybrid["lexical_weight"]],
+            hybrid["rrf_k"],
+        )[:n_results]
+
+        missing = [item_id for item_id, _ in fused if item_id not in by_id]
+        if missing:
+            fetched = collection.get(ids=missing, include=stored_keys) if stored_keys else {"ids": missing}
+            for i, item_id in enumerate(fetched["ids"]):
+                by_id[item_id] = {key: fetched[key][i] for key in stored_keys if fetched.get(key) is not None}
+
+        results["ids"].append([item_id for item_id, _ in fused])
+        results["scores"].append([round(score, 6) for _, score in fused])
+        for key in row_keys:
+            results[key].append([by_id.get(item_id, {}).get(key) for item_id, _ in fused])
+
+    results["included"] = include
+    return results
+
+
+def _prefetch_text_embeddings(items):
+    """Embed all text queries of a batch with one gateway call per model (results land in the embedding cache)."""
+    texts_by_model = {}
+    for item in items:
+        query = item.get("query")
+        if not isinstance(query, dict):
+            continue
+        texts = query.get("query_texts") or ([query["query_text"]] if "query_text" in query else [])
+        if texts:
+            texts_by_model.setdefault(get_embedding_model(item.get("project_name")), []).extend(texts)
+    for model, texts in texts_by_model.items():
+        try:
+            embed_texts(texts, model)
+        except Exception as e:
+            # Per-item errors are reported when each query is built
+            print(f"[Batch] Failed to embed {len(texts)} text(s) with {model}: {e}", flush=True)
+
+
+def query_vector_db_batch(items):
+    """
+    Run many vector searches in one call.
+    Each item is {project_name, collection_name, query}. Items hitting the same
+    collection with the same n_results/include/where are grouped into a single
+    collection.query() call with several query embeddings.
+    Returns one result (or error dict) per item, in input order.
+    """
+    # Pin the live handle of every project involved for the whole batch
+    with ExitStack() as stack:
+        leases = {}
+        for item in items:
+            project_name = item.get("project_name")
+            if project_name not in leases:
+                leases[project_name] = stack.enter_context(_ProjectLease(project_name))
+        return _query_vector_db_batch(items, leases)
+
+
+def _query_vector_db_batch(items, leases):
+    results = [None] * len(items)
+    groups = {}
+
+    items = [
+        dict(item, query={"query_text": item["query"]}) if isinstance(item.get("query"), str) else item
+        for item in items
+    ]
+    _prefetch_text_embeddings(items)
+
+    for idx, item in enumerate(items):
+        project_name = item.get("project_name")
+        collection_name = item.get("collection_name")
+        query = item.get("query")
+
+        collection = _lease_collection(leases.get(project_name), collection_name)
+
+        # Hybrid/diversified queries post-process per item and can't share a collection.query() call
+        if not isinstance(query, dict) or query.get("mode") == "hybrid" or wants_diversification(query):
+            results[idx] = _query_vector_db(project_name, collection_name, query, collection, leases.get(project_name))
+            continue
+
+        if collection is None:
+            results[idx] = {"error": f"ChromaDB collection '{collection_name}' is not available for project '{project_name}'."}
+            continue
+
+        try:
+            query_args = _build_query_args(query, project_name, collection)
+        except Exception as e:
+            results[idx] = {"error": f"Invalid vector search payload: {str(e)}"}
+            continue
+
+        cache_key = _query_cache_key(project_name, collection_name, query_args)
+        hit, cached, generation = _query_cache_get(cache_key)
+        if hit:
+            results[idx] = _project_results(cached, query)
+            continue
+
+        # Same key minus the embedding hash: these items can share one collection.query()
+        group_key = cache_key[:2] + cache_key[3:]
+        group = groups.setdefault(group_key, {
+            "collection": collection, "handle": leases.get(project_name), "args": query_args, "members": [],
+        })
+        group["members"].append({
+            "idx": idx,
+            "query": query,
+            "embeddings": query_args["query_embeddings"],
+            "cache_key": cache_key,
+            "generation": generation,
+        })
+
+    for group in groups.values():
+        embeddings = [emb for member in group["members"] for emb in member["embeddings"]]
+        query_args = dict(group["args"], query_embeddings=embeddings)
+        try:
+            split = _split_query_results(_vector_query(group["collection"], group["handle"], query_args), len(embeddings))
+        except Exception as e:
+            import traceback
+            traceback.print_exc()
+            for member in group["members"]:
+                results[member["idx"]] = {"error": f"ChromaDB error: {str(e)}"}
+            continue
+
+        # Re-assemble per item (an item may itself carry several embeddings)
+        offset = 0
+        for member in group["members"]:
+            parts = split[offset:offset + len(member["embeddings"])]
+            offset += len(member["embeddings"])
+            if len(parts) == 1:
+                item_result = parts[0]
+            else:
+                item_result = {}
+                for key in parts[0]:
+                    if isinstance(parts[0][key], list) and key != "included":
+                        item_result[key] = [row for part in parts for row in part[key]]
+                    else:
+                        item_result[key] = parts[0][key]
+            _query_cache_put(member["cache_key"], item_result, member["generation"])
+            results[member["idx"]] = _project_results(item_result, member["query"])
+
+    return results
 
 
 def extract_entities(results):
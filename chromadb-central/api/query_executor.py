@@ -0,0 +1,118 @@
+"""
+Bounded executor for blocking ChromaDB work.
+
+collection.query() and smart_query() are synchronous (HNSW + SQLite). Running them
+directly inside `async def` routes blocks the event loop, so every other request in
+the worker waits. Routes submit that work here instead: a fixed-size thread pool
+caps per-process search concurrency, a queue limit sheds load early, and each call
+reports its queue-wait time separately from its search time.
+
+Configuration (env):
+  - QUERY_MAX_CONCURRENCY: worker threads running searches (default 4)
+  - QUERY_MAX_QUEUE: searches allowed to wait for a thread before rejecting (default 64)
+"""
+import os
+import time
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+QUERY_MAX_CONCURRENCY = max(1, int(os.getenv("QUERY_MAX_CONCURRENCY", "4")))
+QUERY_MAX_QUEUE = max(0, int(os.getenv("QUERY_MAX_QUEUE", "64")))
+
+_EXECUTOR = ThreadPoolExecutor(max_workers=QUERY_MAX_CONCURRENCY, thread_name_prefix="chroma-query")
+
+_STATE_LOCK = threading.Lock()
+_IN_FLIGHT = 0  # submitted and not finished (queued + running)
+_STATS = {
+    "completed": 0,
+    "failed": 0,
+    "rejected": 0,
+    "queue_ms_total": 0.0,
+    "queue_ms_max": 0.0,
+    "search_ms_total": 0.0,
+    "search_ms_max": 0.0,
+}
+
+
+class QueryQueueFull(Exception):
+    """Raised when the executor already holds QUERY_MAX_CONCURRENCY + QUERY_MAX_QUEUE calls."""
+
+
+async def run_query(fn, *args, **kwargs):
+    """
+    Run a blocking function on the bounded query executor.
+    Returns (result, timings) where timings = {"queue_ms": ..., "search_ms": ...}.
+    Raises QueryQueueFull if the queue limit is reached.
+    """
+    global _IN_FLIGHT
+    with _STATE_LOCK:
+        if _IN_FLIGHT >= QUERY_MAX_CONCURRENCY + QUERY_MAX_QUEUE:
+            _STATS["rejected"] += 1
+            raise QueryQueueFull(f"Query queue full ({_IN_FLIGHT} in flight)")
+        _IN_FLIGHT += 1
+
+    submitted = time.perf_counter()
+
+    def _task():
+        started = time.perf_counter()
+        try:
+            return fn(*args, **kwargs), started
+        finally:
+            # Record timings even when fn raises
+            _record(started - submitted, time.perf_counter() - started)
+
+    loop = asyncio.get_running_loop()
+    try:
+        result, started = await loop.run_in_executor(_EXECUTOR, _task)
+    except Exception:
+        with _STATE_LOCK:
+            _STATS["failed"] += 1
+        raise
+    finally:
+        with _STATE_LOCK:
+            _IN_FLIGHT -= 1
+
+    finished = time.perf_counter()
+    timings = {
+        "queue_ms": round((started - submitted) * 1000, 2),
+        "search_ms": round((finished - started) * 1000, 2),
+    }
+    return result, timings
+
+
+def _record(queue_s, search_s):
+    queue_ms = queue_s * 1000
+    search_ms = search_s * 1000
+    with _STATE_LOCK:
+        _STATS["completed"] += 1
+        _STATS["queue_ms_total"] += queue_ms
+        _STATS["queue_ms_max"] = max(_STATS["queue_ms_max"], queue_ms)
+        _STATS["search_ms_total"] += search_ms
+        _STATS["search_ms_max"] = max(_STATS["search_ms_max"], search_ms)
+
+
+def server_timing_header(timings):
+    """Format timings as a Server-Timing header value."""
+    return ", ".join(f"{name.replace('_ms', '')};dur={value}" for name, value in timings.items())
+
+
+def get_executor_stats():
+    """Concurrency settings, current load and cumulative queue/search timings."""
+    with _STATE_LOCK:
+        stats = dict(_STATS)
+        in_flight = _IN_FLIGHT
+    done = stats["completed"] or 1
+    return {
+        "max_concurrency": QUERY_MAX_CONCURRENCY,
+        "max_queue": QUERY_MAX_QUEUE,
+        "in_flight": in_flight,
+        "queued": max(0, in_flight - QUERY_MAX_CONCURRENCY),
+        "completed": stats["completed"],
+        "failed": stats["failed"],
+        "rejected": stats["rejected"],
+        "queue_ms_avg": round(stats["queue_ms_total"] / done, 2),
+        "queue_ms_max": round(stats["queue_ms_max"], 2),
+        "search_ms_avg": round(stats["search_ms_total"] / done, 2),
+        "search_ms_max": round(stats["search_ms_max"], 2),
+    }
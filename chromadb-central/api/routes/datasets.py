@@ -5,15 +5,23 @@ CRUD endpoints for managing project datasets (JSON files in knowledge-base/{proj
 """
 import json
 import os
+import re
 import shutil
+import time
+import threading
+import subprocess
 from pathlib import Path
-from fastapi import APIRouter, HTTPException, Body
+from fastapi import APIRouter, HTTPException, Body, Query
 from fastapi.responses import JSONResponse
+from api.json_stream import count_json_records
+from api.jobs import submit_job, report_progress, check_cancelled, is_cancelled, exclusive_project, JobConflict, JobCancelled
 
 router = APIRouter(prefix="/datasets", tags=["datasets"])
 
 KB_ROOT = Path(__file__).parent.parent.parent / "knowledge-base"
 
+_WRAPPER_KEYS = ("data", "documents", "items", "records")
+
 
 def _project_dir(project_name: str) -> Path:
     """Return the documents directory for a project, validating the name."""
@@ -32,7 +40,7 @@ def _read_json(path: Path) -> list:
         return content
     if isinstance(content, dict):
         # Support {data: [...]} or {documents: [...]} wrappers
-        for key in ("data", "documents", "items", "records"):
+        for key in _WRAPPER_KEYS:
             if key in content and isinstance(content[key], list):
                 return content[key]
         # Single object → wrap
@@ -64,8 +72,8 @@ def list_projects():
         if docs_dir.exists():
             for fpath in sorted(docs_dir.glob("*.json")):
                 try:
-                    records = _read_json(fpath)
-                    files.append({"name": fpath.name, "records": len(records)})
+                    # Streamed count: listing must not load every dataset in full
+                    files.append({"name": fpath.name, "records": count_json_records(fpath, _WRAPPER_KEYS)})
                 except Exception:
                     files.append({"name": fpath.name, "records": -1})
         projects.append({"name": proj_dir.name, "files": files})
@@ -147,37 +155,121 @@ def save_dataset(project_name: str, filename: str, records: list = Body(...)):
 # =====================================================
 # Re-index a project into ChromaDB
 # =====================================================
+# Timeout of build-database.bat when run as a background job
+REINDEX_JOB_TIMEOUT = int(os.getenv("REINDEX_JOB_TIMEOUT", "3600"))
+
+# Progress lines printed by api.index_chromadb.index_into_chromadb (streamed:
+# the total isn't known up front)
+_BATCH_CHUNKS_RE = re.compile(r"Batch \d+(?:/\d+)?: (\d+) chunks")
+
+
+def reindex_job(job):
+    """
+    Background job body: run build-database.bat, reporting indexed chunks from its
+    output, then reload the project's collections. Cancel kills the script.
+    """
+    project_name = job["project_name"]
+    project_dir = _project_dir(project_name)
+    bat_file = project_dir / "build-database.bat"
+    if not bat_file.exists():
+        raise FileNotFoundError(f"build-database.bat not found in {project_name}")
+
+    proc = subprocess.Popen(
+        [str(bat_file)],
+        cwd=str(project_dir),
+        stdin=subprocess.DEVNULL,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.STDOUT,
+        text=True,
+        # Python children flush each progress line instead of 8 KB blocks into the pipe
+        env=dict(os.environ, PYTHONUNBUFFERED="1"),
+        # Below the API's priority (POSIX children inherit the job thread's niceness)
+        creationflags=getattr(subprocess, "BELOW_NORMAL_PRIORITY_CLASS", 0),
+    )
+
+    def _watch():
+        # Kill the script on cancel or timeout, even while it prints nothing
+        deadline = time.monotonic() + REINDEX_JOB_TIMEOUT
+        while proc.poll() is None:
+            if is_cancelled(job) or time.monotonic() > deadline:
+                proc.kill()
+                return
+            time.sleep(0.5)
+
+    threading.Thread(target=_watch, name=f"reindex-watch-{project_name}", daemon=True).start()
+
+    output = []
+    for line in proc.stdout:
+        output.append(line)
+        del output[:-200]
+        batch = _BATCH_CHUNKS_RE.search(line)
+        try:
+            report_progress(
+                job,
+                chunks=int(batch.group(1)) if batch else 0,
+                message=line.strip()[:200] or None,
+            )
+        except JobCancelled:
+            proc.kill()
+            raise
+    returncode = proc.wait()
+    check_cancelled(job)
+    tail = "".join(output)[-2000:]
+    if returncode != 0:
+        raise RuntimeError(f"build-database.bat exited with {returncode} (timeout {REINDEX_JOB_TIMEOUT}s): {tail[-500:]}")
+
+    from api.query_chromadb import reload_project_collections
+    return {
+        "returncode": returncode,
+        "reloaded": reload_project_collections(project_name),
+        "output": tail,
+    }
+
+
 @router.post("/{project_name}/reindex")
-def reindex_project(project_name: str):
+def reindex_project(
+    project_name: str,
+    background: bool = Query(False, description="Run as a background job and return its id at once."),
+):
     """Re-index a project by running its build-database.bat script."""
-    import subprocess
-
     project_dir = _project_dir(project_name)
     bat_file = project_dir / "build-database.bat"
 
     if not bat_file.exists():
         raise HTTPException(404, f"build-database.bat not found in {project_name}")
 
+    if background:
+        try:
+            job = submit_job("reindex", project_name, reindex_job)
+        except JobConflict as e:
+            return JSONResponse(status_code=409, content={"error": str(e), "job": e.job})
+        return JSONResponse(status_code=202, content={"status": "accepted", "project": project_name, "job": job})
+
     try:
-        result = subprocess.run(
-            [str(bat_file)],
-            cwd=str(project_dir),
-            stdin=subprocess.DEVNULL,
-            capture_output=True,
-            text=True,
-            timeout=600,
-        )
-
-        from api.query_chromadb import reload_project_collections
-        reload_project_collections(project_name)
+        # Don't overlap with (or wait behind) a background reload/reindex of the same project
+        with exclusive_project(project_name):
+            result = subprocess.run(
+                [str(bat_file)],
+                cwd=str(project_dir),
+                stdin=subprocess.DEVNULL,
+                capture_output=True,
+                text=True,
+                timeout=600,
+            )
+
+            from api.query_chromadb import reload_project_collections
+            reloaded = reload_project_collections(project_name)
 
         return {
             "status": "success" if result.returncode == 0 else "error",
             "project": project_name,
             "returncode": result.returncode,
+            "reloaded": reloaded,
             "stdout": result.stdout[-2000:] if result.stdout else "",
             "stderr": result.stderr[-2000:] if result.stderr else "",
         }
+    except JobConflict as e:
+        return JSONResponse(status_code=409, content={"error": str(e), "job": e.job})
     except subprocess.TimeoutExpired:
         raise HTTPException(504, "Build script timed out (600s)")
     except Exception as e:
@@ -0,0 +1,60 @@
+"""
+Jobs API Routes
+
+Submit, inspect and cancel background reload / re-index jobs (see api/jobs.py).
+"""
+from fastapi import APIRouter, Body, Query
+from fastapi.responses import JSONResponse
+from api.jobs import submit_job, get_job, list_jobs, cancel_job, JobConflict
+from api.routes.update import reload_job
+from api.routes.datasets import reindex_job
+
+router = APIRouter(prefix="/jobs", tags=["jobs"])
+
+_JOB_KINDS = {
+    "reload": reload_job,
+    "reindex": reindex_job,
+}
+
+
+@router.post("")
+def submit(payload: dict = Body(...)):
+    """
+    Expects JSON body with:
+      - kind: "reload" (download + staged swap from the bucket) or "reindex" (build-database.bat + reload)
+      - project_name: str
+    Returns 202 with the job; 409 if the project already has a queued or running job.
+    """
+    kind = payload.get("kind")
+    project_name = payload.get("project_name")
+    if kind not in _JOB_KINDS or not project_name:
+        return JSONResponse(status_code=400, content={"error": f"Expected kind in {sorted(_JOB_KINDS)} and a project_name"})
+    try:
+        job = submit_job(kind, project_name, _JOB_KINDS[kind])
+    except JobConflict as e:
+        return JSONResponse(status_code=409, content={"error": str(e), "job": e.job})
+    return JSONResponse(status_code=202, content=job)
+
+
+@router.get("")
+def jobs(project_name: str = Query(None, description="Only jobs of this project")):
+    """Recent jobs, newest first."""
+    return {"jobs": list_jobs(project_name)}
+
+
+@router.get("/{job_id}")
+def job_status(job_id: str):
+    """Status and progress (downloaded bytes, indexed chunks) of a job."""
+    job = get_job(job_id)
+    if job is None:
+        return JSONResponse(status_code=404, content={"error": f"Job '{job_id}' not found"})
+    return job
+
+
+@router.post("/{job_id}/cancel")
+def cancel(job_id: str):
+    """Cancel a queued job, or ask a running one to stop at its next progress report."""
+    job = cancel_job(job_id)
+    if job is None:
+        return JSONResponse(status_code=404, content={"error": f"Job '{job_id}' not found"})
+    return job
@@ -2,35 +2,190 @@
 """
 Query Routes - Main query endpoint for streaming responses
 """
+import asyncio
 from fastapi import Body
 from api.orchestrator import smart_query
 from api.graph_layer import preload_graphs
-from api.query_chromadb import list_collections, query_vector_db, preload_all_collections
+from api.query_chromadb import list_collections, query_vector_db, query_vector_db_batch, preload_all_collections, get_query_cache_stats
+from api.query_executor import run_query, QueryQueueFull, server_timing_header, get_executor_stats
 
-from fastapi import APIRouter
+from fastapi import APIRouter, Request, Query
 from fastapi.responses import  JSONResponse
+from api.wire import make_response
+from api.embeddings import get_embedding_cache_stats
+from api.fanout import plan_sources, merge_source_results
+from api.query_chromadb import scan_collection, get_collection_inventory
+from api.inventory import CursorExpired
 
 
 router = APIRouter()
 
+
+def _busy_response(e):
+    """503 returned when the bounded query executor is saturated."""
+    return JSONResponse(status_code=503, content={"error": "Server busy", "details": str(e)})
+
+
 @router.post("/query")
 async def generic_query_post(
+    request: Request,
     payload: dict = Body(...)
 ):
     """
     Expects JSON body with:
       - project_name: str
       - collection_name: str (optional)
-      - query: dict (requête ChromaDB)
+      - query: dict (requête ChromaDB) or str (text embedded centrally with the project's model)
+        With "mode": "hybrid" the vector ranking is fused with a BM25 ranking of the
+        documents (optional "weights": {"vector", "lexical"}, "candidates", "rrf_k").
+        Diversification (see api/diversify.py): "exclude_ids", "exclude_values",
+        "collapse_by", "max_per_key", "mmr_lambda" return n_results diverse items
+        out of a larger "candidates" pool.
+      - sources: list of {collection_name, project_name?, quota?, name?, query?} (optional)
+        Searches every source concurrently and merges them by distance, with
+        per-source quotas and provenance tags (see api/fanout.py).
+    Send `Accept: application/x-msgpack` to receive a msgpack body instead of JSON.
     """
+    if payload.get("sources"):
+        return await _fan_out_query(request, payload)
     print (f"Received query for project '{payload.get('project_name')}' collection '{payload.get('collection_name')}' ", flush=True)
     project_name = payload.get("project_name")
     collection_name = payload.get("collection_name")
     data = payload.get("query")
 
-    result = query_vector_db(project_name, collection_name, data)
+    try:
+        result, timings = await run_query(query_vector_db, project_name, collection_name, data)
+    except QueryQueueFull as e:
+        return _busy_response(e)
     # print(f"Query result: {result}", flush=True)
-    return JSONResponse(content=result)
+    return make_response(result, request, payload, headers={"Server-Timing": server_timing_header(timings)})
+
+async def _fan_out_query(request, payload):
+    """One executor search per source, run concurrently, then merged."""
+    try:
+        plans, n_results = plan_sources(payload)
+    except (TypeError, ValueError) as e:
+        return JSONResponse(status_code=400, content={"error": "Invalid sources", "details": str(e)})
+    print(f"Received fan-out query over {len(plans)} source(s): {[plan['label'] for plan in plans]}", flush=True)
+
+    try:
+        outcomes = await asyncio.gather(*[
+            run_query(query_vector_db, plan["project_name"], plan["collection_name"], plan["query"])
+            for plan in plans
+        ])
+    except QueryQueueFull as e:
+        return _busy_response(e)
+    result = merge_source_results(plans, [outcome[0] for outcome in outcomes], n_results)
+    # Sources run side by side: the slowest one bounds the call
+    timings = {
+        "queue_ms": max(outcome[1]["queue_ms"] for outcome in outcomes),
+        "search_ms": max(outcome[1]["search_ms"] for outcome in outcomes),
+    }
+    return make_response(result, request, payload, headers={"Server-Timing": server_timing_header(timings)})
+
+def _batch_item_error(item):
+    """Why a /query/batch item can't be run (None if it can)."""
+    if not isinstance(item, dict):
+        return f"Expected an object, got {type(item).__name__}"
+    if not isinstance(item.get("project_name"), str) or not item["project_name"]:
+        return "project_name must be a non-empty string"
+    return None
+
+
+@router.post("/query/batch")
+async def batch_query_post(
+    request: Request,
+    payload: dict = Body(...)
+):
+    """
+    Expects JSON body with:
+      - items: list of {project_name, collection_name, query}
+    Each item may target a different project/collection. Items sharing the same
+    collection and search parameters are answered by a single ChromaDB call.
+    Returns {"results": [...]} in the same order as items.
+    400 with the index of the first malformed item (not an object, no project_name).
+    """
+    items = payload.get("items") or []
+    if not isinstance(items, list):
+        return JSONResponse(status_code=400, content={"error": "Invalid batch", "details": "items must be a list"})
+    for idx, item in enumerate(items):
+        details = _batch_item_error(item)
+        if details:
+            return JSONResponse(status_code=400, content={"error": "Invalid batch item", "index": idx, "details": details})
+    print(f"Received batch query with {len(items)} item(s)", flush=True)
+
+    try:
+        results, timings = await run_query(query_vector_db_batch, items)
+    except QueryQueueFull as e:
+        return _busy_response(e)
+    return make_response({"results": results}, request, payload, headers={"Server-Timing": server_timing_header(timings)})
+
+@router.post("/scan")
+async def scan_post(
+    request: Request,
+    payload: dict = Body(...)
+):
+    """
+    Read a collection page by page (instead of collection.get() with no limit).
+    Expects JSON body with:
+      - project_name: str
+      - collection_name: str (optional)
+      - cursor: str (optional, "next_cursor" of the previous page)
+      - limit: int (page size, capped by SCAN_MAX_PAGE_SIZE)
+      - include: subset of ["documents", "metadatas", "embeddings"] (default ["metadatas"])
+      - where, fields, max_document_chars: filter / projection, as in /query
+    Returns {"ids", <included fields>, "next_cursor"}; next_cursor is null on the
+    last page. 409 if the collection changed since the cursor was issued.
+    """
+    try:
+        page, timings = await run_query(
+            scan_collection, payload.get("project_name"), payload.get("collection_name"),
+            payload.get("cursor"), payload.get("limit"), payload.get("include"),
+            payload.get("where"), payload.get("fields"), payload.get("max_document_chars"),
+        )
+    except QueryQueueFull as e:
+        return _busy_response(e)
+    except CursorExpired as e:
+        return JSONResponse(status_code=409, content={"error": "Cursor expired", "details": str(e)})
+    except (TypeError, ValueError) as e:
+        return JSONResponse(status_code=400, content={"error": "Invalid scan request", "details": str(e)})
+    if page is None:
+        return JSONResponse(status_code=404, content={"error": f"Collection not found for project '{payload.get('project_name')}'"})
+    return make_response(page, request, payload, headers={"Server-Timing": server_timing_header(timings)})
+
+@router.get("/inventory")
+async def collection_inventory(
+    project_name: str = Query(..., description="Project to inventory"),
+    collection_name: str = Query(None, description="Collection (default: the project's first one)"),
+    include_documents: bool = Query(True, description="List each document, not only the totals"),
+):
+    """
+    Documents of a collection with their chunk counts and last indexed time,
+    read from the summary maintained at index time (no full collection read).
+    "summary" is "index", or "scan" when it had to be rebuilt from the chunks.
+    """
+    try:
+        inventory, timings = await run_query(get_collection_inventory, project_name, collection_name, include_documents)
+    except QueryQueueFull as e:
+        return _busy_response(e)
+    if inventory is None:
+        return JSONResponse(status_code=404, content={"error": f"Collection not found for project '{project_name}'"})
+    return JSONResponse(content=inventory, headers={"Server-Timing": server_timing_header(timings)})
+
+@router.get("/query/stats")
+def query_executor_stats():
+    """Query concurrency limits, current load, and queue-wait vs search timings."""
+    return get_executor_stats()
+
+@router.get("/query/cache/stats")
+def query_cache_stats():
+    """Hit/miss/eviction counters of the in-process query result cache."""
+    return get_query_cache_stats()
+
+@router.get("/embeddings/cache/stats")
+def embedding_cache_stats():
+    """Hit/miss counters of the central embedding cache used for text queries."""
+    return get_embedding_cache_stats()
 
 @router.post("/smart_query")
 async def smart_query_post(
@@ -72,10 +227,12 @@ async def smart_query_post(
         # =========================
         # 🧠 SMART QUERY
         # =========================
-        result = smart_query(project_name, collection_name, nodes, edges, query)
+        result, timings = await run_query(smart_query, project_name, collection_name, nodes, edges, query)
 
-        return JSONResponse(content=result)
+        return JSONResponse(content=result, headers={"Server-Timing": server_timing_header(timings)})
 
+    except QueryQueueFull as e:
+        return _busy_response(e)
     except Exception as e:
         return JSONResponse(content={
             "error": "Smart query failed",
@@ -83,6 +240,9 @@ async def smart_query_post(
         })
     
 @router.get("/graph")
-def get_graph():
-    from api.graph_layer import load_graph
-    return load_graph()
+def get_graph(project_name: str = Query(..., description="Project whose graph.json to return")):
+    from api.graph_layer import get_project_graph
+    try:
+        return get_project_graph(project_name).raw
+    except FileNotFoundError as e:
+        return JSONResponse(status_code=404, content={"error": str(e)})
@@ -1,34 +1,43 @@
 """
 Update API Routes
 
-This module defines endpoints for reloading ChromaDB collections from GCS bucket.
+This module defines endpoints for reloading ChromaDB collections from GCS bucket
+and for inspecting which projects are loaded in memory.
 """
 from fastapi import APIRouter, Request, Query
+from fastapi.responses import JSONResponse
 from datetime import datetime
-import os
+from api.jobs import submit_job, report_progress, exclusive_project, JobConflict
 
 router = APIRouter()
 from api.query_chromadb import (
-    _download_chroma_db_from_bucket,
     _discover_projects_from_bucket,
-    reload_project_collections,
-    PROJECT_ROOT,
+    reload_project_from_bucket,
+    get_project_residency,
 )
 
 
+def reload_job(job):
+    """Background job body: staged reload of one project, reporting downloaded bytes."""
+    reloaded = reload_project_from_bucket(job["project_name"], progress=lambda n: report_progress(job, bytes=n))
+    return {"reloaded": reloaded, "unchanged": not reloaded}
+
+
 @router.post("/reload")
 def reload_from_bucket(
     request: Request,
     project_name: str = Query(None, description="Project name to reload. If omitted, reloads all projects from bucket."),
+    background: bool = Query(False, description="Queue one background job per project and return their ids at once."),
 ):
     """
     Download chroma_db from GCS bucket and reload collections into memory.
     If project_name is provided, reloads only that project.
     If omitted, discovers all projects from the bucket and reloads them all.
+    Each project is staged and validated before being swapped in, so queries keep
+    hitting the previous version until the new one is ready.
+    With background=true the reloads run as jobs (see GET /jobs/{job_id}).
     """
     try:
-        kb_root = os.path.join(PROJECT_ROOT, "knowledge-base")
-
         if project_name:
             projects = [project_name]
         else:
@@ -37,11 +46,29 @@ def reload_from_bucket(
                 return {"status": "error", "message": "No projects found in bucket."}
 
         results = {}
+        if background:
+            for project in projects:
+                try:
+                    results[project] = submit_job("reload", project, reload_job)["id"]
+                except JobConflict as e:
+                    results[project] = f"error: {str(e)}"
+            return {
+                "status": "accepted",
+                "message": f"Queued reload of {len(projects)} project(s).",
+                "jobs": results,
+                "timestamp": datetime.now().isoformat(),
+            }
+
         for project in projects:
             try:
-                _download_chroma_db_from_bucket(project, kb_root)
-                reload_project_collections(project)
-                results[project] = "ok"
+                # Don't overlap with (or wait behind) a background reload/reindex of the same project
+                with exclusive_project(project):
+                    reloaded = reload_project_from_bucket(project)
+                results[project] = "ok" if reloaded else "unchanged"
+            except JobConflict as e:
+                if project_name:
+                    return JSONResponse(status_code=409, content={"error": str(e), "job": e.job})
+                results[project] = f"error: {str(e)}"
             except Exception as e:
                 results[project] = f"error: {str(e)}"
 
@@ -59,3 +86,8 @@ def reload_from_bucket(
             "timestamp": datetime.now().isoformat(),
         }
 
+
+@router.get("/projects")
+def list_resident_projects():
+    """Known projects, whether each is resident, and its approximate RSS / disk size."""
+    return get_project_residency()
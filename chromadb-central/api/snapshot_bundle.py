@@ -0,0 +1,271 @@
+"""
+Single-file snapshot bundles of a project's chroma_db.
+
+A cold start used to list and download every blob of <project>/chroma_db/ (SQLite
+file plus hundreds of small HNSW segment files). A bundle is one tar.gz archive of
+the whole directory plus a manifest, uploaded next to it:
+
+    <project>/snapshot/chroma_db.tar.gz
+    <project>/snapshot/manifest.json    {archive sha256/size, per-file size + sha256,
+                                         collection counts, created_at}
+
+fetch_bundle() streams the archive from the bucket straight through gzip + tar
+into a temporary directory (one sequential read, nothing buffered whole), checks
+every file and the archive against the manifest, then swaps the directory in.
+The per-blob sync (api.bucket_sync) stays as the fallback when a project has no
+bundle.
+
+Build one (indexers call build_bundle() after indexing):
+    python -m api.snapshot_bundle <project_name>
+"""
+import os
+import sys
+import json
+import time
+import shutil
+import hashlib
+import tarfile
+from datetime import datetime
+
+ARCHIVE_NAME = "chroma_db.tar.gz"
+BUNDLE_MANIFEST_NAME = "manifest.json"
+# Copy of the applied bundle's manifest, kept in the unpacked chroma_db
+LOCAL_BUNDLE_MANIFEST = ".bundle_manifest.json"
+BUNDLE_FORMAT = 1
+
+_BLOCK = 1024 * 1024
+
+
+class BundleError(Exception):
+    """A bundle is malformed or doesn't match its manifest."""
+
+
+def _sha256_file(path):
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(_BLOCK), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+def _collection_counts(chroma_dir):
+    """Item count per collection (best effort: {} when chromadb can't open the directory)."""
+    try:
+        import chromadb
+        from chromadb.config import Settings
+        client = chromadb.PersistentClient(path=chroma_dir, settings=Settings(anonymized_telemetry=False, allow_reset=False))
+        return {col.name: client.get_collection(name=col.name).count() for col in client.list_collections()}
+    except Exception as e:
+        print(f"[Bundle] Could not count collections in {chroma_dir}: {e}", flush=True)
+        return {}
+
+
+def build_bundle(chroma_dir, out_dir, project_name, collection_counts=None):
+    """
+    Archive chroma_dir into out_dir/chroma_db.tar.gz and write out_dir/manifest.json.
+    Run it while nothing writes to the database. Returns the manifest.
+    """
+    chroma_dir = os.path.abspath(chroma_dir)
+    os.makedirs(out_dir, exist_ok=True)
+    if collection_counts is None:
+        collection_counts = _collection_counts(chroma_dir)
+
+    started = time.perf_counter()
+    files = {}
+    archive_path = os.path.join(out_dir, ARCHIVE_NAME)
+    tmp_path = archive_path + ".tmp"
+    with tarfile.open(tmp_path, "w:gz", compresslevel=6) as tar:
+        for dirpath, dirnames, filenames in os.walk(chroma_dir):
+            dirnames.sort()
+            for filename in sorted(filenames):
+                # Sync bookkeeping of the machine that built it isn't part of the snapshot
+                if filename.startswith(".") and filename.endswith(".json"):
+                    continue
+                path = os.path.join(dirpath, filename)
+                relative_path = os.path.relpath(path, chroma_dir).replace(os.sep, "/")
+                files[relative_path] = {"size": os.path.getsize(path), "sha256": _sha256_file(path)}
+                tar.add(path, arcname=relative_path, recursive=False)
+    os.replace(tmp_path, archive_path)
+
+    manifest = {
+        "format": BUNDLE_FORMAT,
+        "project": project_name,
+        "created_at": datetime.now().isoformat(),
+        "archive": ARCHIVE_NAME,
+        "archive_size": os.path.getsize(archive_path),
+        "archive_sha256": _sha256_file(archive_path),
+        "collections": collection_counts,
+        "files": files,
+    }
+    with open(os.path.join(out_dir, BUNDLE_MANIFEST_NAME), "w", encoding="utf-8") as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=2)
+
+    raw_mb = sum(entry["size"] for entry in files.values()) / (1024 * 1024)
+    print(
+        f"[Bundle] {project_name}: {len(files)} files, {raw_mb:.1f} MB → "
+        f"{manifest['archive_size'] / (1024 * 1024):.1f} MB in {time.perf_counter() - started:.1f} s",
+        flush=True,
+    )
+    return manifest
+
+
+class _HashingReader:
+    """File-like wrapper hashing and counting the compressed bytes as they are read."""
+
+    def __init__(self, stream, progress=None):
+        self.stream = stream
+        self.sha256 = hashlib.sha256()
+        self.bytes = 0
+        self.progress = progress
+
+    def read(self, size=-1):
+        data = self.stream.read(size)
+        if data:
+            self.sha256.update(data)
+            self.bytes += len(data)
+            if self.progress:
+                self.progress(len(data))
+        return data
+
+
+def _read_manifest(source, info):
+    with source.open_read(info) as stream:
+        manifest = json.loads(stream.read().decode("utf-8"))
+    if manifest.get("format") != BUNDLE_FORMAT:
+        raise BundleError(f"Unsupported bundle format {manifest.get('format')!r}")
+    return manifest
+
+
+def _local_manifest(local_dir):
+    try:
+        with open(os.path.join(local_dir, LOCAL_BUNDLE_MANIFEST), "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _is_current(local_dir, manifest):
+    """The directory already holds this bundle (same archive, every file present with its size)."""
+    local = _local_manifest(local_dir)
+    if not local or local.get("archive_sha256") != manifest["archive_sha256"]:
+        return False
+    for name, entry in manifest["files"].items():
+        path = os.path.join(local_dir, name.replace("/", os.sep))
+        if not os.path.isfile(path) or os.path.getsize(path) != entry["size"]:
+            return False
+    return True
+
+
+def _unpack(reader, target_dir, manifest):
+    """Stream-extract regular files into target_dir, hashing each against the manifest."""
+    expected = manifest["files"]
+    seen = set()
+    with tarfile.open(fileobj=reader, mode="r|gz") as tar:
+        for member in tar:
+            name = member.name
+            if not member.isfile():
+                continue
+            if name.startswith("/") or ".." in name.split("/") or name not in expected:
+                raise BundleError(f"Unexpected archive member {name!r}")
+            path = os.path.join(target_dir, name.replace("/", os.sep))
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            h = hashlib.sha256()
+            with tar.extractfile(member) as src, open(path, "wb") as dst:
+                for block in iter(lambda: src.read(_BLOCK), b""):
+                    h.update(block)
+                    dst.write(block)
+            if h.hexdigest() != expected[name]["sha256"]:
+                raise BundleError(f"sha256 mismatch for {name}")
+            seen.add(name)
+    # Drain the gzip trailer so the archive hash covers every byte
+    while reader.read(_BLOCK):
+        pass
+    missing = set(expected) - seen
+    if missing:
+        raise BundleError(f"{len(missing)} file(s) missing from archive, e.g. {sorted(missing)[0]}")
+
+
+def _find_bundle(source, project_name):
+    """(manifest, archive blob) of the project's bundle, or None if it has none."""
+    prefix = f"{project_name}/snapshot/"
+    blobs = {info["name"][len(prefix):]: info for info in source.list_blobs(prefix)}
+    if BUNDLE_MANIFEST_NAME not in blobs:
+        return None
+    manifest = _read_manifest(source, blobs[BUNDLE_MANIFEST_NAME])
+    archive_info = blobs.get(manifest["archive"])
+    if archive_info is None:
+        raise BundleError(f"Manifest lists {manifest['archive']} but it isn't in {prefix}")
+    return manifest, archive_info
+
+
+def bundle_is_current(source, project_name, local_dir):
+    """
+    Whether local_dir already holds the project's bundle (same archive sha256,
+    every file present): only the small manifest is read. None if the project
+    has no bundle.
+    """
+    bundle = _find_bundle(source, project_name)
+    if bundle is None:
+        return None
+    return _is_current(local_dir, bundle[0])
+
+
+def fetch_bundle(source, project_name, local_dir, progress=None):
+    """
+    Replace local_dir with the project's bundle, streamed from source.
+    Returns stats (files, bytes, seconds, skipped, collections), or None if the
+    project has no bundle. progress(n_bytes) is called as compressed bytes arrive.
+    Raises BundleError / IOError on a bad bundle (local_dir is left untouched).
+    """
+    started = time.perf_counter()
+    bundle = _find_bundle(source, project_name)
+    if bundle is None:
+        return None
+    manifest, archive_info = bundle
+
+    stats = {
+        "files": len(manifest["files"]),
+        "bytes": 0,
+        "skipped": False,
+        "collections": manifest.get("collections") or {},
+        "created_at": manifest.get("created_at"),
+    }
+    if _is_current(local_dir, manifest):
+        stats.update(skipped=True, seconds=round(time.perf_counter() - started, 3))
+        return stats
+
+    tmp_dir = local_dir.rstrip("/\\") + ".unpack"
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    os.makedirs(tmp_dir)
+    try:
+        with source.open_read(archive_info) as stream:
+            reader = _HashingReader(stream, progress)
+            _unpack(reader, tmp_dir, manifest)
+        if reader.sha256.hexdigest() != manifest["archive_sha256"]:
+            raise BundleError("Archive sha256 doesn't match the manifest")
+        with open(os.path.join(tmp_dir, LOCAL_BUNDLE_MANIFEST), "w", encoding="utf-8") as f:
+            json.dump(manifest, f)
+        shutil.rmtree(local_dir, ignore_errors=True)
+        os.replace(tmp_dir, local_dir)
+    except BaseException:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        raise
+
+    stats.update(bytes=reader.bytes, seconds=round(time.perf_counter() - started, 3))
+    return stats
+
+
+# ─── CLI ─────────────────────────────────────────────────────────────────────
+
+if __name__ == "__main__":
+    if len(sys.argv) != 2:
+        print("Usage: python -m api.snapshot_bundle <project_name>")
+        sys.exit(1)
+    project = sys.argv[1]
+    kb_path = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "knowledge-base", project)
+    chroma_dir = os.path.join(kb_path, "chroma_db")
+    if not os.path.isdir(chroma_dir):
+        print(f"❌ {chroma_dir} not found")
+        sys.exit(1)
+    manifest = build_bundle(chroma_dir, os.path.join(kb_path, "snapshot"), project)
+    print(f"✅ {os.path.join(kb_path, 'snapshot', ARCHIVE_NAME)} ({manifest['collections']})")
@@ -0,0 +1,161 @@
+"""
+Embedding storage profiles: fewer dimensions and/or lower precision per project.
+
+text-embedding-3-* vectors can be shortened by keeping their first d components
+and renormalizing to unit length (what the API's `dimensions` parameter does).
+Projects listed in api.index_chromadb._STORAGE_PROFILES are indexed that way, and
+the applied profile is recorded in the collection metadata ("embedding_dimensions",
+"embedding_precision"). Query embeddings, whether sent by agents or computed
+centrally, are then shortened the same way at query time (fit_query_embeddings).
+
+precision "float16" rounds the stored components to half precision. Chroma still
+persists float32, so the gain there comes from the dimensions; float16 only shows
+up in its cost on recall below.
+
+Recall-versus-size benchmark (recall@k of each profile against the full float32
+vectors, using stored chunks as queries):
+    python -m api.storage_profile <project_name> [collection_name]
+"""
+import sys
+import time
+import numpy as np
+
+PRECISIONS = ("float32", "float16")
+
+# Compared by the benchmark: (dimensions, precision), None = full dimensions
+BENCHMARK_PROFILES = [
+    (None, "float32"), (None, "float16"),
+    (1536, "float32"), (1024, "float32"), (1024, "float16"),
+    (512, "float32"), (256, "float32"),
+]
+
+_PAGE_SIZE = 1000
+
+
+def apply_profile(vectors, dimensions=None, precision="float32"):
+    """Truncate to `dimensions` + renormalize, then round to `precision`. Returns float lists."""
+    if precision not in PRECISIONS:
+        raise ValueError(f"Unknown embedding precision {precision!r} (expected one of {PRECISIONS})")
+    matrix = np.asarray(vectors, dtype=np.float32)
+    if matrix.size == 0:
+        return [list(v) for v in vectors]
+    matrix = _shorten(matrix, dimensions)
+    if precision == "float16":
+        matrix = matrix.astype(np.float16).astype(np.float32)
+    return matrix.tolist()
+
+
+def _shorten(matrix, dimensions):
+    if not dimensions or dimensions >= matrix.shape[1]:
+        return matrix
+    matrix = matrix[:, :dimensions]
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return matrix / norms
+
+
+def collection_profile(collection):
+    """(dimensions, precision) a collection was indexed with (None = full dimensions)."""
+    metadata = getattr(collection, "metadata", None) or {}
+    return metadata.get("embedding_dimensions") or None, metadata.get("embedding_precision", "float32")
+
+
+def fit_query_embeddings(query_embeddings, collection):
+    """
+    Shorten full-size query embeddings to the collection's stored dimensions.
+    Queries keep full precision (only stored vectors are rounded).
+    """
+    dimensions, _ = collection_profile(collection)
+    if not dimensions or all(len(e) <= dimensions for e in query_embeddings):
+        return query_embeddings
+    return apply_profile(query_embeddings, dimensions)
+
+
+# ─── Benchmark ───────────────────────────────────────────────────────────────
+
+def _load_embeddings(collection, max_items):
+    vectors = []
+    offset = 0
+    while len(vectors) < max_items:
+        page = collection.get(include=["embeddings"], limit=min(_PAGE_SIZE, max_items - len(vectors)), offset=offset)
+        ids = page.get("ids") or []
+        if not ids:
+            break
+        vectors.extend(page["embeddings"])
+        offset += len(ids)
+    return np.asarray(vectors, dtype=np.float32)
+
+
+def _top_k(matrix, queries, positions, k):
+    """Top-k by inner product for each query, excluding the query's own item."""
+    scores = queries @ matrix.T
+    scores[np.arange(len(positions)), positions] = -np.inf
+    top = np.argpartition(-scores, k, axis=1)[:, :k]
+    return [set(row) for row in top]
+
+
+def benchmark_profiles(collection, profiles=None, n_queries=200, k=10, max_items=20000, seed=0):
+    """
+    recall@k of each (dimensions, precision) profile against the full float32
+    vectors of (up to max_items of) the collection, with bytes per vector and the
+    mean search time per query over the snapshot. The collection must hold full vectors.
+    """
+    full = _load_embeddings(collection, max_items)
+    if len(full) <= k:
+        raise ValueError(f"Need more than {k} stored vectors to benchmark (got {len(full)})")
+    full_dims = full.shape[1]
+    # Unit vectors: inner product ranks like cosine (and like L2)
+    norms = np.linalg.norm(full, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    full = full / norms
+
+    rng = np.random.default_rng(seed)
+    positions = rng.choice(len(full), size=min(n_queries, len(full)), replace=False)
+    truth = _top_k(full, full[positions], positions, k)
+
+    rows = []
+    for dimensions, precision in profiles or BENCHMARK_PROFILES:
+        if dimensions and dimensions >= full_dims:
+            continue
+        stored = np.asarray(apply_profile(full, dimensions, precision), dtype=np.float32)
+        queries = _shorten(full[positions], dimensions)
+        started = time.perf_counter()
+        found = _top_k(stored, queries, positions, k)
+        elapsed_ms = (time.perf_counter() - started) * 1000 / len(positions)
+        dims = stored.shape[1]
+        bytes_per_vector = dims * (2 if precision == "float16" else 4)
+        rows.append({
+            "dimensions": dims,
+            "precision": precision,
+            "bytes_per_vector": bytes_per_vector,
+            "size_ratio": round(bytes_per_vector / (full_dims * 4), 3),
+            f"recall@{k}": round(float(np.mean([len(t & f) / k for t, f in zip(truth, found)])), 4),
+            "search_ms_per_query": round(elapsed_ms, 3),
+        })
+    return {"items": len(full), "queries": len(positions), "full_dimensions": full_dims, "profiles": rows}
+
+
+if __name__ == "__main__":
+    import chromadb
+    from chromadb.config import Settings
+    from api.index_chromadb import PROJECT_ROOT
+
+    if len(sys.argv) < 2:
+        print("Usage: python -m api.storage_profile <project_name> [collection_name]")
+        sys.exit(1)
+    project = sys.argv[1]
+    client = chromadb.PersistentClient(
+        path=str(PROJECT_ROOT / "knowledge-base" / project / "chroma_db"),
+        settings=Settings(anonymized_telemetry=False, allow_reset=False),
+    )
+    name = sys.argv[2] if len(sys.argv) > 2 else "gdrive_documents"
+    collection = client.get_collection(name=name)
+    if collection_profile(collection)[0]:
+        print(f"⚠️  {project}/{name} is already shortened: recall is measured against the stored vectors")
+    report = benchmark_profiles(collection)
+    recall_key = next(key for key in report["profiles"][0] if key.startswith("recall@"))
+    print(f"\n📏 {project}/{name}: {report['items']} vectors of {report['full_dimensions']} dims, {report['queries']} queries\n")
+    print(f"{'dims':>6} {'precision':>9} {'bytes':>7} {'size':>6} {recall_key:>10} {'ms/query':>9}")
+    for row in report["profiles"]:
+        print(f"{row['dimensions']:>6} {row['precision']:>9} {row['bytes_per_vector']:>7} "
+              f"{row['size_ratio']:>6} {row[recall_key]:>10} {row['search_ms_per_query']:>9}")
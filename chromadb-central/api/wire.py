@@ -0,0 +1,62 @@
+"""
+Compact wire format for /query.
+
+Opt-in on both directions:
+  - Request: "query_embedding_b64" (or "query_embeddings_b64": [...]) carries the
+    vector as base64-encoded little-endian float32 instead of a JSON float list.
+  - Response: clients sending `Accept: application/x-msgpack` (or
+    "response_format": "msgpack" in the payload) get a msgpack body instead of JSON.
+
+msgpack is imported lazily; if it is missing the server falls back to JSON and the
+client detects this from the Content-Type.
+"""
+import sys
+import base64
+from array import array
+
+from fastapi.responses import JSONResponse, Response
+
+MSGPACK_MEDIA_TYPE = "application/x-msgpack"
+
+
+def decode_embedding(data):
+    """Decode a base64 little-endian float32 vector into a list of floats."""
+    values = array("f")
+    values.frombytes(base64.b64decode(data))
+    if sys.byteorder != "little":
+        values.byteswap()
+    return values.tolist()
+
+
+def encode_embedding(values):
+    """Encode a float vector as base64 little-endian float32."""
+    packed = array("f", values)
+    if sys.byteorder != "little":
+        packed.byteswap()
+    return base64.b64encode(packed.tobytes()).decode("ascii")
+
+
+def wants_msgpack(request, payload=None):
+    if payload and payload.get("response_format") == "msgpack":
+        return True
+    return MSGPACK_MEDIA_TYPE in (request.headers.get("accept") or "")
+
+
+def _msgpack_default(obj):
+    # numpy arrays (e.g. included embeddings) and numpy scalars
+    if hasattr(obj, "tolist"):
+        return obj.tolist()
+    raise TypeError(f"Cannot serialize {type(obj).__name__}")
+
+
+def make_response(content, request, payload=None, headers=None, status_code=200):
+    """Return content as msgpack if the client asked for it (and msgpack is available), else JSON."""
+    if wants_msgpack(request, payload):
+        try:
+            import msgpack
+        except ImportError:
+            print("[Wire] msgpack not installed, falling back to JSON", flush=True)
+        else:
+            body = msgpack.packb(content, use_bin_type=True, default=_msgpack_default)
+            return Response(content=body, media_type=MSGPACK_MEDIA_TYPE, headers=headers, status_code=status_code)
+    return JSONResponse(content=content, headers=headers, status_code=status_code)
@@ -3,7 +3,7 @@ from fastapi import Body
 from api.query_chromadb import get_collection
 from api.orchestrator import smart_query
 from api.graph_layer import preload_graphs
-from api.routes import query, update, datasets
+from api.routes import query, update, datasets, jobs
 import os
 
 """
@@ -16,14 +16,15 @@ from fastapi.responses import JSONResponse
 from fastapi.staticfiles import StaticFiles
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.concurrency import asynccontextmanager
-from api.query_chromadb import list_collections, query_vector_db, preload_all_collections
+from api.query_chromadb import list_collections, query_vector_db, preload_all_collections, get_readiness
+import threading
 
-# Use FastAPI lifespan context for startup/shutdown logic
-@asynccontextmanager
-async def lifespan(app: FastAPI):
-    print("=" * 60, flush=True)
-    print("🚀 Starting IMX Agent Factory...", flush=True)
-    print("=" * 60, flush=True)
+# Preload in a background thread: the server answers /health at once and /ready
+# turns true when every preloaded collection is warm (point the startup probe at /ready)
+CHROMA_PRELOAD_IN_BACKGROUND = os.getenv("CHROMA_PRELOAD_IN_BACKGROUND", "false").lower() in ("1", "true", "yes")
+
+
+def preload_chroma_db():
     try:
         if os.getenv("K_SERVICE"):
             # Deployed on Cloud Run: download from GCS bucket and load
@@ -47,6 +48,19 @@ async def lifespan(app: FastAPI):
         print(f"⚠️  Warning: Failed to preload ChromaDB: {str(e)}", flush=True)
         print(f"   Database will be loaded on first query", flush=True)
 
+
+# Use FastAPI lifespan context for startup/shutdown logic
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    print("=" * 60, flush=True)
+    print("🚀 Starting IMX Agent Factory...", flush=True)
+    print("=" * 60, flush=True)
+    if CHROMA_PRELOAD_IN_BACKGROUND:
+        print("⏳ Preloading ChromaDB in the background (see /ready)", flush=True)
+        threading.Thread(target=preload_chroma_db, name="chroma-preload", daemon=True).start()
+    else:
+        preload_chroma_db()
+
     print("=" * 60, flush=True)
     print("✅ Application startup complete", flush=True)
     print("=" * 60, flush=True)
@@ -69,6 +83,7 @@ app.add_middleware(
 app.include_router(query.router, tags=["query"])
 app.include_router(update.router, tags=["update"])
 app.include_router(datasets.router, tags=["datasets"])
+app.include_router(jobs.router, tags=["jobs"])
 
 # =====================================================
 # Main Routes
@@ -85,6 +100,16 @@ def health():
     return {"status": "ok"}
 
 
+@app.get("/ready")
+def ready():
+    """
+    Readiness endpoint: 200 once every preloaded collection has answered a warm-up
+    query with its stored vectors, 503 before. Reports warm-up timings per project.
+    """
+    readiness = get_readiness()
+    return JSONResponse(status_code=200 if readiness["ready"] else 503, content=readiness)
+
+
 # =====================================================
 # Run Application
 # =====================================================
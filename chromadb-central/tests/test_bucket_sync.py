@@ -0,0 +1,52 @@
+import os
+
+from api.bucket_sync import LocalDirSource, sync_prefix, prefix_is_current, MANIFEST_NAME
+
+
+def _write(path, data):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "wb") as f:
+        f.write(data)
+
+
+def test_empty_listing_removes_nothing(tmp_path):
+    bucket = tmp_path / "bucket"
+    _write(str(bucket / "p" / "chroma_db" / "chroma.sqlite3"), b"db")
+    local_dir = str(tmp_path / "live")
+    sync_prefix(LocalDirSource(str(bucket)), "p/chroma_db/", local_dir)
+    with open(os.path.join(local_dir, MANIFEST_NAME), "rb") as f:
+        manifest = f.read()
+
+    # Wrong prefix, or the bucket listing came back empty
+    stats = sync_prefix(LocalDirSource(str(bucket)), "missing/chroma_db/", local_dir)
+
+    assert stats["files"] == 0 and stats["removed"] == 0
+    assert sorted(os.listdir(local_dir)) == sorted([MANIFEST_NAME, "chroma.sqlite3"])
+    with open(os.path.join(local_dir, MANIFEST_NAME), "rb") as f:
+        assert f.read() == manifest
+
+
+def test_files_missing_from_snapshot_are_removed(tmp_path):
+    bucket = tmp_path / "bucket"
+    _write(str(bucket / "p" / "chroma_db" / "chroma.sqlite3"), b"db")
+    local_dir = tmp_path / "live"
+    _write(str(local_dir / "old_segment" / "data.bin"), b"stale")
+
+    stats = sync_prefix(LocalDirSource(str(bucket)), "p/chroma_db/", str(local_dir))
+
+    assert stats["downloaded"] == 1 and stats["removed"] == 1
+    assert not (local_dir / "old_segment" / "data.bin").exists()
+
+
+def test_prefix_is_current_after_sync_only(tmp_path):
+    bucket = tmp_path / "bucket"
+    _write(str(bucket / "p" / "chroma_db" / "chroma.sqlite3"), b"db")
+    source = LocalDirSource(str(bucket))
+    local_dir = str(tmp_path / "live")
+    assert not prefix_is_current(source, "p/chroma_db/", local_dir)
+    sync_prefix(source, "p/chroma_db/", local_dir)
+    assert prefix_is_current(source, "p/chroma_db/", local_dir)
+
+    _write(str(bucket / "p" / "chroma_db" / "new_segment" / "data.bin"), b"new")
+    assert not prefix_is_current(source, "p/chroma_db/", local_dir)
+    assert not prefix_is_current(source, "missing/chroma_db/", local_dir)
@@ -0,0 +1,26 @@
+import pytest
+
+pytest.importorskip("numpy")
+
+from api.diversify import diversify_options, has_exclusions, count_excluded, select_diverse
+
+
+IDS = ["a", "b", "c", "d"]
+METADATAS = [{"titre": "Dune"}, {"titre": "Le Horla"}, {"titre": "dune "}, None]
+
+
+def test_excluded_counts_ids_and_values():
+    options = diversify_options({"exclude_ids": ["d"], "exclude_values": {"titre": ["DUNE"]}}, 4)
+    assert has_exclusions(options)
+    assert count_excluded(IDS, METADATAS, options) == 3
+    assert select_diverse(IDS, METADATAS, None, None, options, 4) == [1]
+
+
+def test_nothing_excluded_when_no_candidate_matches():
+    options = diversify_options({"exclude_values": {"titre": ["Bel-Ami"]}}, 4)
+    assert count_excluded(IDS, METADATAS, options) == 0
+
+
+def test_collapse_only_has_no_exclusions():
+    options = diversify_options({"collapse_by": "titre"}, 4)
+    assert not has_exclusions(options)
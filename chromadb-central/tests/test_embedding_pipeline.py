@@ -0,0 +1,33 @@
+from types import SimpleNamespace
+
+import pytest
+
+from api.embedding_pipeline import embed_texts_concurrently
+
+
+class FakeEmbeddings:
+    """Embeds each text as [len(text)]; any batch containing "bad" fails (not retryable)."""
+
+    def create(self, model, input):
+        if "bad" in input:
+            raise ValueError("invalid input")
+        return SimpleNamespace(data=[SimpleNamespace(embedding=[float(len(text))]) for text in input])
+
+
+CLIENT = SimpleNamespace(embeddings=FakeEmbeddings())
+TEXTS = ["a", "bb", "bad", "dddd", "eeeee"]
+
+
+def test_failed_batch_raises_by_default():
+    with pytest.raises(ValueError):
+        embed_texts_concurrently(CLIENT, TEXTS, "model", max_inputs=2)
+
+
+def test_failed_batch_is_reported_and_the_rest_embedded():
+    failures = []
+    vectors = embed_texts_concurrently(
+        CLIENT, TEXTS, "model", max_inputs=2,
+        on_error=lambda start, end, error: failures.append((start, end, str(error))),
+    )
+    assert failures == [(2, 4, "invalid input")]
+    assert vectors == [[1.0], [2.0], None, None, [5.0]]
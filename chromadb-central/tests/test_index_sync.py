@@ -0,0 +1,122 @@
+import pytest
+
+pytest.importorskip("chromadb")
+from api import index_chromadb as ic
+from api.inventory import load_inventory
+
+
+class FakeCollection:
+    """Like Chroma, update() and upsert() merge into the stored metadata."""
+
+    def __init__(self, name, metadata):
+        self.name = name
+        self.metadata = metadata
+        self.items = {}  # id -> [embedding, document, metadata]
+        self.updated = 0
+
+    def count(self):
+        return len(self.items)
+
+    def get(self, ids=None, include=(), limit=None, offset=0):
+        keys = [i for i in self.items if ids is None or i in ids][offset:]
+        keys = keys[:limit] if limit is not None else keys
+        return {
+            "ids": keys,
+            "metadatas": [self.items[i][2] for i in keys],
+            "embeddings": [self.items[i][0] for i in keys],
+        }
+
+    def upsert(self, ids, embeddings, documents, metadatas):
+        for chunk_id, embedding, document, meta in zip(ids, embeddings, documents, metadatas):
+            stored = self.items.get(chunk_id, [None, None, {}])[2]
+            self.items[chunk_id] = [embedding, document, {**stored, **meta}]
+
+    def update(self, ids, metadatas):
+        self.updated += len(ids)
+        for chunk_id, meta in zip(ids, metadatas):
+            self.items[chunk_id][2] = {**self.items[chunk_id][2], **meta}
+
+    def delete(self, ids):
+        for chunk_id in ids:
+            del self.items[chunk_id]
+
+
+class FakeClient:
+    collections = {}
+
+    def __init__(self, path, settings=None):
+        pass
+
+    def get_collection(self, name):
+        return FakeClient.collections[name]
+
+    def get_or_create_collection(self, name, embedding_function=None, metadata=None):
+        return FakeClient.collections.setdefault(name, FakeCollection(name, metadata))
+
+
+@pytest.fixture
+def index(tmp_path, monkeypatch):
+    FakeClient.collections = {}
+    embedded = []
+
+    def embed(client, texts, model):
+        embedded.extend(texts)
+        return [[float(len(text))] for text in texts]
+
+    monkeypatch.setattr(ic.chromadb, "PersistentClient", FakeClient)
+    monkeypatch.setattr(ic.embedding_functions, "OpenAIEmbeddingFunction", lambda **kwargs: None)
+    monkeypatch.setattr(ic, "OpenAI", lambda **kwargs: None)
+    monkeypatch.setattr(ic, "embed_texts_concurrently", embed)
+
+    def run(date, text="Le Horla, une nouvelle.", doc_type="pdf", **extra):
+        documents = [{"id": "doc_0000_horla", "text": text,
+                      "metadata": {"source": "horla.pdf", "type": doc_type, "date": date, **extra}}]
+        ic.index_into_chromadb(documents, tmp_path, "p", embedding_model="m")
+        return load_inventory(tmp_path / "chroma_db", "gdrive_documents")["documents"]["doc_0000_horla"]["indexed_at"]
+
+    return run, embedded
+
+
+def test_run_date_alone_is_not_a_metadata_change(index):
+    run, embedded = index
+    first = run("2026-10-16")
+    second = run("2026-10-17")
+    assert second == first
+    assert FakeClient.collections["gdrive_documents"].updated == 0
+    assert len(embedded) == 1
+
+
+def test_metadata_only_change_keeps_indexed_at(index):
+    run, embedded = index
+    first = run("2026-10-16")
+    assert run("2026-10-16", doc_type="docx") == first
+    assert FakeClient.collections["gdrive_documents"].updated == 1
+    assert len(embedded) == 1
+    assert run("2026-10-16", text="Le Horla, version remaniée.") != first
+
+
+def _stored_metadata():
+    (embedding, _, meta), = FakeClient.collections["gdrive_documents"].items.values()
+    return embedding, meta
+
+
+def test_removed_metadata_key_is_dropped(index):
+    run, embedded = index
+    run("2026-10-16", auteur="Maupassant")
+    first_vector, meta = _stored_metadata()
+    assert meta["auteur"] == "Maupassant"
+
+    run("2026-10-16")
+    vector, meta = _stored_metadata()
+    assert "auteur" not in meta
+    assert vector == first_vector
+    assert len(embedded) == 1
+
+
+def test_removed_key_is_dropped_when_text_changes_too(index):
+    run, embedded = index
+    run("2026-10-16", auteur="Maupassant")
+    run("2026-10-16", text="Le Horla, version remaniée.")
+    _, meta = _stored_metadata()
+    assert "auteur" not in meta
+    assert len(embedded) == 2
@@ -0,0 +1,35 @@
+import threading
+
+import pytest
+
+from api import jobs
+
+
+def test_sync_caller_gets_conflict_instead_of_waiting_for_job(monkeypatch):
+    monkeypatch.setattr(jobs, "_JOBS", {})
+    monkeypatch.setattr(jobs, "_PROJECT_LOCKS", {})
+    started, release = threading.Event(), threading.Event()
+
+    def body(job):
+        started.set()
+        release.wait(5)
+        return {"done": True}
+
+    job = jobs.submit_job("reindex", "proj", body)
+    try:
+        assert started.wait(5)
+        with pytest.raises(jobs.JobConflict) as conflict:
+            with jobs.exclusive_project("proj"):
+                pass
+        assert conflict.value.job["id"] == job["id"]
+        assert conflict.value.job["status"] == "running"
+    finally:
+        release.set()
+
+    for _ in range(100):
+        if jobs.get_job(job["id"])["status"] == "succeeded":
+            break
+        threading.Event().wait(0.05)
+    with jobs.exclusive_project("proj"):
+        assert jobs.project_lock("proj").locked()
+    assert not jobs.project_lock("proj").locked()
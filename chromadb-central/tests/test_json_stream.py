@@ -0,0 +1,28 @@
+import json
+import pytest
+
+from api import json_stream
+from api.json_stream import iter_json_records, write_json_documents
+
+
+@pytest.mark.parametrize("read_size", [1, 3, 7, 9, 64])
+@pytest.mark.parametrize("text, expected", [
+    ('{"a": 12.5}', [("", {"a": 12.5})]),
+    ('[1.25, 3e10, -7, 0.5E-3, true, null]', [(None, v) for v in (1.25, 3e10, -7, 0.5e-3, True, None)]),
+    ('{"documents": [{"n": 123456789}, {"n": -1.5e+2}], "total": 2}', [("documents", {"n": 123456789}), ("documents", {"n": -150.0})]),
+    ('  [ {"s": "a, b]"} , 42 ]  ', [(None, {"s": "a, b]"}), (None, 42)]),
+])
+def test_numbers_split_across_reads(tmp_path, monkeypatch, read_size, text, expected):
+    monkeypatch.setattr(json_stream, "_READ_SIZE", read_size)
+    path = tmp_path / "data.json"
+    path.write_text(text, encoding="utf-8")
+    assert list(iter_json_records(path)) == expected
+
+
+def test_write_then_stream_round_trip(tmp_path, monkeypatch):
+    monkeypatch.setattr(json_stream, "_READ_SIZE", 5)
+    documents = [{"id": f"d{i}", "text": "é" * i, "metadata": {"score": i / 3}} for i in range(20)]
+    path = tmp_path / "transcripts_chromadb.json"
+    assert write_json_documents(path, iter(documents), header={"format": "chromadb"}) == 20
+    assert json.loads(path.read_text(encoding="utf-8"))["total_documents"] == 20
+    assert [record for _, record in iter_json_records(path)] == documents
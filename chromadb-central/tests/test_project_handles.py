@@ -0,0 +1,123 @@
+import os
+import pytest
+
+pytest.importorskip("chromadb")
+from api import query_chromadb as qc
+
+
+class FakeSystem:
+    def __init__(self):
+        self.stopped = False
+
+    def stop(self):
+        self.stopped = True
+
+
+class FakeClient:
+    # Like chromadb's SharedSystemClient: one system per path
+    systems = {}
+
+    def __init__(self, path):
+        self._system = FakeClient.systems.setdefault(path, FakeSystem())
+
+
+@pytest.fixture
+def handles(tmp_path, monkeypatch):
+    for project in ("p", "q"):
+        os.makedirs(tmp_path / "knowledge-base" / project / "chroma_db")
+    FakeClient.systems = {}
+    monkeypatch.setattr(qc, "PROJECT_ROOT", str(tmp_path))
+    monkeypatch.setattr(qc, "_PROJECT_HANDLES", {})
+    monkeypatch.setattr(qc, "_PRELOADED_COLLECTIONS", {})
+    monkeypatch.setattr(qc, "_LOAD_LOCKS", {})
+    monkeypatch.setattr(qc, "_READINESS", {"preload_done": False, "started_at": None, "finished_at": None, "projects": {}})
+    monkeypatch.setattr(qc, "CHROMA_MAX_RESIDENT_PROJECTS", 1)
+    monkeypatch.setattr(qc, "CHROMA_MAX_RESIDENT_MB", 0)
+    monkeypatch.setattr(qc, "_prepare_handle", lambda project_name, handle: None)
+
+    def open_handle(project_name, kb_path):
+        handle = {
+            "client": FakeClient(os.path.abspath(kb_path)),
+            "path": os.path.abspath(kb_path),
+            "version": os.path.basename(kb_path),
+            "collections": {},
+            "inflight": 0,
+            "retired": False,
+            "last_used": 0,
+            "rss_mb": None,
+            "warmup": {},
+            "warmup_errors": {},
+        }
+        return handle
+
+    monkeypatch.setattr(qc, "_open_project_handle", open_handle)
+    return tmp_path
+
+
+def _evict_reload_and_release(project_name):
+    """Evict project_name while a lease holds it, load it again, then release the old lease."""
+    assert qc._ensure_project_loaded(project_name)
+    lease = qc._ProjectLease(project_name)
+    old = lease.__enter__()
+    assert qc._ensure_project_loaded("q")  # over budget: evicts project_name (still leased)
+    assert old["retired"] and project_name not in qc._PROJECT_HANDLES
+    assert qc._ensure_project_loaded(project_name)
+    lease.__exit__(None, None, None)
+    return old, qc._PROJECT_HANDLES[project_name]
+
+
+def test_old_lease_exit_keeps_live_system_on_same_path(handles, monkeypatch):
+    monkeypatch.setattr(qc, "_KNOWN_PROJECTS", {"p": {"local_only": True}, "q": {"local_only": True}})
+
+    old, live = _evict_reload_and_release("p")
+
+    assert live["path"] == old["path"]
+    assert live["client"]._system is old["client"]._system
+    assert not live["client"]._system.stopped
+
+
+def test_lazy_bucket_load_is_staged_away_from_leased_copy(handles, monkeypatch):
+    monkeypatch.setattr(qc, "_KNOWN_PROJECTS", {"p": {"local_only": False}, "q": {"local_only": True}})
+    downloads = []
+
+    def download(project_name, kb_root, local_dir=None, progress=None, seed_dir=None):
+        downloads.append(local_dir)
+        os.makedirs(local_dir)
+
+    monkeypatch.setattr(qc, "_download_chroma_db_from_bucket", download)
+
+    old, live = _evict_reload_and_release("p")
+
+    assert len(downloads) == 2
+    assert all(os.path.basename(os.path.dirname(d)) == qc._STAGING_DIRNAME for d in downloads)
+    assert live["path"] != old["path"]
+    # The retired copy is released once its last query is done; the live one keeps serving
+    assert FakeClient.systems[old["path"]].stopped and not os.path.exists(old["path"])
+    assert old["client"] is None
+    assert not live["client"]._system.stopped and os.path.exists(live["path"])
+
+
+def test_rss_counts_indexes_built_before_going_live(handles, monkeypatch):
+    monkeypatch.setattr(qc, "_KNOWN_PROJECTS", {"p": {"local_only": True}})
+    rss = {"mb": 100.0}
+    monkeypatch.setattr(qc, "_current_rss_mb", lambda: rss["mb"])
+
+    def prepare(project_name, handle):
+        rss["mb"] += 40.0  # exact-search snapshot / BM25 index
+
+    monkeypatch.setattr(qc, "_prepare_handle", prepare)
+
+    assert qc._ensure_project_loaded("p")
+    assert qc._PROJECT_HANDLES["p"]["rss_mb"] == 40.0
+
+
+def test_close_survives_changed_chromadb_internals(handles, capsys):
+    path = handles / "knowledge-base" / "p" / qc._STAGING_DIRNAME / "v1"
+    os.makedirs(path)
+    handle = {"client": object(), "path": str(path), "collections": {"c": object()}}  # no _system
+
+    qc._close_project_handle(handle)
+
+    assert "Could not release the chromadb client" in capsys.readouterr().out
+    assert handle["client"] is None and handle["collections"] == {}
+    assert not os.path.exists(path)
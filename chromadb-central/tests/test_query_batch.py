@@ -0,0 +1,38 @@
+import pytest
+
+pytest.importorskip("chromadb")
+pytest.importorskip("fastapi.testclient")
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from api.routes import query
+
+
+@pytest.fixture
+def client(monkeypatch):
+    def run_batch(items):
+        return [{"ids": [[]]} for _ in items]
+
+    monkeypatch.setattr(query, "query_vector_db_batch", run_batch)
+    app = FastAPI()
+    app.include_router(query.router)
+    return TestClient(app)
+
+
+@pytest.mark.parametrize("bad_item", ["innovia", None, ["innovia", "cctt"], {"collection_name": "cctt"}])
+def test_malformed_item_is_rejected_with_its_index(client, bad_item):
+    items = [{"project_name": "innovia", "query": "bois"}, bad_item]
+    response = client.post("/query/batch", json={"items": items})
+    assert response.status_code == 400
+    assert response.json()["index"] == 1
+
+
+def test_items_must_be_a_list(client):
+    response = client.post("/query/batch", json={"items": {"project_name": "innovia"}})
+    assert response.status_code == 400
+
+
+def test_valid_batch_runs(client):
+    items = [{"project_name": "innovia", "query": "bois"}, {"project_name": "nutria", "query": {"query_text": "sel"}}]
+    response = client.post("/query/batch", json={"items": items})
+    assert response.status_code == 200
+    assert len(response.json()["results"]) == 2
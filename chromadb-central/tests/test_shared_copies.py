@@ -0,0 +1,21 @@
+"""The agents deployed separately ship copies of some api modules: keep them identical."""
+from pathlib import Path
+
+import pytest
+
+API_DIR = Path(__file__).resolve().parents[1] / "api"
+REPO_ROOT = API_DIR.parents[1]
+
+COPIES = [
+    ("embedding_pipeline.py", "translator-agent/core/embedding_pipeline.py"),
+    ("embedding_pipeline.py", "new-agents/embedding_pipeline.py"),
+    ("json_stream.py", "translator-agent/core/json_stream.py"),
+]
+
+
+@pytest.mark.parametrize("module, copy", COPIES)
+def test_copy_matches_central(module, copy):
+    copy_path = REPO_ROOT / copy
+    if not copy_path.exists():
+        pytest.skip(f"{copy} not in this checkout")
+    assert copy_path.read_text(encoding="utf-8") == (API_DIR / module).read_text(encoding="utf-8")
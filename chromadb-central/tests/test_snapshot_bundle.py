@@ -0,0 +1,60 @@
+import os
+
+import pytest
+
+from api.bucket_sync import LocalDirSource
+from api.snapshot_bundle import build_bundle, fetch_bundle, bundle_is_current
+
+
+def _write(path, data):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "wb") as f:
+        f.write(data)
+
+
+@pytest.fixture
+def bucket(tmp_path):
+    """A bucket stand-in holding p/snapshot/, built from a chroma_db with one file."""
+    chroma_dir = tmp_path / "built" / "chroma_db"
+    _write(str(chroma_dir / "chroma.sqlite3"), b"v1")
+    root = tmp_path / "bucket"
+
+    def publish(data):
+        _write(str(chroma_dir / "chroma.sqlite3"), data)
+        build_bundle(str(chroma_dir), str(root / "p" / "snapshot"), "p", collection_counts={"c": 1})
+
+    publish(b"v1")
+    return LocalDirSource(str(root)), publish
+
+
+def test_bundle_is_current_until_a_new_one_is_published(tmp_path, bucket):
+    source, publish = bucket
+    live = str(tmp_path / "live")
+    assert bundle_is_current(source, "p", live) is False
+    fetch_bundle(source, "p", live)
+    assert bundle_is_current(source, "p", live) is True
+
+    publish(b"v2")
+    assert bundle_is_current(source, "p", live) is False
+    assert bundle_is_current(source, "missing", live) is None
+
+
+def test_unchanged_reload_stages_nothing(tmp_path, bucket, monkeypatch):
+    pytest.importorskip("chromadb")
+    from api import query_chromadb as qc
+
+    source, publish = bucket
+    live = str(tmp_path / "live")
+    fetch_bundle(source, "p", live)
+    staged = []
+    monkeypatch.setattr(qc, "get_bucket_source", lambda: source)
+    monkeypatch.setattr(qc, "_PROJECT_HANDLES", {"p": {"path": live}})
+    monkeypatch.setattr(qc, "_new_staging_dir", lambda project_name: staged.append(project_name) or str(tmp_path / "staged"))
+    monkeypatch.setattr(qc, "reload_project_collections", lambda *args, **kwargs: True)
+
+    assert qc.reload_project_from_bucket("p") is False
+    assert staged == []
+
+    publish(b"v2")
+    assert qc.reload_project_from_bucket("p") is True
+    assert staged == ["p"]
@@ -6,6 +6,10 @@ REM   upload-chroma-db.bat                   Upload all projects
 REM   upload-chroma-db.bat nutria            Upload only nutria
 REM   upload-chroma-db.bat nutria --reload   Upload nutria + call /reload
 REM   upload-chroma-db.bat --reload          Upload all + call /reload
+REM
+REM Each project is uploaded twice: chroma_db/ blob by blob (fallback), and
+REM snapshot/ = one chroma_db.tar.gz + manifest.json that instances stream at
+REM cold start. The manifest goes last: its presence is what enables the bundle.
 REM ====================================
 echo.
 
@@ -54,7 +58,8 @@ echo.
 REM Upload single project or all projects
 if defined TARGET_PROJECT (
     if exist "%KB_DIR%\%TARGET_PROJECT%\chroma_db" (
-        echo Clearing gs://%BUCKET_NAME%/%TARGET_PROJECT%/chroma_db ...
+        echo Clearing gs://%BUCKET_NAME%/%TARGET_PROJECT%/snapshot and chroma_db ...
+        call gcloud storage rm "gs://%BUCKET_NAME%/%TARGET_PROJECT%/snapshot/**" --recursive 2>nul
         call gcloud storage rm "gs://%BUCKET_NAME%/%TARGET_PROJECT%/chroma_db/**" --recursive 2>nul
         echo Uploading %TARGET_PROJECT%/chroma_db ...
         call gcloud storage cp "%KB_DIR%\%TARGET_PROJECT%\chroma_db" "gs://%BUCKET_NAME%/%TARGET_PROJECT%/chroma_db" --recursive
@@ -62,6 +67,7 @@ if defined TARGET_PROJECT (
             echo ERROR: Failed to upload %TARGET_PROJECT%/chroma_db
         ) else (
             echo OK: %TARGET_PROJECT%/chroma_db uploaded.
+            call :upload_bundle %TARGET_PROJECT%
         )
     ) else (
         echo ERROR: %KB_DIR%\%TARGET_PROJECT%\chroma_db not found!
@@ -73,7 +79,8 @@ if defined TARGET_PROJECT (
         set "PROJECT=%%~nxP"
         setlocal enabledelayedexpansion
         if exist "%%P\chroma_db" (
-            echo Clearing gs://%BUCKET_NAME%/!PROJECT!/chroma_db ...
+            echo Clearing gs://%BUCKET_NAME%/!PROJECT!/snapshot and chroma_db ...
+            call gcloud storage rm "gs://%BUCKET_NAME%/!PROJECT!/snapshot/**" --recursive 2>nul
             call gcloud storage rm "gs://%BUCKET_NAME%/!PROJECT!/chroma_db/**" --recursive 2>nul
             echo Uploading !PROJECT!/chroma_db ...
             call gcloud storage cp "%%P\chroma_db" "gs://%BUCKET_NAME%/!PROJECT!/chroma_db" --recursive
@@ -82,6 +89,7 @@ if defined TARGET_PROJECT (
                 endlocal
             ) else (
                 echo OK: !PROJECT!/chroma_db uploaded.
+                call :upload_bundle !PROJECT!
                 endlocal
             )
         ) else (
@@ -119,3 +127,25 @@ echo ====================================
 echo Upload complete.
 echo ====================================
 pause
+exit /b 0
+
+REM Build and upload the snapshot bundle of project %1 (archive first, manifest last)
+:upload_bundle
+echo Building snapshot bundle for %1 ...
+call python -m api.snapshot_bundle %1
+if errorlevel 1 (
+    echo WARNING: Bundle build failed for %1, instances will sync chroma_db blob by blob.
+    exit /b 0
+)
+call gcloud storage cp "%KB_DIR%\%1\snapshot\chroma_db.tar.gz" "gs://%BUCKET_NAME%/%1/snapshot/chroma_db.tar.gz"
+if errorlevel 1 (
+    echo WARNING: Failed to upload the %1 bundle archive.
+    exit /b 0
+)
+call gcloud storage cp "%KB_DIR%\%1\snapshot\manifest.json" "gs://%BUCKET_NAME%/%1/snapshot/manifest.json"
+if errorlevel 1 (
+    echo WARNING: Failed to upload the %1 bundle manifest.
+) else (
+    echo OK: %1/snapshot bundle uploaded.
+)
+exit /b 0
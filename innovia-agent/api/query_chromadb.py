@@ -162,7 +162,21 @@ def format_context(documents, metadatas_list):
         context.append(f"```\n{json.dumps(entry, ensure_ascii=False, indent=2)}\n```")
     return context
 
-def query_chromadb(project_name, collection_name=None, data=None):
+# Opt-in compact wire format with chromadb-central: msgpack results in the response
+# (queries carry query_text, which central embeds, so the request stays small JSON)
+CHROMADB_COMPACT_WIRE = os.getenv("CHROMADB_COMPACT_WIRE", "false").lower() in ("1", "true", "yes")
+MSGPACK_MEDIA_TYPE = "application/x-msgpack"
+
+
+def _decode_central_response(resp):
+    """Decode a chromadb-central response (msgpack when negotiated, JSON otherwise)."""
+    if resp.headers.get("Content-Type", "").startswith(MSGPACK_MEDIA_TYPE):
+        import msgpack
+        return msgpack.unpackb(resp.content, raw=False)
+    return resp.json()
+
+
+def query_chromadb(project_name, collection_name=None, data=None, compact=None):
     try:
         chromadb_url = os.getenv("CHROMADB_CENTRAL_URL")
         print(f"[Query] Using CHROMADB_CENTRAL_URL: {chromadb_url}")
@@ -195,6 +209,12 @@ def query_chromadb(project_name, collection_name=None, data=None):
             "query": data
         }
 
+        # Compact wire format (explicit arg wins over CHROMADB_COMPACT_WIRE)
+        if compact is None:
+            compact = CHROMADB_COMPACT_WIRE
+        if compact:
+            headers["Accept"] = MSGPACK_MEDIA_TYPE
+
         url = f"{chromadb_url}/query"
         # url = f"{chromadb_url}/smart_query"
 
@@ -210,7 +230,7 @@ def query_chromadb(project_name, collection_name=None, data=None):
 
         resp.raise_for_status()
 
-        return resp.json()
+        return _decode_central_response(resp)
 
     except requests.exceptions.HTTPError as e:
         return {
@@ -509,17 +529,11 @@ def ask_question_stream(question, language="fr", timezone="UTC", locale="fr-FR",
         domaines_str = ", ".join(result.get("domaines", [])) if isinstance(result.get("domaines", []), list) else str(result.get("domaines", ""))
         question_data = "domaines: " + domaines_str + "\ncontexte: " + result.get("contexte", "")
         
-        # Get embedding for the reformulated question
-        query_emb = client.embeddings.create(
-            model="text-embedding-3-small",  # 3072 dimensions, supported by OpenAI/Vercel
-            input=question_data
-        ).data[0].embedding
-
         # We only need top 150 for diversity filtering before shuffling and taking top 50
-        # Query ChromaDB with optional library filter
+        # Query ChromaDB with optional library filter (central embeds the text with the project's model)
         nbr_results = 5
         query_params = {
-            "query_embedding": query_emb,
+            "query_text": question_data,
             "n_results": nbr_results,
             "include": ['documents', 'metadatas','distances']
         }
@@ -36,6 +36,7 @@ from chromadb.utils import embedding_functions
 import PyPDF2
 import docx
 from tqdm import tqdm
+from embedding_pipeline import embed_texts_concurrently
 
 # Load environment variables
 MAIN_ROOT = Path.cwd()
@@ -600,10 +601,14 @@ def index_to_chromadb(agent_dir: Path, agent_id: str):
     )
     
     indexed_count = 0
+    all_ids = []
+    all_chunks = []
+    all_metadatas = []
+    all_doc_ids = []
     
     print(f"📚 Processing {len(documents)} documents from transcripts_chromadb.json...")
     
-    for doc in tqdm(documents, desc="Indexing documents"):
+    for doc in tqdm(documents, desc="Chunking documents"):
         
         try:
             text = doc.get("text", "")
@@ -628,23 +633,17 @@ def index_to_chromadb(agent_dir: Path, agent_id: str):
                 print(f"⚠️  No chunks created from: {doc_id}")
                 continue
             
-            # Add to ChromaDB
             for idx, chunk in enumerate(chunks):
-                chunk_id = f"{doc_id}_chunk_{idx}"
-                
+                all_ids.append(f"{doc_id}_chunk_{idx}")
+                all_chunks.append(chunk)
+                all_doc_ids.append(doc_id)
                 # Combine document metadata with chunk metadata
-                chunk_metadata = {
+                all_metadatas.append({
                     **metadata,
                     "document_id": doc_id,
                     "chunk_index": idx,
                     "source": metadata.get("source", "transcript")
-                }
-                
-                collection.add(
-                    documents=[chunk],
-                    ids=[chunk_id],
-                    metadatas=[chunk_metadata]
-                )
+                })
             
             indexed_count += 1
             
@@ -652,7 +651,35 @@ def index_to_chromadb(agent_dir: Path, agent_id: str):
             print(f"❌ Error indexing document {doc.get('id', 'unknown')}: {e}")
             continue
     
-    print(f"✅ Indexed {indexed_count} documents to ChromaDB")
+    # Embed all chunks concurrently (token-bounded batches, 429 backoff), then add
+    # them with their precomputed vectors. A batch that keeps failing is logged and
+    # left out; the other chunks are still indexed.
+    failed_docs = set()
+
+    def _log_failed_batch(start, end, error):
+        docs = sorted(set(all_doc_ids[start:end]))
+        failed_docs.update(docs)
+        print(f"❌ Error embedding chunks {start}-{end} ({', '.join(docs)}): {error}")
+
+    embeddings = embed_texts_concurrently(
+        client_openai, all_chunks, "text-embedding-3-large", on_error=_log_failed_batch
+    )
+    embedded = [i for i, vector in enumerate(embeddings) if vector is not None]
+    
+    BATCH_SIZE = 500
+    for start in range(0, len(embedded), BATCH_SIZE):
+        batch = embedded[start:start + BATCH_SIZE]
+        collection.add(
+            ids=[all_ids[i] for i in batch],
+            embeddings=[embeddings[i] for i in batch],
+            documents=[all_chunks[i] for i in batch],
+            metadatas=[all_metadatas[i] for i in batch]
+        )
+    
+    print(f"✅ Indexed {indexed_count - len(failed_docs)} documents to ChromaDB")
+    if failed_docs:
+        print(f"⚠️  {len(failed_docs)} documents incompletely indexed ({len(all_ids) - len(embedded)} chunks not embedded): "
+              f"{', '.join(sorted(failed_docs))}")
 
 
 
@@ -0,0 +1,187 @@
+"""
+Concurrent, rate-limit-aware embedding pipeline for indexing.
+
+Splits texts into batches bounded by an estimated token count and by number of
+inputs, embeds them on a thread pool, and returns the vectors in input order so
+they can be written to Chroma as precomputed embeddings.
+
+Concurrency adapts to the gateway (AIMD): it grows by one after a run of
+successful calls, halves on a 429, and the throttled batch is retried after the
+server's Retry-After or an exponential backoff with jitter. 5xx and connection
+errors are retried with the same backoff.
+
+Configuration (env):
+  - EMBEDDING_MAX_CONCURRENCY: upper bound on parallel requests (default 8)
+  - EMBEDDING_BATCH_TOKENS: estimated tokens per request (default 100000)
+  - EMBEDDING_BATCH_INPUTS: texts per request (default 512)
+  - EMBEDDING_MAX_RETRIES: attempts per batch before giving up (default 8)
+
+The same file is copied next to the agent indexers (translator-agent/core,
+new-agents) which are deployed separately; keep the copies in sync.
+"""
+import os
+import time
+import random
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+EMBEDDING_MAX_CONCURRENCY = max(1, int(os.getenv("EMBEDDING_MAX_CONCURRENCY", "8")))
+EMBEDDING_BATCH_TOKENS = int(os.getenv("EMBEDDING_BATCH_TOKENS", "100000"))
+EMBEDDING_BATCH_INPUTS = int(os.getenv("EMBEDDING_BATCH_INPUTS", "512"))
+EMBEDDING_MAX_RETRIES = int(os.getenv("EMBEDDING_MAX_RETRIES", "8"))
+
+# Successful calls needed before concurrency grows by one
+_INCREASE_EVERY = 4
+_BACKOFF_BASE_S = 1.0
+_BACKOFF_MAX_S = 60.0
+
+_encoder = None
+
+
+def estimate_tokens(text):
+    """Token count of text (tiktoken when installed, else a conservative chars/3)."""
+    global _encoder
+    if _encoder is None:
+        try:
+            import tiktoken
+            _encoder = tiktoken.get_encoding("cl100k_base")
+        except Exception:
+            _encoder = False
+    if _encoder:
+        return len(_encoder.encode(text, disallowed_special=()))
+    return len(text) // 3 + 1
+
+
+def make_batches(texts, max_tokens=None, max_inputs=None):
+    """Split texts into consecutive (start, end) ranges under both limits."""
+    max_tokens = max_tokens or EMBEDDING_BATCH_TOKENS
+    max_inputs = max_inputs or EMBEDDING_BATCH_INPUTS
+    batches = []
+    start = 0
+    tokens = 0
+    for i, text in enumerate(texts):
+        n = estimate_tokens(text)
+        if i > start and (tokens + n > max_tokens or i - start >= max_inputs):
+            batches.append((start, i))
+            start, tokens = i, 0
+        tokens += n
+    if start < len(texts):
+        batches.append((start, len(texts)))
+    return batches
+
+
+class _AdaptiveLimiter:
+    """Semaphore whose limit grows additively on success and halves on throttling."""
+
+    def __init__(self, max_limit):
+        self.max_limit = max_limit
+        self.limit = max(1, max_limit // 2)
+        self.active = 0
+        self.successes = 0
+        self.throttled = 0
+        self._cond = threading.Condition()
+
+    def acquire(self):
+        with self._cond:
+            while self.active >= self.limit:
+                self._cond.wait()
+            self.active += 1
+
+    def release(self, throttled=False):
+        with self._cond:
+            self.active -= 1
+            if throttled:
+                self.throttled += 1
+                self.successes = 0
+                self.limit = max(1, self.limit // 2)
+            else:
+                self.successes += 1
+                if self.successes >= _INCREASE_EVERY and self.limit < self.max_limit:
+                    self.limit += 1
+                    self.successes = 0
+            self._cond.notify_all()
+
+
+def _status_code(error):
+    status = getattr(error, "status_code", None)
+    if status is None:
+        response = getattr(error, "response", None)
+        status = getattr(response, "status_code", None)
+    return status
+
+
+def _retry_after(error):
+    response = getattr(error, "response", None)
+    headers = getattr(response, "headers", None) or {}
+    try:
+        return float(headers.get("retry-after"))
+    except (TypeError, ValueError):
+        return None
+
+
+def _is_retryable(error):
+    status = _status_code(error)
+    if status is not None:
+        return status == 429 or status >= 500
+    # Connection errors / timeouts carry no status
+    return type(error).__name__ in ("APIConnectionError", "APITimeoutError", "ConnectionError", "TimeoutError")
+
+
+def embed_texts_concurrently(client, texts, model, max_concurrency=None, progress=None,
+                             max_tokens=None, max_inputs=None, on_error=None):
+    """
+    Embed texts with client.embeddings.create(), several token-bounded batches at once.
+    progress(n_texts) is called after each batch completes.
+    Returns the vectors (lists of floats) in input order.
+    A batch that still fails after its retries raises, unless on_error is given:
+    on_error(start, end, error) is then called and texts[start:end] get None vectors.
+    """
+    texts = list(texts)
+    if not texts:
+        return []
+    batches = make_batches(texts, max_tokens, max_inputs)
+    limiter = _AdaptiveLimiter(max_concurrency or EMBEDDING_MAX_CONCURRENCY)
+    vectors = [None] * len(texts)
+    started = time.perf_counter()
+
+    def _embed_batch(start, end):
+        for attempt in range(EMBEDDING_MAX_RETRIES):
+            limiter.acquire()
+            try:
+                response = client.embeddings.create(model=model, input=texts[start:end])
+            except Exception as e:
+                throttled = _status_code(e) == 429
+                limiter.release(throttled=throttled)
+                if not _is_retryable(e) or attempt == EMBEDDING_MAX_RETRIES - 1:
+                    raise
+                delay = _retry_after(e) if throttled else None
+                if delay is None:
+                    delay = min(_BACKOFF_MAX_S, _BACKOFF_BASE_S * 2 ** attempt) * (0.5 + random.random() / 2)
+                print(f"   ⏳ Embedding batch {start}-{end} {'throttled' if throttled else 'failed'} "
+                      f"({e.__class__.__name__}), retry in {delay:.1f}s (limit {limiter.limit})", flush=True)
+                time.sleep(delay)
+                continue
+            limiter.release()
+            for i, item in enumerate(response.data):
+                vectors[start + i] = item.embedding
+            if progress:
+                progress(end - start)
+            return
+
+    with ThreadPoolExecutor(max_workers=limiter.max_limit, thread_name_prefix="embed") as pool:
+        futures = [pool.submit(_embed_batch, start, end) for start, end in batches]
+        failed = 0
+        for (start, end), future in zip(batches, futures):
+            try:
+                future.result()
+            except Exception as e:
+                if on_error is None:
+                    raise
+                failed += end - start
+                on_error(start, end, e)
+
+    elapsed = time.perf_counter() - started
+    print(f"   🧮 Embedded {len(texts) - failed} texts in {len(batches)} batches, {elapsed:.1f}s "
+          f"(final concurrency {limiter.limit}, {limiter.throttled} throttled"
+          f"{f', {failed} failed' if failed else ''})", flush=True)
+    return vectors
@@ -133,7 +133,21 @@ def build_prompt_from_template(language, context, question, history_text="", age
     
     return prompt, model_config
 
-def query_chromadb(project_name, collection_name=None, data=None):
+# Opt-in compact wire format with chromadb-central: msgpack results in the response
+# (queries carry query_text, which central embeds, so the request stays small JSON)
+CHROMADB_COMPACT_WIRE = os.getenv("CHROMADB_COMPACT_WIRE", "false").lower() in ("1", "true", "yes")
+MSGPACK_MEDIA_TYPE = "application/x-msgpack"
+
+
+def _decode_central_response(resp):
+    """Decode a chromadb-central response (msgpack when negotiated, JSON otherwise)."""
+    if resp.headers.get("Content-Type", "").startswith(MSGPACK_MEDIA_TYPE):
+        import msgpack
+        return msgpack.unpackb(resp.content, raw=False)
+    return resp.json()
+
+
+def query_chromadb(project_name, collection_name=None, data=None, compact=None):
     try:
         chromadb_url = os.getenv("CHROMADB_CENTRAL_URL")
 
@@ -164,6 +178,12 @@ def query_chromadb(project_name, collection_name=None, data=None):
             "query": data
         }
 
+        # Compact wire format (explicit arg wins over CHROMADB_COMPACT_WIRE)
+        if compact is None:
+            compact = CHROMADB_COMPACT_WIRE
+        if compact:
+            headers["Accept"] = MSGPACK_MEDIA_TYPE
+
         url = f"{chromadb_url}/query"
 
         # =========================
@@ -178,7 +198,7 @@ def query_chromadb(project_name, collection_name=None, data=None):
 
         resp.raise_for_status()
 
-        return resp.json()
+        return _decode_central_response(resp)
 
     except requests.exceptions.HTTPError as e:
         return {
@@ -291,15 +311,9 @@ def ask_question_stream(question, language="fr", timezone="UTC", locale="fr-FR",
 
 
     try:
-        # Get embedding for the question
-        query_emb = client.embeddings.create(
-            model="text-embedding-3-large", 
-            input=question
-        ).data[0].embedding
-
-        # Query ChromaDB
+        # Query ChromaDB (central embeds the question with the project's model)
         query_params = {
-            "query_embedding": query_emb,
+            "query_text": question,
             "n_results": top_k,
             "include": ['documents', 'metadatas']
         }
@@ -11,10 +11,15 @@ Usage:
 
 import json
 import re
+import itertools
 import sys
 from pathlib import Path
 from datetime import datetime
 from tqdm import tqdm
+try:
+    from json_stream import iter_json_records, write_json_documents
+except ImportError:
+    from core.json_stream import iter_json_records, write_json_documents
 
 
 def generate_transcripts_json(agent_dir: Path):
@@ -36,7 +41,32 @@ def generate_transcripts_json(agent_dir: Path):
         except Exception as e:
             print(f"⚠️  Could not read agent_id from config.json: {e}")
     
-    documents = []
+    documents = _iter_documents(transcripts_dir, documents_dir)
+    first = next(documents, None)
+    if first is None:
+        print("⚠️  No documents to process")
+        print("   Please add .txt files to knowledge-base/agent/transcripts/")
+        print("   or .json files to knowledge-base/agent/documents/")
+        return False
+    
+    # Stream documents to the file as they are produced
+    try:
+        count = write_json_documents(output_path, itertools.chain([first], documents), header={
+            "knowledge_base": agent_id,
+            "format": "chromadb",
+            "extracted_at": datetime.now().isoformat(),
+        })
+        
+        print(f"✅ Created transcripts_chromadb.json with {count} documents")
+        print(f"   Saved to: {output_path}")
+        return True
+    except Exception as e:
+        print(f"❌ Error saving transcripts_chromadb.json: {e}")
+        return False
+
+
+def _iter_documents(transcripts_dir: Path, documents_dir: Path):
+    """Yield {id, text, metadata} documents from transcripts (.txt) and JSON entries, one at a time"""
     doc_counter = 0
     
     # Process transcript files (.txt)
@@ -70,12 +100,11 @@ def generate_transcripts_json(agent_dir: Path):
                         day, month, year = date_match.groups()
                         metadata["date"] = f"20{year}-{month}-{day}"
                     
-                    # Add to documents array
-                    documents.append({
+                    yield {
                         "id": doc_id,
                         "text": text,
                         "metadata": metadata
-                    })
+                    }
                     
                 except Exception as e:
                     print(f"⚠️  Error processing {file_path.name}: {e}")
@@ -89,20 +118,8 @@ def generate_transcripts_json(agent_dir: Path):
             
             for json_file in tqdm(json_files, desc="Processing JSON files"):
                 try:
-                    with open(json_file, 'r', encoding='utf-8') as f:
-                        json_data = json.load(f)
-                    
-                    # Handle both array and single object
-                    if isinstance(json_data, list):
-                        entries = json_data
-                    elif isinstance(json_data, dict):
-                        entries = [json_data]
-                    else:
-                        print(f"⚠️  Unsupported JSON structure in {json_file.name}")
-                        continue
-                    
-                    # Create a document for each entry
-                    for entry in entries:
+                    # Handle both array and single object, streamed: a document per entry
+                    for _, entry in iter_json_records(json_file, keys=()):
                         if not isinstance(entry, dict):
                             continue
                         
@@ -164,43 +181,15 @@ def generate_transcripts_json(agent_dir: Path):
                             if key in entry and entry[key]:
                                 metadata[key] = entry[key]
                         
-                        # Add to documents array
-                        documents.append({
+                        yield {
                             "id": doc_id,
                             "text": text,
                             "metadata": metadata
-                        })
+                        }
                     
                 except Exception as e:
                     print(f"⚠️  Error processing {json_file.name}: {e}")
                     continue
-    
-    if not documents:
-        print("⚠️  No documents to process")
-        print("   Please add .txt files to knowledge-base/agent/transcripts/")
-        print("   or .json files to knowledge-base/agent/documents/")
-        return False
-    
-    # Create the complete structure
-    transcripts_data = {
-        "knowledge_base": agent_id,
-        "format": "chromadb",
-        "total_documents": len(documents),
-        "extracted_at": datetime.now().isoformat(),
-        "documents": documents
-    }
-    
-    # Save to file
-    try:
-        with open(output_path, 'w', encoding='utf-8') as f:
-            json.dump(transcripts_data, f, ensure_ascii=False, indent=2)
-        
-        print(f"✅ Created transcripts_chromadb.json with {len(documents)} documents")
-        print(f"   Saved to: {output_path}")
-        return True
-    except Exception as e:
-        print(f"❌ Error saving transcripts_chromadb.json: {e}")
-        return False
 
 
 def main():
@@ -20,6 +20,10 @@ from dotenv import load_dotenv
 import chromadb
 from chromadb.config import Settings
 from openai import OpenAI
+try:
+    from embedding_pipeline import embed_texts_concurrently
+except ImportError:
+    from core.embedding_pipeline import embed_texts_concurrently
 
 
 # Get main root directory (where .env is located)
@@ -38,20 +42,10 @@ client = OpenAI(
 )
 
 def get_embeddings(texts):
-    """Get embeddings from OpenAI"""
+    """Get embeddings from OpenAI (token-bounded batches, run concurrently with 429 backoff)"""
     if isinstance(texts, str):
         texts = [texts]
-    
-    # Process in batches to avoid rate limits
-    batch_size = 100
-    all_embeddings = []
-    
-    for i in range(0, len(texts), batch_size):
-        batch = texts[i:i + batch_size]
-        resp = client.embeddings.create(model="text-embedding-3-large", input=batch)
-        all_embeddings.extend([e.embedding for e in resp.data])
-    
-    return all_embeddings
+    return embed_texts_concurrently(client, texts, "text-embedding-3-large")
 
 
 def init_chromadb(kb_path):
@@ -131,7 +125,6 @@ def index_chromadb_json(kb_path):
     chroma_client, collection = init_chromadb(kb_path)
     
     all_ids = []
-    all_embeddings = []
     all_documents = []
     all_metadatas = []
     
@@ -149,14 +142,10 @@ def index_chromadb_json(kb_path):
         print(f"  Created {len(chunks)} chunks")
         total_chunks += len(chunks)
         
-        # Get embeddings for all chunks
-        embeddings = get_embeddings(chunks)
-        
         # Prepare data for ChromaDB
-        for i, (chunk, embedding) in enumerate(zip(chunks, embeddings)):
+        for i, chunk in enumerate(chunks):
             chunk_id = f"{doc_id}_chunk{i}"
             all_ids.append(chunk_id)
-            all_embeddings.append(embedding)
             all_documents.append(chunk)
             
             # Add chunk index to metadata
@@ -169,6 +158,10 @@ def index_chromadb_json(kb_path):
         
         print(f"  ✅ Successfully prepared {doc_id}")
     
+    # Embed every chunk of every document in one concurrent pass
+    print(f"\n🧮 Embedding {total_chunks} chunks...")
+    all_embeddings = get_embeddings(all_documents)
+    
     # Add all documents to ChromaDB in batches to avoid max batch size errors
     print(f"\n📊 Indexing {total_chunks} chunks into ChromaDB...")
     